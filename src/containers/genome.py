@@ -2,13 +2,17 @@ import numpy as np
 
 class Genome:
 
-  GENE_RANDOMIZER = np.random.RandomState()
+  GENE_RANDOMIZER = np.random.default_rng()
 
-  def __init__(self, genome_size, randomize = False):
+  def __init__(self, genome_size, randomize = False, genes = None, gene_randomizer = None):
     self.genome_size = genome_size
 
-    if randomize:
-      self.genes = self.GENE_RANDOMIZER.random_sample(genome_size)
+    if genes is not None:
+      self.genes = genes
+    elif randomize:
+      if gene_randomizer is None:
+        gene_randomizer = self.GENE_RANDOMIZER
+      self.genes = gene_randomizer.random(genome_size)
     else:
       self.genes = np.zeros(genome_size)
 
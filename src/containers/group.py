@@ -2,14 +2,15 @@ from . import individual as ind
 
 class Group:
 
-  def __init__(self, group_size, genome_size, individuals = None):
+  def __init__(self, group_size, genome_size, individuals = None, gene_randomizer = None):
     self.group_size = group_size
     self.genome_size = genome_size
 
     if individuals:
       self.individuals = individuals
     else:
-      self.individuals = [ind.Individual(genome_size) for _ in range(group_size)]
+      self.individuals = [ind.Individual(genome_size, gene_randomizer = gene_randomizer)
+                            for _ in range(group_size)]
     self.assignment = -1
 
   def __str__(self):
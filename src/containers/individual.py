@@ -2,13 +2,14 @@ from . import genome as gen
 
 class Individual:
 
-  def __init__(self, genome_size, genome = None):
+  def __init__(self, genome_size, genome = None, gene_randomizer = None):
     self.genome_size = genome_size
 
     if genome:
       self.genome = genome
     else:
-      self.genome = gen.Genome(genome_size, randomize = True)
+      self.genome = gen.Genome(genome_size, randomize = True,
+                               gene_randomizer = gene_randomizer)
     self.assignment = -1
 
   def __str__(self):
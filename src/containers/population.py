@@ -1,19 +1,47 @@
+import numpy as np
+
+from . import genome as gen
 from . import group as grp
+from . import individual as ind
 
 class Population:
 
   def __init__(self, population_size, num_groups, genome_size,
-                assignment_priorities, assignment_sizes, groups = None):
+                assignment_priorities, assignment_sizes, groups = None,
+                array_backed = False, genes = None, group_ids = None, group_sizes = None,
+                gene_randomizer = None):
     self.population_size = population_size
     self.num_groups = num_groups
     self.genome_size = genome_size
     self.assignment_priorities = assignment_priorities
     self.assignment_sizes = assignment_sizes
+    self.array_backed = array_backed
+    if gene_randomizer is None:
+      gene_randomizer = gen.Genome.GENE_RANDOMIZER
+
+    if array_backed:
+      # Struct of arrays: one row of genes per individual, with its assignment and group no.
+      default_group_size = int(population_size / num_groups)
+      if group_sizes is not None:
+        self.group_sizes = group_sizes
+      else:
+        self.group_sizes = np.full(num_groups, default_group_size)
 
-    if groups:
-      self.groups = groups
+      if genes is not None:
+        self.genes = genes
+        self.group_ids = group_ids
+      else:
+        self.genes = gene_randomizer.random((num_groups * default_group_size, genome_size))
+        self.group_ids = np.repeat(np.arange(num_groups), default_group_size)
+      self.assignments = np.full(len(self.genes), -1)
+      self.group_assignments = np.full(num_groups, -1)
+      self._groups = None
+
+    elif groups:
+      self._groups = groups
     else:
-      self.groups = [grp.Group(int(population_size / num_groups), genome_size)
+      self._groups = [grp.Group(int(population_size / num_groups), genome_size,
+                                gene_randomizer = gene_randomizer)
                         for i in range(num_groups)]
 
   def __str__(self):
@@ -25,7 +53,39 @@ class Population:
       "".join([str(g) for g in self.groups]) +
       "\n")
 
+  @property
+  def groups(self):
+    if self.array_backed:
+      return self.get_group_views()
+    return self._groups
+
+  def get_group_views(self):
+    # Object view of the arrays for plotting and debugging, changes to it are not written back.
+    groups = []
+    for g in range(self.num_groups):
+      individuals = []
+      for i in np.flatnonzero(self.group_ids == g):
+        individual = ind.Individual(self.genome_size,
+                                    genome = gen.Genome(self.genome_size, genes = self.genes[i]))
+        individual.assignment = int(self.assignments[i])
+        individuals.append(individual)
+      group = grp.Group(int(self.group_sizes[g]), self.genome_size, individuals = individuals)
+      # Keep empty groups empty instead of filling them with new random individuals.
+      group.individuals = individuals
+      group.assignment = int(self.group_assignments[g])
+      groups.append(group)
+    return groups
+
+  def get_individual_fitness(self):
+    assigned = self.assignments > -1
+    fitness = np.zeros(len(self.genes))
+    fitness[assigned] = self.genes[assigned, self.assignments[assigned]]
+    return fitness
+
   def get_fitness(self):
+    if self.array_backed:
+      return self.get_individual_fitness().sum() / self.population_size
+
     sum = 0.0
     for g in self.groups:
       sum += g.get_fitness() * g.group_size
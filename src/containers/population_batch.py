@@ -0,0 +1,83 @@
+import numpy as np
+
+from . import genome as gen
+from . import population as pop
+
+class PopulationBatch:
+
+  def __init__(self, num_runs, population_size, num_groups, genome_size,
+                assignment_priorities, assignment_sizes,
+                genes = None, group_ids = None, group_sizes = None, gene_randomizer = None):
+    # One array-backed population per run, stacked along the first axis.
+    #   assignment_priorities and assignment_sizes are (num_runs, genome_size) arrays.
+    #   Individuals dropped when regrouping by assignment keep their row with group id -1.
+    self.num_runs = num_runs
+    self.population_size = population_size
+    self.num_groups = num_groups
+    self.genome_size = genome_size
+    self.assignment_priorities = assignment_priorities
+    self.assignment_sizes = assignment_sizes
+
+    default_group_size = int(population_size / num_groups)
+    if group_sizes is not None:
+      self.group_sizes = group_sizes
+    else:
+      self.group_sizes = np.full((num_runs, num_groups), default_group_size)
+
+    if genes is not None:
+      self.genes = genes
+      self.group_ids = group_ids
+    else:
+      if gene_randomizer is None:
+        gene_randomizer = gen.Genome.GENE_RANDOMIZER
+      self.genes = gene_randomizer.random((num_runs, num_groups * default_group_size, genome_size))
+      self.group_ids = np.tile(np.repeat(np.arange(num_groups), default_group_size),
+                               (num_runs, 1))
+    self.assignments = np.full(self.group_ids.shape, -1)
+    self.group_assignments = np.full((num_runs, num_groups), -1)
+
+  @staticmethod
+  def get_counts(ids, num_ids, weights = None):
+    # Per-run bincount of a (num_runs, n) array of ids, ids of -1 are ignored.
+    num_runs = ids.shape[0]
+    valid = ids > -1
+    offset_ids = (ids + num_ids * np.arange(num_runs)[:, np.newaxis])[valid]
+    if weights is not None:
+      weights = weights[valid]
+    return np.bincount(offset_ids, weights = weights, minlength = num_runs * num_ids) \
+              .reshape(num_runs, num_ids)
+
+  @staticmethod
+  def get_slot_ids(sizes, num_slots):
+    # Id of each of num_slots consecutive slots, filled in order by (num_runs, num_ids) sizes.
+    #   Slots beyond the total size get id -1.
+    cumulative_sizes = np.cumsum(sizes, axis = 1)
+    slot_ids = np.sum(np.arange(num_slots)[np.newaxis, :, np.newaxis] \
+                        >= cumulative_sizes[:, np.newaxis, :], axis = 2)
+    return np.where(slot_ids < sizes.shape[1], slot_ids, -1)
+
+  def get_individual_fitness(self):
+    assigned = self.assignments > -1
+    genes_for_assignment = np.take_along_axis(self.genes,
+                                              np.maximum(self.assignments, 0)[..., np.newaxis],
+                                              axis = 2)[..., 0]
+    return np.where(assigned, genes_for_assignment, 0.0)
+
+  def get_fitness(self):
+    return self.get_individual_fitness().sum(axis = 1) / self.population_size
+
+  def get_population(self, run):
+    # Array-backed copy of a single run, for debugging and graphs.
+    present = self.group_ids[run] > -1
+    population = pop.Population(
+                      self.population_size, self.num_groups, self.genome_size,
+                      assignment_priorities = self.assignment_priorities[run].tolist(),
+                      assignment_sizes = {a: int(s) \
+                                            for a, s in enumerate(self.assignment_sizes[run])},
+                      array_backed = True,
+                      genes = self.genes[run][present],
+                      group_ids = self.group_ids[run][present],
+                      group_sizes = self.group_sizes[run])
+    population.assignments = self.assignments[run][present]
+    population.group_assignments = self.group_assignments[run]
+    return population
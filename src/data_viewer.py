@@ -22,6 +22,15 @@ def validate_params():
   if par.GraphParams.ALL_GRAPHS:
     assert not par.GraphParams.SHOW_GRAPHS
 
+def get_num_runs_text(num_runs_by_key):
+  # Adaptive runs may have converged with fewer runs than NUM_RUNS, which is noted in titles.
+  fewer_runs = ["{}: {}".format(key, num_runs) for key, num_runs in num_runs_by_key.items() \
+                  if num_runs is not None and num_runs < par.DataViewerParams.NUM_RUNS]
+  if not fewer_runs:
+    return ''
+  return '\nRuns Aggregated of {}: '.format(par.DataViewerParams.NUM_RUNS) \
+            + ', '.join(fewer_runs)
+
 def graph_by_strategy(fitness_history_io, show = False, save = False, all_graphs = False):
   if all_graphs:
     for randomize_assignment_priorities in [False, True]:
@@ -45,25 +54,25 @@ def graph_by_strategy_run(fitness_history_io, assignment_strategy,
   fcg = gra.FitnessCombinedGraph(max_iterations = par.GraphParams.MAX_ITERATIONS,
                                   time_to_fitness_values = par.GraphParams.TIME_TO_FITNESS_VALUES)
 
+  num_runs_by_key = {}
   for evolution_strategy in par.EvolutionStrategy:
     if evolution_strategy == par.EvolutionStrategy.NO_RESTRICTIONS_GROUP_BY_ASSIGNMENT:
       continue
-    datafile = fitness_history_io.get_data_filename(par.DataViewerParams.POPULATION_SIZE,
-                                                    par.DataViewerParams.NUM_ASSIGNMENTS,
-                                                    par.DataViewerParams.NUM_GROUPS,
-                                                    par.DataViewerParams.NUM_RUNS,
-                                                    par.DataViewerParams.NUM_ITERATIONS,
-                                                    evolution_strategy.name,
-                                                    randomize_assignment_priorities,
-                                                    randomize_assignment_sizes)
-    fitness_history = fitness_history_io.read_fitness_history(datafile, show = False)
+    fitness_history = fitness_history_io.read_experiment(
+        par.DataViewerParams.POPULATION_SIZE, par.DataViewerParams.NUM_ASSIGNMENTS,
+        par.DataViewerParams.NUM_GROUPS, par.DataViewerParams.NUM_RUNS,
+        par.DataViewerParams.NUM_ITERATIONS, evolution_strategy.name,
+        randomize_assignment_priorities, randomize_assignment_sizes,
+        max_iterations = par.GraphParams.MAX_ITERATIONS)
     fcg.add_fitness_history(key = evolution_strategy.name, fitness_history = fitness_history)
+    num_runs_by_key[evolution_strategy.name] = fitness_history.num_runs
 
   fig_type = 'Evolution by Strategy'
   variable = 'EvolutionStrategy'
   fixed = 'AssignmentStrategy: {}, RandomPriorities: {}, RandomSizes: {}' \
               .format(assignment_strategy.name,
-                      str(randomize_assignment_priorities), str(randomize_assignment_sizes))
+                      str(randomize_assignment_priorities), str(randomize_assignment_sizes)) \
+            + get_num_runs_text(num_runs_by_key)
   savefile = None
   if save:
     savefile = fitness_history_io.get_graph_filename(
@@ -104,25 +113,25 @@ def graph_by_assignment_variations_run(fitness_history_io,
   fcg = gra.FitnessCombinedGraph(max_iterations = par.GraphParams.MAX_ITERATIONS,
                                   time_to_fitness_values = par.GraphParams.TIME_TO_FITNESS_VALUES)
 
+  num_runs_by_key = {}
   for randomize_assignment_priorities in [False, True]:
     for randomize_assignment_sizes in [False, True]:
-      datafile = fitness_history_io.get_data_filename(par.DataViewerParams.POPULATION_SIZE,
-                                                      par.DataViewerParams.NUM_ASSIGNMENTS,
-                                                      par.DataViewerParams.NUM_GROUPS,
-                                                      par.DataViewerParams.NUM_RUNS,
-                                                      par.DataViewerParams.NUM_ITERATIONS,
-                                                      evolution_strategy.name,
-                                                      randomize_assignment_priorities,
-                                                      randomize_assignment_sizes)
-      fitness_history = fitness_history_io.read_fitness_history(datafile, show = False)
+      fitness_history = fitness_history_io.read_experiment(
+          par.DataViewerParams.POPULATION_SIZE, par.DataViewerParams.NUM_ASSIGNMENTS,
+          par.DataViewerParams.NUM_GROUPS, par.DataViewerParams.NUM_RUNS,
+          par.DataViewerParams.NUM_ITERATIONS, evolution_strategy.name,
+          randomize_assignment_priorities, randomize_assignment_sizes,
+          max_iterations = par.GraphParams.MAX_ITERATIONS)
       key = '(' + str(randomize_assignment_priorities) + ', ' \
                 + str(randomize_assignment_sizes) + ')'
       fcg.add_fitness_history(key = key, fitness_history = fitness_history)
+      num_runs_by_key[key] = fitness_history.num_runs
   
   fig_type = 'Evolution by Assignment Types'
   variable = '(RandomPriorities, RandomSizes)'
   fixed = 'EvolutionStrategy: {}, AssignmentStrategy: {}' \
-              .format(evolution_strategy.name, assignment_strategy.name)
+              .format(evolution_strategy.name, assignment_strategy.name) \
+            + get_num_runs_text(num_runs_by_key)
   savefile = None
   if save:
     savefile = fitness_history_io.get_graph_filename(
@@ -168,15 +177,12 @@ def graph_by_assignment_run(fitness_history_io, evolution_strategy, assignment_s
   fcg = gra.FitnessCombinedGraph(max_iterations = par.GraphParams.MAX_ITERATIONS,
                                   time_to_fitness_values = par.GraphParams.TIME_TO_FITNESS_VALUES)
 
-  datafile = fitness_history_io.get_data_filename(par.DataViewerParams.POPULATION_SIZE,
-                                                  par.DataViewerParams.NUM_ASSIGNMENTS,
-                                                  par.DataViewerParams.NUM_GROUPS,
-                                                  par.DataViewerParams.NUM_RUNS,
-                                                  par.DataViewerParams.NUM_ITERATIONS,
-                                                  evolution_strategy.name,
-                                                  randomize_assignment_priorities,
-                                                  randomize_assignment_sizes)
-  fitness_history = fitness_history_io.read_fitness_history(datafile, show = False)
+  fitness_history = fitness_history_io.read_experiment(
+      par.DataViewerParams.POPULATION_SIZE, par.DataViewerParams.NUM_ASSIGNMENTS,
+      par.DataViewerParams.NUM_GROUPS, par.DataViewerParams.NUM_RUNS,
+      par.DataViewerParams.NUM_ITERATIONS, evolution_strategy.name,
+      randomize_assignment_priorities, randomize_assignment_sizes,
+      max_iterations = par.GraphParams.MAX_ITERATIONS)
   for assignment in range(par.DataViewerParams.NUM_ASSIGNMENTS):
     fcg.add_fitness_history(key = 'Assignment {}'.format(assignment),
                             fitness_history = fitness_history)
@@ -185,7 +191,8 @@ def graph_by_assignment_run(fitness_history_io, evolution_strategy, assignment_s
   variable = 'AssignmentNo'
   fixed = 'EvolutionStrategy: {}, AssignmentStrategy: {}\nRandomPriorities: {}, RandomSizes: {}' \
               .format(evolution_strategy.name, assignment_strategy.name,
-                      randomize_assignment_priorities, randomize_assignment_sizes)
+                      randomize_assignment_priorities, randomize_assignment_sizes) \
+            + get_num_runs_text({'All': fitness_history.num_runs})
   savefile = None
   if save:
     savefile = fitness_history_io.get_graph_filename(
@@ -210,7 +217,8 @@ def data_viewer(datetime_string = None):
   if not datetime_string:
     datetime_string = par.DataViewerParams.DATETIME_STRING
 
-  fhio = dat.FitnessHistoryIO(datetime_string = datetime_string)
+  fhio = dat.FitnessHistoryIO(datetime_string = datetime_string,
+                              use_experiment_store = par.DebugParams.USE_EXPERIMENT_STORE)
 
   if par.GraphTypes.BY_EVOLUTION_STRATEGY:
     graph_by_strategy(fitness_history_io = fhio,
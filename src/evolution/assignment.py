@@ -1,33 +1,53 @@
 import numpy as np
-from scipy.optimize import linear_sum_assignment
+from scipy import sparse
+from scipy.optimize import linear_sum_assignment, linprog
 
 import params as par
 
 class Assignment:
 
-  RANDOM_ASSIGNMENT_PICKER = np.random.RandomState()
-  ASSIGNMENT_PRIORITY_RANDOMIZER = np.random.RandomState()
-  ASSIGNMENT_SIZE_RANDOMIZER = np.random.RandomState()
+  RANDOM_ASSIGNMENT_PICKER = np.random.default_rng()
+  ASSIGNMENT_PRIORITY_RANDOMIZER = np.random.default_rng()
+  ASSIGNMENT_SIZE_RANDOMIZER = np.random.default_rng()
+
+  # Find the best individuals for an assignment with a partition instead of a full sort
+  #   if at most this fraction of the population can be needed.
+  GREEDY_PARTITION_FRACTION = 0.25
+
+  # Smallest improvement in path cost accepted by the min cost flow solver.
+  MATCHING_TOLERANCE = 1e-12
 
   def __init__(self, assignment_strategy,
                 restrict_assignment = False, group_by_assignment = False,
-                randomize_assignment_priorities = False, randomize_assignment_sizes = False):
+                randomize_assignment_priorities = False, randomize_assignment_sizes = False,
+                matching_solver = par.MatchingSolver.EXPANDED, randomizers = None):
     self.assignment_strategy = assignment_strategy
     self.restrict_assignment = restrict_assignment
     self.group_by_assignment = group_by_assignment
     self.randomize_assignment_priorities = randomize_assignment_priorities
     self.randomize_assignment_sizes = randomize_assignment_sizes
+    self.matching_solver = matching_solver
+
+    # Streams of a single run instead of the ones shared by all instances.
+    self.random_assignment_picker = self.RANDOM_ASSIGNMENT_PICKER
+    self.assignment_priority_randomizer = self.ASSIGNMENT_PRIORITY_RANDOMIZER
+    self.assignment_size_randomizer = self.ASSIGNMENT_SIZE_RANDOMIZER
+    if randomizers is not None:
+      self.random_assignment_picker = randomizers.random_assignment_picker
+      self.assignment_priority_randomizer = randomizers.assignment_priority
+      self.assignment_size_randomizer = randomizers.assignment_size
 
   def get_assignment_distribution(self, population_size, genome_size):
     assignment_priorities = [*range(genome_size)]
     if self.randomize_assignment_priorities:
-      self.ASSIGNMENT_PRIORITY_RANDOMIZER.shuffle(assignment_priorities)
+      self.assignment_priority_randomizer.shuffle(assignment_priorities)
 
     default_group_size = int(population_size / genome_size)
     assignment_sizes = {i: default_group_size for i in range(genome_size)}
     if self.randomize_assignment_sizes:
-      for i in range(population_size):
-        swap_indices = self.ASSIGNMENT_SIZE_RANDOMIZER.randint(0, genome_size, 2)
+      all_swap_indices = self.assignment_size_randomizer.integers(0, genome_size,
+                                                                  (population_size, 2))
+      for swap_indices in all_swap_indices.tolist():
         if assignment_sizes[swap_indices[0]] > int(default_group_size / 2):
           assignment_sizes[swap_indices[0]] -= 1
           assignment_sizes[swap_indices[1]] += 1
@@ -38,7 +58,7 @@ class Assignment:
     for i, group in enumerate(population.groups):
       for j, individual in enumerate(group.individuals):
         enumerated.append({'group': i, 'index': j, 'individual': individual})
-    self.RANDOM_ASSIGNMENT_PICKER.shuffle(enumerated)
+    self.random_assignment_picker.shuffle(enumerated)
 
     assigned = 0
     for a, size in population.assignment_sizes.items():
@@ -46,70 +66,256 @@ class Assignment:
         population.groups[e['group']].individuals[e['index']].assignment = a
       assigned += size
 
-  def greedy_assignment(self, population):
-    enumerated = []
-    for i, group in enumerate(population.groups):
-      for j, individual in enumerate(group.individuals):
-        enumerated.append({'group': i, 'index': j, 'individual': individual})
+  def get_greedy_assignments(self, genes, assignment_priorities, assignment_sizes):
+    # Each gene column is sorted at most once, and individuals already taken by a higher priority
+    #   assignment are skipped with a mask. If only the top few individuals for an assignment can
+    #   be needed, they are found with a partition instead of a full sort.
+    num_individuals = len(genes)
+    greedy_assignments = np.full(num_individuals, -1)
+    taken = np.zeros(num_individuals, dtype = bool)
+    num_taken = 0
 
-    for a in population.assignment_priorities:
-      sorted_for_a = sorted(enumerated, key = lambda e: e['individual'].genome.genes[a],
-                            reverse = True)
-      unassigned = [e for e in sorted_for_a if not e['individual'].has_assignment()]
-      for k in range(population.assignment_sizes[a]):
-        group_no = unassigned[k]['group']
-        individual_no = unassigned[k]['index']
-        population.groups[group_no].individuals[individual_no].assignment = a
-  
-  def assignment_matching(self, population):
-    individual_group_and_indices = []
-    assignment_cost_matrix = np.array([])
-    for i, group in enumerate(population.groups):
-      for j, individual in enumerate(group.individuals):
-        individual_group_and_indices.append(tuple([i, j]))
-        i_costs = individual.get_genes()
-        i_costs_expanded = np.array([])
-        for a in sorted(population.assignment_sizes.keys()):
-          i_costs_expanded = np.append(i_costs_expanded,
-                                       np.repeat(i_costs[a], population.assignment_sizes[a]))
-        if assignment_cost_matrix.size == 0:
-          assignment_cost_matrix = i_costs_expanded
-        else:
-          assignment_cost_matrix = np.vstack((assignment_cost_matrix, i_costs_expanded))
-
-    assignments_expanded = np.array([])
-    for a in sorted(population.assignment_sizes.keys()):
-      if assignments_expanded.size == 0:
-        assignments_expanded = np.repeat(a, population.assignment_sizes[a])
+    for a in assignment_priorities:
+      genes_for_a = genes[:, a]
+      num_candidates = num_taken + assignment_sizes[a]
+      if 0 < num_candidates < self.GREEDY_PARTITION_FRACTION * num_individuals:
+        # Keep every individual tied with the last candidate, so ties are still broken by order.
+        threshold = -np.partition(-genes_for_a, num_candidates - 1)[num_candidates - 1]
+        candidates = np.flatnonzero(genes_for_a >= threshold)
+        sorted_for_a = candidates[np.argsort(-genes_for_a[candidates], kind = 'stable')]
       else:
-        assignments_expanded = np.append(assignments_expanded,
-                                          np.repeat(a, population.assignment_sizes[a]))
+        sorted_for_a = np.argsort(-genes_for_a, kind = 'stable')
+
+      chosen = sorted_for_a[~taken[sorted_for_a]][:assignment_sizes[a]]
+      greedy_assignments[chosen] = a
+      taken[chosen] = True
+      num_taken += len(chosen)
+
+    return greedy_assignments
+
+  def greedy_assignment(self, population):
+    all_individuals = population.get_all_individuals()
+    genes = np.array([i.get_genes() for i in all_individuals])
+
+    for individual, a in zip(all_individuals,
+                             self.get_greedy_assignments(genes,
+                                                         population.assignment_priorities,
+                                                         population.assignment_sizes)):
+      individual.assignment = a
+
+  def get_matching_expanded(self, genes, assignment_sizes):
+    # One column per available slot, solved as a square assignment problem.
+    assignments_expanded = np.repeat(np.arange(len(assignment_sizes)), assignment_sizes)
+    assignment_cost_matrix = genes[:, assignments_expanded]
 
     [i_match_indices, a_match_indices] = \
         linear_sum_assignment(assignment_cost_matrix, maximize = True)
 
-    for i in i_match_indices:
-      (group_no, individual_no) = individual_group_and_indices[i]
-      population.groups[group_no].individuals[individual_no].assignment = \
-          assignments_expanded[a_match_indices[i]]
+    matched_assignments = np.full(len(genes), -1)
+    matched_assignments[i_match_indices] = assignments_expanded[a_match_indices]
+    return matched_assignments
+
+  def get_matching_transportation(self, genes, assignment_sizes):
+    # One column per assignment, solved as a transportation problem where each individual fills
+    #   at most one slot and each assignment fills all its slots.
+    #   The simplex solution is at a vertex, so every individual gets a whole assignment.
+    (num_individuals, genome_size) = genes.shape
+    individual_constraints = sparse.kron(sparse.eye(num_individuals),
+                                         np.ones((1, genome_size)), format = 'csr')
+    assignment_constraints = sparse.kron(np.ones((1, num_individuals)),
+                                         sparse.eye(genome_size), format = 'csr')
+
+    result = linprog(-genes.ravel(),
+                     A_ub = individual_constraints, b_ub = np.ones(num_individuals),
+                     A_eq = assignment_constraints, b_eq = assignment_sizes,
+                     bounds = (0, 1), method = 'highs-ds')
+    assert result.success, result.message
+
+    matches = result.x.reshape(num_individuals, genome_size)
+    return np.where(matches.max(axis = 1) > 0.5, np.argmax(matches, axis = 1), -1)
+
+  def get_matching_min_cost_flow(self, genes, assignment_sizes):
+    # Successive shortest paths with assignments as capacitated sinks, warm started from every
+    #   individual at its best assignment. That is optimal but overfills some assignments, so only
+    #   the excess is moved, along the cheapest chain of moves between assignments that ends in a
+    #   free slot. Edge a -> b costs the cheapest move of an individual from a to b.
+    (num_individuals, genome_size) = genes.shape
+    capacities = np.array(assignment_sizes)
+    num_spare = num_individuals - capacities.sum()
+    if num_spare > 0:
+      # Individuals left without an assignment go to an extra assignment with zero fitness.
+      genes = np.hstack((genes, np.zeros((num_individuals, 1))))
+      capacities = np.append(capacities, num_spare)
+    num_nodes = len(capacities)
+    costs = -genes
+
+    matched = np.argmin(costs, axis = 1)
+    used = np.bincount(matched, minlength = num_nodes)
+    move_costs = np.full((num_nodes, num_nodes), np.inf)
+    move_individuals = np.full((num_nodes, num_nodes), -1)
+
+    def refresh_moves(a, columns):
+      members = np.flatnonzero(matched == a)
+      if len(members) == 0:
+        move_costs[a, columns] = np.inf
+        move_individuals[a, columns] = -1
+        return
+      deltas = costs[np.ix_(members, columns)] - costs[members, a][:, np.newaxis]
+      deltas[:, columns == a] = np.inf
+      best = np.argmin(deltas, axis = 0)
+      move_costs[a, columns] = deltas[best, np.arange(len(columns))]
+      move_individuals[a, columns] = members[best]
+
+    def add_moves(i, b):
+      deltas = costs[i] - costs[i, b]
+      deltas[b] = np.inf
+      cheaper = deltas < move_costs[b]
+      move_costs[b, cheaper] = deltas[cheaper]
+      move_individuals[b, cheaper] = i
+
+    nodes = np.arange(num_nodes)
+    for a in nodes:
+      refresh_moves(a, nodes)
+
+    while (used > capacities).any():
+      distances = np.where(used > capacities, 0.0, np.inf)
+      predecessors = np.full(num_nodes, -1)
+      for _ in range(num_nodes):
+        via = distances[:, np.newaxis] + move_costs
+        best_via = np.argmin(via, axis = 0)
+        improved = via[best_via, nodes] < distances - self.MATCHING_TOLERANCE
+        if not improved.any():
+          break
+        distances[improved] = via[best_via, nodes][improved]
+        predecessors[improved] = best_via[improved]
+
+      free_nodes = np.flatnonzero(used < capacities)
+      b = free_nodes[np.argmin(distances[free_nodes])]
+      used[b] += 1
+      while predecessors[b] > -1:
+        a = predecessors[b]
+        i = move_individuals[a, b]
+        matched[i] = b
+        # Only the moves whose cheapest individual left a need recomputing.
+        refresh_moves(a, np.flatnonzero(move_individuals[a] == i))
+        add_moves(i, b)
+        b = a
+      used[b] -= 1
+
+    return np.where(matched < genome_size, matched, -1)
+
+  def get_matching_assignments(self, genes, assignment_sizes):
+    # Matched assignment (or -1) for each row of genes, assignment_sizes is indexed by assignment.
+    if self.matching_solver == par.MatchingSolver.TRANSPORTATION:
+      return self.get_matching_transportation(genes, assignment_sizes)
+    elif self.matching_solver == par.MatchingSolver.MIN_COST_FLOW:
+      return self.get_matching_min_cost_flow(genes, assignment_sizes)
+    return self.get_matching_expanded(genes, assignment_sizes)
+
+  def assignment_matching(self, population):
+    all_individuals = population.get_all_individuals()
+    genes = np.array([i.get_genes() for i in all_individuals])
+    assignment_sizes = [population.assignment_sizes[a] for a in range(population.genome_size)]
+
+    for individual, a in zip(all_individuals,
+                             self.get_matching_assignments(genes, assignment_sizes)):
+      individual.assignment = a
+
+  def random_assignment_array(self, population):
+    order = self.random_assignment_picker.permutation(len(population.genes))
+
+    assigned = 0
+    for a, size in population.assignment_sizes.items():
+      population.assignments[order[assigned : assigned + size]] = a
+      assigned += size
+
+  def greedy_assignment_array(self, population):
+    population.assignments = self.get_greedy_assignments(population.genes,
+                                                         population.assignment_priorities,
+                                                         population.assignment_sizes)
+
+  def assignment_matching_array(self, population):
+    assignment_sizes = [population.assignment_sizes[a] for a in range(population.genome_size)]
+    population.assignments = self.get_matching_assignments(population.genes, assignment_sizes)
+
+  def get_restricted_assignments(self, genes, group_ids, assignment_sizes):
+    # Group a can only take assignment a. One sort by group, then by the gene for the group's
+    #   assignment (descending), gives the rank of each individual within its group.
+    genes_for_group = genes[np.arange(len(genes)), group_ids]
+    order = np.lexsort((-genes_for_group, group_ids))
+    sorted_group_ids = group_ids[order]
+
+    group_counts = np.bincount(group_ids, minlength = len(assignment_sizes))
+    group_starts = np.cumsum(group_counts) - group_counts
+    ranks = np.arange(len(order)) - group_starts[sorted_group_ids]
+    chosen = ranks < np.asarray(assignment_sizes)[sorted_group_ids]
+
+    restricted_assignments = np.full(len(genes), -1)
+    restricted_assignments[order[chosen]] = sorted_group_ids[chosen]
+    return restricted_assignments
+
+  def restricted_assignment(self, population):
+    group_ids = np.concatenate([np.full(len(g.individuals), i) \
+                                  for i, g in enumerate(population.groups)])
+    all_individuals = population.get_all_individuals()
+    genes = np.array([i.get_genes() for i in all_individuals])
+    assignment_sizes = [population.assignment_sizes[a] for a in range(population.genome_size)]
+
+    for individual, a in zip(all_individuals,
+                             self.get_restricted_assignments(genes, group_ids, assignment_sizes)):
+      individual.assignment = a
+
+  def restricted_assignment_array(self, population):
+    assignment_sizes = [population.assignment_sizes[a] for a in range(population.genome_size)]
+    population.assignments = self.get_restricted_assignments(population.genes,
+                                                             population.group_ids,
+                                                             assignment_sizes)
+
+  def shuffle_by_assignment_array(self, population):
+    assigned = np.flatnonzero(population.assignments > -1)
+    order = assigned[np.argsort(population.assignments[assigned], kind = 'stable')]
+
+    population.genes = population.genes[order]
+    population.assignments = population.assignments[order]
+    population.group_ids = population.assignments.copy()
+    population.group_sizes = np.array([population.assignment_sizes[a]
+                                        for a in range(population.genome_size)])
+    population.group_assignments = np.arange(population.genome_size)
 
   def shuffle_by_assignment(self, population):
     all_individuals = population.get_all_individuals(assigned = True)
+    assignments = np.array([i.assignment for i in all_individuals], dtype = int)
+    order = np.argsort(assignments, kind = 'stable')
+    assignment_counts = np.bincount(assignments, minlength = population.genome_size)
+    assignment_starts = np.cumsum(assignment_counts) - assignment_counts
 
     for a in range(population.genome_size):
       group = population.groups[a]
       group.assignment = a
       group.group_size = population.assignment_sizes[a]
-      group.individuals = [i for i in all_individuals if i.assignment == a]
+      assignment_end = assignment_starts[a] + assignment_counts[a]
+      group.individuals = [all_individuals[i] for i in order[assignment_starts[a] : assignment_end]]
+
+  def update_assignments_array(self, population):
+    if self.restrict_assignment:
+      self.restricted_assignment_array(population)
+    elif self.assignment_strategy == par.AssignmentStrategy.RANDOM:
+      self.random_assignment_array(population)
+    elif self.assignment_strategy == par.AssignmentStrategy.ASSIGNMENT_PRIORITY:
+      self.greedy_assignment_array(population)
+    elif self.assignment_strategy == par.AssignmentStrategy.ASSIGNMENT_MATCHING:
+      self.assignment_matching_array(population)
+
+    if self.group_by_assignment:
+      self.shuffle_by_assignment_array(population)
 
   def update_assignments(self, population):
+    if population.array_backed:
+      self.update_assignments_array(population)
+      return
+
     if self.restrict_assignment:
-      for a in range(population.genome_size):
-        group = population.groups[a]
-        for individual in sorted(group.individuals, key = lambda i: i.genome.genes[a],
-                                 reverse = True) \
-                              [:population.assignment_sizes[a]]:
-          individual.assignment = a
+      self.restricted_assignment(population)
 
     else:
       if self.assignment_strategy == par.AssignmentStrategy.RANDOM:
@@ -121,3 +327,89 @@ class Assignment:
     
     if self.group_by_assignment:
       self.shuffle_by_assignment(population)
+
+  def get_assignment_distribution_batch(self, num_runs, population_size, genome_size):
+    assignment_priorities = np.tile(np.arange(genome_size), (num_runs, 1))
+    if self.randomize_assignment_priorities:
+      assignment_priorities = np.argsort(
+          self.assignment_priority_randomizer.random((num_runs, genome_size)), axis = 1)
+
+    default_group_size = int(population_size / genome_size)
+    assignment_sizes = np.full((num_runs, genome_size), default_group_size)
+    if self.randomize_assignment_sizes:
+      runs = np.arange(num_runs)
+      all_swap_indices = self.assignment_size_randomizer.integers(0, genome_size,
+                                                                  (population_size, num_runs, 2))
+      for swap_indices in all_swap_indices:
+        can_swap = assignment_sizes[runs, swap_indices[:, 0]] > int(default_group_size / 2)
+        assignment_sizes[runs[can_swap], swap_indices[can_swap, 0]] -= 1
+        assignment_sizes[runs[can_swap], swap_indices[can_swap, 1]] += 1
+    return (assignment_priorities, assignment_sizes)
+
+  def random_assignment_batch(self, batch):
+    order = np.argsort(self.random_assignment_picker.random(batch.assignments.shape), axis = 1)
+    slot_assignments = batch.get_slot_ids(batch.assignment_sizes, batch.assignments.shape[1])
+    np.put_along_axis(batch.assignments, order, slot_assignments, axis = 1)
+
+  def greedy_assignment_batch(self, batch):
+    runs = np.arange(batch.num_runs)
+    sorted_by_gene = np.argsort(-batch.genes, axis = 1, kind = 'stable')
+    taken = batch.assignments > -1
+    for k in range(batch.genome_size):
+      a = batch.assignment_priorities[:, k]
+      sorted_for_a = sorted_by_gene[runs, :, a]
+
+      available = ~np.take_along_axis(taken, sorted_for_a, axis = 1)
+      chosen = available & \
+                  (np.cumsum(available, axis = 1) <= batch.assignment_sizes[runs, a][:, np.newaxis])
+      chosen_runs = np.broadcast_to(runs[:, np.newaxis], chosen.shape)[chosen]
+      batch.assignments[chosen_runs, sorted_for_a[chosen]] = a[chosen_runs]
+      taken[chosen_runs, sorted_for_a[chosen]] = True
+
+  def assignment_matching_batch(self, batch):
+    # Solvers take one run at a time.
+    for r in range(batch.num_runs):
+      batch.assignments[r] = self.get_matching_assignments(batch.genes[r],
+                                                           batch.assignment_sizes[r])
+
+  def restricted_assignment_batch(self, batch):
+    runs = np.arange(batch.num_runs)[:, np.newaxis]
+    group_ids = np.maximum(batch.group_ids, 0)
+    genes_for_group = np.take_along_axis(batch.genes, group_ids[..., np.newaxis], axis = 2)[..., 0]
+
+    # Sort by group, then by gene for the group's assignment (descending) within each group.
+    order = np.lexsort((-genes_for_group, group_ids), axis = 1)
+
+    group_counts = batch.get_counts(batch.group_ids, batch.num_groups)
+    group_starts = np.cumsum(group_counts, axis = 1) - group_counts
+    sorted_group_ids = group_ids[runs, order]
+    ranks = np.arange(order.shape[1])[np.newaxis, :] - group_starts[runs, sorted_group_ids]
+
+    chosen = (batch.group_ids[runs, order] > -1) \
+                & (ranks < batch.assignment_sizes[runs, sorted_group_ids])
+    batch.assignments[runs, order] = np.where(chosen, sorted_group_ids,
+                                              batch.assignments[runs, order])
+
+  def shuffle_by_assignment_batch(self, batch):
+    runs = np.arange(batch.num_runs)[:, np.newaxis]
+    keys = np.where(batch.assignments > -1, batch.assignments, batch.genome_size)
+    order = np.argsort(keys, axis = 1, kind = 'stable')
+
+    batch.genes = batch.genes[runs, order]
+    batch.assignments = batch.assignments[runs, order]
+    batch.group_ids = batch.assignments.copy()
+    batch.group_sizes = batch.assignment_sizes.copy()
+    batch.group_assignments = np.tile(np.arange(batch.genome_size), (batch.num_runs, 1))
+
+  def update_assignments_batch(self, batch):
+    if self.restrict_assignment:
+      self.restricted_assignment_batch(batch)
+    elif self.assignment_strategy == par.AssignmentStrategy.RANDOM:
+      self.random_assignment_batch(batch)
+    elif self.assignment_strategy == par.AssignmentStrategy.ASSIGNMENT_PRIORITY:
+      self.greedy_assignment_batch(batch)
+    elif self.assignment_strategy == par.AssignmentStrategy.ASSIGNMENT_MATCHING:
+      self.assignment_matching_batch(batch)
+
+    if self.group_by_assignment:
+      self.shuffle_by_assignment_batch(batch)
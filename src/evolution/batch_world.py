@@ -0,0 +1,105 @@
+import numpy as np
+from datetime import datetime
+
+from containers import genome as gen
+from containers import population_batch as pbat
+from evolution import world as wrd
+from metrics import fitness as fit
+
+class BatchWorld:
+
+  def __init__(self, initial_batch, assignment, crossover, time_to_fitness_values,
+                num_generations, restrict_crossover = False, randomizers = None):
+    self.assignment = assignment
+    self.crossover = crossover
+    self.time_to_fitness_values = time_to_fitness_values
+    self.num_generations = num_generations
+    self.restrict_crossover = restrict_crossover
+
+    # Streams shared by all runs of the batch instead of the ones shared by all instances.
+    self.gene_randomizer = gen.Genome.GENE_RANDOMIZER
+    self.individuals_order_randomizer = wrd.World.INDIVIDUALS_ORDER_RANDOMIZER
+    if randomizers is not None:
+      self.gene_randomizer = randomizers.gene
+      self.individuals_order_randomizer = randomizers.individuals_order
+
+    self.fitness_arrays = np.zeros((initial_batch.num_runs, num_generations + 1,
+                                    1 + initial_batch.genome_size, 12))
+
+    self.current_generation = initial_batch
+    self.assign_purge_measure(self.current_generation, iteration_no = 0)
+
+  def assign_purge_measure(self, batch, iteration_no):
+    self.assignment.update_assignments_batch(batch)
+    self.fitness_arrays[:, iteration_no] = fit.FitnessUtil.get_fitness_array_batch(batch)
+
+  def new_generation(self, batch):
+    runs = np.arange(batch.num_runs)[:, np.newaxis]
+    fitness = batch.get_individual_fitness()
+    assigned = batch.assignments > -1
+    child_group_ids = batch.get_slot_ids(batch.group_sizes, batch.population_size)
+    assert (child_group_ids > -1).all()
+
+    if self.restrict_crossover:
+      (new_genes, empty) = self.crossover.crossover_batch(
+                                batch.genes, fitness,
+                                pool_ids = np.where(assigned, batch.group_ids, -1),
+                                pool_weights = assigned.astype(int),
+                                child_pool_ids = child_group_ids,
+                                num_pools = batch.num_groups)
+      new_genes[empty] = self.gene_randomizer.random((np.count_nonzero(empty),
+                                                      batch.genome_size))
+
+    else:
+      # Every individual is weighted by the no. of assigned individuals in its group.
+      assigned_per_group = batch.get_counts(np.where(assigned, batch.group_ids, -1),
+                                            batch.num_groups)
+      present = batch.group_ids > -1
+      (new_genes, _) = self.crossover.crossover_batch(
+                            batch.genes, fitness,
+                            pool_ids = np.where(present, 0, -1),
+                            pool_weights = np.where(
+                                present,
+                                assigned_per_group[runs, np.maximum(batch.group_ids, 0)], 0),
+                            child_pool_ids = np.zeros_like(child_group_ids),
+                            num_pools = 1)
+      order = np.argsort(self.individuals_order_randomizer.random(child_group_ids.shape),
+                         axis = 1)
+      new_genes = new_genes[runs, order]
+
+    (assignment_priorities, assignment_sizes) = \
+        self.assignment.get_assignment_distribution_batch(batch.num_runs,
+                                                          batch.population_size,
+                                                          batch.genome_size)
+    new_generation = pbat.PopulationBatch(batch.num_runs,
+                                          batch.population_size,
+                                          batch.num_groups,
+                                          batch.genome_size,
+                                          assignment_priorities = assignment_priorities,
+                                          assignment_sizes = assignment_sizes,
+                                          genes = new_genes,
+                                          group_ids = child_group_ids,
+                                          group_sizes = batch.group_sizes)
+    return new_generation
+
+  def evolve(self, show_iterations = False, show_every_n_iteration = 1):
+    if (show_every_n_iteration == 0):
+      show_every_n_iteration = 1
+
+    start_time = datetime.now()
+
+    for i in range(self.num_generations):
+      updated_generation = self.new_generation(self.current_generation)
+      self.assign_purge_measure(updated_generation, iteration_no = i + 1)
+      self.current_generation = updated_generation
+
+      if show_iterations and (i + 1) % show_every_n_iteration == 0:
+        print("ITERATION: {}\tAverage Fitness: {:.2}" \
+                .format(i + 1, np.mean(self.fitness_arrays[:, i + 1, 0, 0])))
+
+    end_time = datetime.now()
+
+    # Fitness of every run stacked as (num_runs, num_generations + 1, 1 + genome_size, 12).
+    run_time = (end_time - start_time) / self.current_generation.num_runs
+
+    return self.fitness_arrays, [run_time] * self.current_generation.num_runs
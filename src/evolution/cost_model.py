@@ -0,0 +1,55 @@
+import numpy as np
+
+import params as par
+
+class RunCostModel:
+
+  # Run time is modelled as c * iterations^w1 * population^w2 * assignments^w3 * groups^w4,
+  #   with c and w fitted per assignment strategy from past run times, in log space.
+  #   Without past run times, these exponents are used (c is 1).
+  DEFAULT_EXPONENTS = {
+      par.AssignmentStrategy.RANDOM: [1.0, 1.0, 1.0, 0.0],
+      par.AssignmentStrategy.ASSIGNMENT_PRIORITY: [1.0, 1.0, 1.0, 0.0],
+      par.AssignmentStrategy.ASSIGNMENT_MATCHING: [1.0, 2.0, 1.0, 0.0]}
+
+  # Weight of the default exponents against past run times when fitting.
+  #   Keeps estimates sensible when past runs only cover a few sizes.
+  PRIOR_WEIGHT = 1.0
+
+  def __init__(self, run_time_records = None):
+    # run_time_records are dicts as written by dataio.RunTimeIO.
+    if run_time_records is None:
+      run_time_records = []
+
+    self.weights = {}
+    for assignment_strategy, exponents in self.DEFAULT_EXPONENTS.items():
+      records = [r for r in run_time_records \
+                   if r['assignment_strategy'] == assignment_strategy.name and r['run_time'] > 0]
+      self.weights[assignment_strategy] = self.fit(records, np.array([0.0] + exponents))
+
+  @staticmethod
+  def get_features(population_size, num_groups, num_assignments, num_iterations):
+    return np.array([1.0, np.log(num_iterations), np.log(population_size),
+                     np.log(num_assignments), np.log(num_groups)])
+
+  def fit(self, records, prior_weights):
+    # Least squares on log run times, with exponents regularized towards the prior weights.
+    #   The constant is not regularized, so a single past run already calibrates it.
+    if not records:
+      return prior_weights
+
+    features = np.array([self.get_features(r['population_size'], r['num_groups'],
+                                           r['num_assignments'], r['num_iterations']) \
+                           for r in records])
+    log_run_times = np.log([r['run_time'] for r in records])
+
+    residuals = log_run_times - features @ prior_weights
+    regularization = self.PRIOR_WEIGHT * np.diag([0.0] + [1.0] * (len(prior_weights) - 1))
+    regularized = features.T @ features + regularization
+    return prior_weights + np.linalg.solve(regularized, features.T @ residuals)
+
+  def estimate(self, population_size, num_groups, num_assignments, num_iterations,
+               assignment_strategy, **run_params):
+    # Estimated time of one run of a configuration, in seconds once calibrated.
+    features = self.get_features(population_size, num_groups, num_assignments, num_iterations)
+    return float(np.exp(features @ self.weights[assignment_strategy]))
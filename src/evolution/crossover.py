@@ -2,41 +2,60 @@ import numpy as np
 
 from containers import genome as gen
 from containers import individual as ind
+from containers import population_batch as pbat
 
 class Crossover:
 
-  INDIVIDUAL_RANDOMIZER = np.random.RandomState()
-  CROSSOVER_RANDOMIZER = np.random.RandomState()
-  MUTATION_RANDOMIZER = np.random.RandomState()
-  MUTATED_GENE_RANDOMIZER = np.random.RandomState()
+  INDIVIDUAL_RANDOMIZER = np.random.default_rng()
+  CROSSOVER_RANDOMIZER = np.random.default_rng()
+  MUTATION_RANDOMIZER = np.random.default_rng()
+  MUTATED_GENE_RANDOMIZER = np.random.default_rng()
 
-  def __init__(self, crossover_beta_param, mutation_rate, interpolate_genes):
+  def __init__(self, crossover_beta_param, mutation_rate, interpolate_genes, randomizers = None):
     self.crossover_beta_param = crossover_beta_param
     self.mutation_rate = mutation_rate
     self.interpolate_genes = interpolate_genes
 
-  def crossover_genomes(self, genome1, genome2, genome_size):
-    g = gen.Genome(genome_size = genome_size, randomize = False)
-
-    for i in range(genome_size):
-      if self.interpolate_genes:
-        sample = self.CROSSOVER_RANDOMIZER.beta(self.crossover_beta_param,
-                                                self.crossover_beta_param)
-        g.genes[i] = genome1[i] + sample * (genome2[i] - genome1[i])
-
-      else:
-        choice = self.CROSSOVER_RANDOMIZER.randint(0, 2)
-        if choice == 0:
-          g.genes[i] = genome1[i]
-        elif choice == 1:
-          g.genes[i] = genome2[i]
+    # Streams of a single run instead of the ones shared by all instances.
+    self.individual_randomizer = self.INDIVIDUAL_RANDOMIZER
+    self.crossover_randomizer = self.CROSSOVER_RANDOMIZER
+    self.mutation_randomizer = self.MUTATION_RANDOMIZER
+    self.mutated_gene_randomizer = self.MUTATED_GENE_RANDOMIZER
+    if randomizers is not None:
+      self.individual_randomizer = randomizers.individual
+      self.crossover_randomizer = randomizers.crossover
+      self.mutation_randomizer = randomizers.mutation
+      self.mutated_gene_randomizer = randomizers.mutated_gene
+
+  def crossover_gene_matrices(self, genes_1, genes_2):
+    # All children at once: row i of the output is the child of row i of each input.
+    if self.interpolate_genes:
+      samples = self.crossover_randomizer.beta(self.crossover_beta_param,
+                                               self.crossover_beta_param, genes_1.shape)
+      out = genes_1 + samples * (genes_2 - genes_1)
+    else:
+      choices = self.crossover_randomizer.integers(0, 2, genes_1.shape)
+      out = np.where(choices == 0, genes_1, genes_2)
+
+    mutated = self.mutation_randomizer.random(genes_1.shape) < self.mutation_rate
+    out[mutated] = self.mutated_gene_randomizer.random(np.count_nonzero(mutated))
 
-      if self.MUTATION_RANDOMIZER.rand() < self.mutation_rate:
-        g.genes[i] = self.MUTATED_GENE_RANDOMIZER.rand()
-
-    return g
+    return out
 
-  def crossover(self, individuals_1, individuals_2, out_size):
+  def crossover_genomes(self, genome1, genome2, genome_size):
+    genes = self.crossover_gene_matrices(np.reshape(genome1, (1, genome_size)),
+                                         np.reshape(genome2, (1, genome_size)))[0]
+    return gen.Genome(genome_size = genome_size, genes = genes)
+
+  def get_parent_indices(self, sorted_weights, out_size):
+    # Beta-distributed picks from a list sorted by descending fitness, as if every candidate were
+    #   repeated by its weight. With all weights 1, this is a pick from the list itself.
+    cumulative_weights = np.cumsum(sorted_weights)
+    picks = (self.individual_randomizer.beta(1.0, self.crossover_beta_param, out_size) \
+                * cumulative_weights[-1]).astype(int)
+    return np.searchsorted(cumulative_weights, picks, side = 'right')
+
+  def crossover(self, individuals_1, individuals_2, out_size, weights_1 = None, weights_2 = None):
     if len(individuals_1) == 0 or len(individuals_2) == 0:
       return []
 
@@ -44,23 +63,84 @@ class Crossover:
     genome_size_check = individuals_2[0].genome_size
     assert(genome_size == genome_size_check)
 
-    i1 = sorted(individuals_1, key = lambda i: i.get_fitness(), reverse = True)
-    i2 = sorted(individuals_2, key = lambda i: i.get_fitness(), reverse = True)
-
-    i1_indices = [int(x * len(i1)) \
-                    for x in self.INDIVIDUAL_RANDOMIZER.beta(
-                        1.0, self.crossover_beta_param, out_size)]
-    i2_indices = [int(x * len(i2)) \
-                    for x in self.INDIVIDUAL_RANDOMIZER.beta(
-                        1.0, self.crossover_beta_param, out_size)]
+    fitness_1 = np.array([i.get_fitness() for i in individuals_1])
+    fitness_2 = np.array([i.get_fitness() for i in individuals_2])
+    genes_1 = np.array([i.get_genes() for i in individuals_1])
+    genes_2 = np.array([i.get_genes() for i in individuals_2])
 
     out = []
-    for i in range(out_size):
-      g1 = i1[i1_indices[i]].genome.genes
-      g2 = i2[i2_indices[i]].genome.genes
-
+    for genes in self.crossover_array(genes_1, fitness_1, genes_2, fitness_2, out_size,
+                                      weights_1 = weights_1, weights_2 = weights_2):
       o = ind.Individual(genome_size = genome_size,
-                         genome = self.crossover_genomes(g1, g2, genome_size))
+                         genome = gen.Genome(genome_size = genome_size, genes = genes))
       out.append(o)
 
     return out
+
+  def crossover_array(self, genes_1, fitness_1, genes_2, fitness_2, out_size,
+                      weights_1 = None, weights_2 = None):
+    # Each candidate is picked as if it were in the pool weights times (once by default).
+    if weights_1 is None:
+      weights_1 = np.ones(len(genes_1), dtype = int)
+    if weights_2 is None:
+      weights_2 = np.ones(len(genes_2), dtype = int)
+    if np.sum(weights_1) == 0 or np.sum(weights_2) == 0:
+      return np.zeros((0, genes_1.shape[1]))
+
+    genome_size = genes_1.shape[1]
+    assert(genome_size == genes_2.shape[1])
+
+    order_1 = np.argsort(-fitness_1, kind = 'stable')
+    order_2 = np.argsort(-fitness_2, kind = 'stable')
+
+    i1_indices = order_1[self.get_parent_indices(np.asarray(weights_1)[order_1], out_size)]
+    i2_indices = order_2[self.get_parent_indices(np.asarray(weights_2)[order_2], out_size)]
+
+    return self.crossover_gene_matrices(genes_1[i1_indices], genes_2[i2_indices])
+
+  def get_parent_indices_batch(self, pool_weights, pool_starts, pool_totals):
+    # Beta-distributed picks into each child's pool as if every candidate were repeated by its
+    #   weight in a list sorted by descending fitness.
+    #   pool_weights are in that sorted order, and pool_starts and pool_totals are per child.
+    (num_runs, num_candidates) = pool_weights.shape
+    cumulative_weights = np.cumsum(pool_weights, axis = 1)
+    run_offsets = (cumulative_weights[:, -1].max() + 1) * np.arange(num_runs)[:, np.newaxis]
+
+    picks = (self.individual_randomizer.beta(1.0, self.crossover_beta_param, pool_starts.shape) \
+                * pool_totals).astype(int) + pool_starts
+    indices = np.searchsorted((cumulative_weights + run_offsets).ravel(),
+                              (picks + run_offsets).ravel(), side = 'right')
+    return indices.reshape(pool_starts.shape) \
+              - num_candidates * np.arange(num_runs)[:, np.newaxis]
+
+  def crossover_batch(self, genes, fitness, pool_ids, pool_weights, child_pool_ids, num_pools):
+    # Crossover for many pools in many runs at once.
+    #   genes is (num_runs, n, genome_size), fitness, pool_ids and pool_weights are (num_runs, n),
+    #   each candidate is in one pool (-1 for none) and is picked as if repeated pool_weights times.
+    #   Children are drawn from the pools in child_pool_ids, (num_runs, out_size).
+    #   Returns the children and a mask of children whose pool was empty.
+    runs = np.arange(genes.shape[0])[:, np.newaxis]
+    pool_keys = np.where(pool_ids > -1, pool_ids, num_pools)
+
+    order = np.argsort(-fitness, axis = 1, kind = 'stable')
+    order = np.take_along_axis(order,
+                               np.argsort(pool_keys[runs, order], axis = 1, kind = 'stable'),
+                               axis = 1)
+    sorted_weights = np.where(pool_ids[runs, order] > -1, pool_weights[runs, order], 0)
+
+    pool_totals = pbat.PopulationBatch.get_counts(pool_ids, num_pools, weights = pool_weights) \
+                    .astype(int)
+    pool_starts = np.cumsum(pool_totals, axis = 1) - pool_totals
+
+    child_totals = np.take_along_axis(pool_totals, child_pool_ids, axis = 1)
+    child_starts = np.take_along_axis(pool_starts, child_pool_ids, axis = 1)
+    empty = child_totals == 0
+
+    parents_1 = order[runs, np.minimum(
+        self.get_parent_indices_batch(sorted_weights, child_starts, child_totals),
+        order.shape[1] - 1)]
+    parents_2 = order[runs, np.minimum(
+        self.get_parent_indices_batch(sorted_weights, child_starts, child_totals),
+        order.shape[1] - 1)]
+
+    return (self.crossover_gene_matrices(genes[runs, parents_1], genes[runs, parents_2]), empty)
@@ -0,0 +1,89 @@
+import math
+import numpy as np
+
+class BlockRandomizer:
+
+  # No. of uniform samples drawn from the generator at a time.
+  BLOCK_SIZE = 1 << 16
+
+  def __init__(self, generator):
+    # Serves draws as slices of large blocks of uniform samples from a Generator,
+    #   so that the many small draws of a generation cost one generator call between them.
+    self.generator = generator
+    self.block_state = generator.bit_generator.state
+    self.block = np.zeros(0)
+    self.position = 0
+
+  def __getstate__(self):
+    # Pickle the generator state the block was drawn from instead of the block itself.
+    state = self.__dict__.copy()
+    state['block'] = len(self.block)
+    return state
+
+  def __setstate__(self, state):
+    # The generator may have moved on from the block by drawing from it directly.
+    self.__dict__.update(state)
+    generator_state = self.generator.bit_generator.state
+    self.generator.bit_generator.state = self.block_state
+    self.block = self.generator.random(state['block'])
+    self.generator.bit_generator.state = generator_state
+
+  def random(self, size = None):
+    if size is None:
+      return self.random(1)[0]
+    count = math.prod(size) if isinstance(size, tuple) else int(size)
+    start = self.position
+    if start + count > len(self.block):
+      self.block_state = self.generator.bit_generator.state
+      self.block = self.generator.random(max(self.BLOCK_SIZE, count))
+      start = 0
+    self.position = start + count
+    samples = self.block[start : start + count]
+    return samples.reshape(size) if isinstance(size, tuple) else samples
+
+  def integers(self, low, high, size = None):
+    return (low + self.random(size) * (high - low)).astype(int)
+
+  def beta(self, a, b, size = None):
+    # Inverse of the cdf 1 - (1 - x)^b when a is 1, as used to pick crossover parents.
+    if a == 1.0:
+      return 1.0 - (1.0 - self.random(size)) ** (1.0 / b)
+    return self.generator.beta(a, b, size)
+
+  def permutation(self, n):
+    return np.argsort(self.random(n), kind = 'stable')
+
+  def shuffle(self, x):
+    order = self.permutation(len(x))
+    if isinstance(x, np.ndarray):
+      x[:] = x[order]
+    else:
+      x[:] = [x[i] for i in order]
+
+class RunRandomizers:
+
+  # No. of independent streams spawned for every run.
+  NUM_STREAMS = 9
+
+  def __init__(self, experiment_seed = None, run_no = 0):
+    # Streams of a run are spawned from the experiment seed and the run no. only,
+    #   so a run gives the same results whichever worker evolves it and in whatever order.
+    #   A seed of None draws a new experiment seed from the OS.
+    seed_sequence = np.random.SeedSequence(experiment_seed, spawn_key = (run_no,))
+    self.experiment_seed = seed_sequence.entropy
+    self.run_no = run_no
+
+    (self.gene,
+     self.individuals_order,
+     self.random_assignment_picker,
+     self.assignment_priority,
+     self.assignment_size,
+     self.individual,
+     self.crossover,
+     self.mutation,
+     self.mutated_gene) = [BlockRandomizer(np.random.Generator(np.random.PCG64(s))) \
+                             for s in seed_sequence.spawn(self.NUM_STREAMS)]
+
+  @staticmethod
+  def new_experiment_seed():
+    return np.random.SeedSequence().entropy
@@ -0,0 +1,45 @@
+from collections import namedtuple
+
+import params as par
+
+class RunSpec(namedtuple('RunSpec', ['population_size', 'num_groups', 'num_assignments',
+                                     'num_iterations', 'evolution_strategy',
+                                     'assignment_strategy', 'randomize_assignment_priorities',
+                                     'randomize_assignment_sizes', 'matching_solver',
+                                     'array_backed', 'crossover_beta_param', 'mutation_rate',
+                                     'interpolate_genes', 'time_to_fitness_values',
+                                     'stop_when_all_reached', 'stop_plateau_generations',
+                                     'stop_plateau_epsilon', 'fitness_stream_buffer',
+                                     'save_state_generations',
+                                     'experiment_seed', 'run_no', 'datetime_string'])):
+  # Everything a worker needs to build and evolve the World of one run by itself,
+  #   so only this small tuple is sent to the worker instead of a pickled World.
+  __slots__ = ()
+
+  @staticmethod
+  def from_params(population_size, num_groups, num_assignments, num_iterations,
+                  evolution_strategy, assignment_strategy, randomize_assignment_priorities,
+                  randomize_assignment_sizes, experiment_seed, run_no, datetime_string = ''):
+    # Params that are not swept are read here, in the parent, as workers may not see changes.
+    return RunSpec(population_size = population_size,
+                   num_groups = num_groups,
+                   num_assignments = num_assignments,
+                   num_iterations = num_iterations,
+                   evolution_strategy = evolution_strategy,
+                   assignment_strategy = assignment_strategy,
+                   randomize_assignment_priorities = randomize_assignment_priorities,
+                   randomize_assignment_sizes = randomize_assignment_sizes,
+                   matching_solver = par.WorldParams.MATCHING_SOLVER,
+                   array_backed = par.PopulationParams.ARRAY_BACKED,
+                   crossover_beta_param = par.CrossoverParams.CROSSOVER_BETA_PARAM,
+                   mutation_rate = par.CrossoverParams.MUTATION_RATE,
+                   interpolate_genes = par.CrossoverParams.INTERPOLATE_GENES,
+                   time_to_fitness_values = tuple(par.FitnessParams.TIME_TO_FITNESS_VALUES),
+                   stop_when_all_reached = par.WorldParams.STOP_WHEN_ALL_REACHED,
+                   stop_plateau_generations = par.WorldParams.STOP_PLATEAU_GENERATIONS,
+                   stop_plateau_epsilon = par.WorldParams.STOP_PLATEAU_EPSILON,
+                   fitness_stream_buffer = par.DebugParams.STREAM_RUN_FITNESS_BUFFER,
+                   save_state_generations = par.WorldParams.SAVE_RUN_STATE_GENERATIONS,
+                   experiment_seed = experiment_seed,
+                   run_no = run_no,
+                   datetime_string = datetime_string)
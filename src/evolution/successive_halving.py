@@ -0,0 +1,42 @@
+import math
+
+class SuccessiveHalving:
+
+  # Tuning cells are first evolved with a small budget of runs and iterations. After each round
+  #   only the best 1 / eta of the cells are promoted, with eta times the budget of the round
+  #   before, up to the full budget in the last round. One round is the full grid.
+  def __init__(self, num_runs, num_iterations, num_rounds = 1, eta = 3, by_time_to = False):
+    self.num_runs = num_runs
+    self.num_iterations = num_iterations
+    self.num_rounds = num_rounds
+    self.eta = eta
+    self.by_time_to = by_time_to
+
+  def get_budget(self, round_no):
+    # (num_runs, num_iterations) of every cell in a round.
+    scale = self.eta ** (self.num_rounds - 1 - round_no)
+    return (max(1, math.ceil(self.num_runs / scale)),
+            max(1, math.ceil(self.num_iterations / scale)))
+
+  def is_last_round(self, round_no):
+    return round_no == self.num_rounds - 1
+
+  def get_score(self, final_fitness):
+    # Lower is better. By time to fitness, cells that never reached the time to fitness value
+    #   rank last, and ties (most cells in early rounds of few iterations) go to the higher
+    #   final population fitness.
+    (final_population_fitness, time_to_fitness) = final_fitness[:2]
+    if not self.by_time_to:
+      return -final_population_fitness
+    if math.isnan(time_to_fitness):
+      return (math.inf, -final_population_fitness)
+    return (time_to_fitness, -final_population_fitness)
+
+  def get_promoted(self, cells, final_fitness):
+    # Best ceil(len(cells) / eta) of cells, in the order of cells. final_fitness has the
+    #   (final population fitness, time to fitness, no. of runs aggregated) of each cell,
+    #   see FitnessHistoryIO.read_final_population_fitness. Ties keep the earlier cell.
+    num_promoted = max(1, math.ceil(len(cells) / self.eta))
+    ranked = sorted(cells, key = lambda cell: self.get_score(final_fitness[cell]))
+    promoted = set(ranked[:num_promoted])
+    return [cell for cell in cells if cell in promoted]
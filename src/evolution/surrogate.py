@@ -0,0 +1,80 @@
+import numpy as np
+from scipy import stats
+
+class GaussianProcessSurrogate:
+
+  # Gaussian process regression of a target on features scaled to [0, 1], with a squared
+  #   exponential kernel. Targets are normalized, and the length scale and noise level are
+  #   the pair of these with the highest marginal likelihood.
+  LENGTH_SCALES = [0.05, 0.1, 0.2, 0.5, 1.0]
+  NOISE_LEVELS = [1e-4, 1e-2, 1e-1]
+
+  def __init__(self, features, targets):
+    targets = np.asarray(targets, dtype = float)
+    self.target_mean = np.mean(targets)
+    self.target_scale = np.std(targets) if np.std(targets) > 0 else 1.0
+
+    self.features = np.asarray(features, dtype = float)
+    self.targets = (targets - self.target_mean) / self.target_scale
+    (self.length_scale, self.noise_level) = max(
+        [(l, n) for l in self.LENGTH_SCALES for n in self.NOISE_LEVELS],
+        key = lambda ln: self.fit(*ln))
+    self.fit(self.length_scale, self.noise_level)
+
+  @staticmethod
+  def get_kernel(features_1, features_2, length_scale):
+    squared_distances = np.sum(features_1 ** 2, axis = 1)[:, np.newaxis] \
+                          + np.sum(features_2 ** 2, axis = 1)[np.newaxis] \
+                          - 2 * features_1 @ features_2.T
+    return np.exp(-0.5 * np.maximum(squared_distances, 0) / length_scale ** 2)
+
+  def fit(self, length_scale, noise_level):
+    # Returns the log marginal likelihood of the normalized targets.
+    kernel = self.get_kernel(self.features, self.features, length_scale)
+    self.cholesky = np.linalg.cholesky(kernel + noise_level * np.eye(len(self.features)))
+    self.alpha = np.linalg.solve(self.cholesky.T, np.linalg.solve(self.cholesky, self.targets))
+    return -0.5 * self.targets @ self.alpha - np.sum(np.log(np.diag(self.cholesky))) \
+              - 0.5 * len(self.targets) * np.log(2 * np.pi)
+
+  def predict(self, features):
+    # Mean and standard deviation of the target at each row of features.
+    kernel = self.get_kernel(np.asarray(features, dtype = float), self.features,
+                             self.length_scale)
+    mean = kernel @ self.alpha
+    v = np.linalg.solve(self.cholesky, kernel.T)
+    std = np.sqrt(np.maximum(1.0 - np.sum(v ** 2, axis = 0), 0))
+    return (self.target_mean + mean * self.target_scale, std * self.target_scale)
+
+  def get_expected_improvement(self, features):
+    # Expected improvement over the highest target, higher targets being better.
+    (mean, std) = self.predict(features)
+    improvement = mean - (self.target_mean + np.max(self.targets) * self.target_scale)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+      z = improvement / std
+      expected_improvement = improvement * stats.norm.cdf(z) + std * stats.norm.pdf(z)
+    return np.where(std > 0, expected_improvement, np.maximum(improvement, 0))
+
+  def get_batch(self, features, batch_size, costs = None):
+    # Indices of batch_size rows of features to evaluate together, each with the highest
+    #   expected improvement (per cost, if given) once the ones before it are taken to have
+    #   their predicted mean as target (a kriging believer). The fit is not changed.
+    length_scale, noise_level = self.length_scale, self.noise_level
+    (observed_features, observed_targets) = (self.features, self.targets)
+
+    batch = []
+    for _ in range(min(batch_size, len(features))):
+      score = self.get_expected_improvement(features)
+      if costs is not None:
+        score = score / costs
+      score[batch] = -np.inf
+      i = int(np.argmax(score))
+      batch.append(i)
+
+      (mean, _) = self.predict(features[i : i + 1])
+      self.features = np.vstack([self.features, features[i : i + 1]])
+      self.targets = np.append(self.targets, (mean[0] - self.target_mean) / self.target_scale)
+      self.fit(length_scale, noise_level)
+
+    (self.features, self.targets) = (observed_features, observed_targets)
+    self.fit(length_scale, noise_level)
+    return batch
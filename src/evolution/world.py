@@ -1,6 +1,7 @@
 import numpy as np
 from datetime import datetime
 
+from containers import genome as gen
 from containers import population as pop
 from containers import group as grp
 from metrics import fitness as fit
@@ -8,13 +9,18 @@ from metrics import graph as grph
 
 class World:
 
-  INDIVIDUALS_ORDER_RANDOMIZER = np.random.RandomState()
+  INDIVIDUALS_ORDER_RANDOMIZER = np.random.default_rng()
 
   def __init__(self, initial_population, assignment, crossover, fitness_history, num_generations,
                 restrict_crossover = False,
                 randomize_assignment_priorities = False,
                 randomize_assignment_sizes = False,
-                pio = None):
+                pio = None,
+                randomizers = None,
+                sio = None,
+                stop_when_all_reached = False,
+                stop_plateau_generations = 0,
+                stop_plateau_epsilon = 0.0):
     self.assignment = assignment
     self.crossover = crossover
     self.fitness_history = fitness_history
@@ -23,14 +29,46 @@ class World:
     self.randomize_assignment_priorities = randomize_assignment_priorities
     self.randomize_assignment_sizes = randomize_assignment_sizes
     self.pio = pio
+    self.sio = sio
+    self.stop_when_all_reached = stop_when_all_reached
+    self.stop_plateau_generations = stop_plateau_generations
+    self.stop_plateau_epsilon = stop_plateau_epsilon
+
+    # Streams of a single run instead of the ones shared by all instances.
+    self.gene_randomizer = gen.Genome.GENE_RANDOMIZER
+    self.individuals_order_randomizer = self.INDIVIDUALS_ORDER_RANDOMIZER
+    if randomizers is not None:
+      self.gene_randomizer = randomizers.gene
+      self.individuals_order_randomizer = randomizers.individuals_order
 
     self.current_generation = initial_population
-    self.assign_purge_measure(self.current_generation, iteration_no = 0)
+    self.iteration_no = 0
+    # Best population fitness so far, counting only improvements by more than the epsilon,
+    #   and the iteration it was reached at.
+    self.plateau_fitness = -np.inf
+    self.plateau_iteration = 0
+    fitness_data = self.assign_purge_measure(self.current_generation, iteration_no = 0)
+    self.update_stopping_rules(0, fitness_data)
 
   def assign_purge_measure(self, population, iteration_no):
     self.assignment.update_assignments(population)
     fitness_data = fit.FitnessData.from_population(population)
     self.fitness_history.update_fitness_history(iteration_no, fitness_data)
+    return fitness_data
+
+  def update_stopping_rules(self, iteration_no, fitness_data):
+    # True once the run should stop early, see WorldParams.STOP_WHEN_ALL_REACHED.
+    population_fitness = fitness_data.data['population']['fitness']
+    if population_fitness > self.plateau_fitness + self.stop_plateau_epsilon:
+      self.plateau_fitness = population_fitness
+      self.plateau_iteration = iteration_no
+    if self.stop_plateau_generations > 0 \
+        and iteration_no - self.plateau_iteration >= self.stop_plateau_generations:
+      return True
+
+    reached = self.fitness_history.history['time_to']['population']
+    return self.stop_when_all_reached \
+        and all([f in reached for f in self.fitness_history.time_to_fitness_values])
   
   def process_checkpoint(self, iteration_no, generation, show_iterations, show_stats_at_checkpoints,
                           show_run_genomes, show_run_fitness, save_genomes_at_checkpoints,
@@ -56,23 +94,81 @@ class World:
                 show_genome_assignments = show_genome_assignments,
                 savefile = population_graph_filename)
 
+  def save_state(self):
+    # Buffered fitness is written first, so the saved state and the fitness stream agree.
+    if self.fitness_history.fitness_stream:
+      self.fitness_history.fitness_stream.flush()
+    self.sio.write_world(self)
+
+  def new_generation_array(self, population):
+    fitness = population.get_individual_fitness()
+    assigned = population.assignments > -1
+
+    if self.restrict_crossover:
+      new_genes = []
+      for g in range(population.num_groups):
+        pool = np.flatnonzero((population.group_ids == g) & assigned)
+        crossed = self.crossover.crossover_array(population.genes[pool], fitness[pool],
+                                                 population.genes[pool], fitness[pool],
+                                                 population.group_sizes[g])
+        if len(crossed) == 0:
+          crossed = self.gene_randomizer.random((population.group_sizes[g],
+                                                 population.genome_size))
+        new_genes.append(crossed)
+      new_genes = np.concatenate(new_genes)
+
+    else:
+      # Every individual is weighted by the no. of assigned individuals in its group.
+      assigned_per_group = np.bincount(population.group_ids[assigned],
+                                       minlength = population.num_groups)
+      pool_weights = assigned_per_group[population.group_ids]
+      new_genes = self.crossover.crossover_array(population.genes, fitness,
+                                                 population.genes, fitness,
+                                                 population.population_size,
+                                                 weights_1 = pool_weights,
+                                                 weights_2 = pool_weights)
+      new_genes = new_genes[self.individuals_order_randomizer.permutation(len(new_genes))]
+
+    (assignment_priorities, assignment_sizes) = \
+        self.assignment.get_assignment_distribution(population.population_size,
+                                                    population.genome_size)
+    new_generation = pop.Population(population.population_size,
+                                    population.num_groups,
+                                    population.genome_size,
+                                    assignment_priorities = assignment_priorities,
+                                    assignment_sizes = assignment_sizes,
+                                    array_backed = True,
+                                    genes = new_genes,
+                                    group_ids = np.repeat(np.arange(population.num_groups),
+                                                          population.group_sizes),
+                                    group_sizes = population.group_sizes)
+    return new_generation
+
   def new_generation(self, population):
+    if population.array_backed:
+      return self.new_generation_array(population)
+
     new_groups = []
 
     if self.restrict_crossover:
       for g in population.groups:
         crossover_pool = [i for i in g.individuals if i.has_assignment()]
         crossed = self.crossover.crossover(crossover_pool, crossover_pool, g.group_size)
-        new_groups.append(grp.Group(g.group_size, g.genome_size, individuals = crossed))
+        new_groups.append(grp.Group(g.group_size, g.genome_size, individuals = crossed,
+                                    gene_randomizer = self.gene_randomizer))
 
     else:
+      # Every individual is weighted by the no. of assigned individuals in its group.
       crossover_pool = []
+      crossover_weights = []
       for g in population.groups:
-        for i in g.individuals:
-          if i.has_assignment():
-            crossover_pool += g.individuals
-      crossed = self.crossover.crossover(crossover_pool, crossover_pool, population.population_size)
-      self.INDIVIDUALS_ORDER_RANDOMIZER.shuffle(crossed)
+        num_assigned = len([i for i in g.individuals if i.has_assignment()])
+        crossover_pool += g.individuals
+        crossover_weights += [num_assigned] * len(g.individuals)
+      crossed = self.crossover.crossover(crossover_pool, crossover_pool, population.population_size,
+                                         weights_1 = crossover_weights,
+                                         weights_2 = crossover_weights)
+      self.individuals_order_randomizer.shuffle(crossed)
       already_assigned = 0
       for g in population.groups:
         new_group_individuals = crossed[already_assigned : already_assigned + g.group_size]
@@ -97,26 +193,41 @@ class World:
               show_run_fitness = False,
               show_stats_at_checkpoints = False,
               save_genomes_at_checkpoints = False,
-              show_genome_assignments = False):
+              show_genome_assignments = False,
+              save_state_every_n_iteration = 0):
+    # Continues from iteration_no, which is only past 0 for a World restored from saved state.
     if (show_every_n_iteration == 0):
       show_every_n_iteration = 1
     
     start_time = datetime.now()
 
-    self.process_checkpoint(0, self.current_generation, show_iterations, show_stats_at_checkpoints,
-                            show_run_genomes, show_run_fitness, save_genomes_at_checkpoints,
-                            show_genome_assignments)
+    if self.iteration_no == 0:
+      self.process_checkpoint(0, self.current_generation, show_iterations,
+                              show_stats_at_checkpoints, show_run_genomes, show_run_fitness,
+                              save_genomes_at_checkpoints, show_genome_assignments)
 
-    for i in range(self.num_generations):
+    for i in range(self.iteration_no, self.num_generations):
       updated_generation = self.new_generation(self.current_generation)
-      self.assign_purge_measure(updated_generation, iteration_no = i + 1)
+      fitness_data = self.assign_purge_measure(updated_generation, iteration_no = i + 1)
       self.current_generation = updated_generation
+      self.iteration_no = i + 1
 
       is_checkpoint = (i + 1) % show_every_n_iteration == 0
       if is_checkpoint:
         self.process_checkpoint(i + 1, self.current_generation, show_iterations,
                                 show_stats_at_checkpoints, show_run_genomes, show_run_fitness,
                                 save_genomes_at_checkpoints, show_genome_assignments)
+
+      # Checked before saving state, so a run restored from its state has not stopped.
+      if self.update_stopping_rules(i + 1, fitness_data):
+        if show_iterations:
+          print("STOPPED AT ITERATION: {}".format(i + 1))
+        self.fitness_history.carry_forward(i + 1, fitness_data, self.num_generations)
+        break
+
+      if self.sio and save_state_every_n_iteration > 0 \
+          and (i + 1) % save_state_every_n_iteration == 0 and i + 1 < self.num_generations:
+        self.save_state()
     
     end_time = datetime.now()
 
@@ -1,13 +1,17 @@
 import numpy as np
-from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
-from time import sleep
 
 import params as par
 from containers import population as pop
+from containers import population_batch as pbat
 from evolution import crossover as crs
 from evolution import assignment as ass
 from evolution import world as wrd
+from evolution import batch_world as bwrd
+from evolution import cost_model as cst
+from evolution import randomizers as rnd
+from evolution import run_spec as rspec
 from metrics import fitness as fit
 from metrics import dataio as dat
 
@@ -23,11 +27,14 @@ def get_evolution_constraints(evolution_strategy):
                           par.EvolutionStrategy.ALL_RESTRICTIONS]
   return (restrict_crossover, restrict_assignment, group_by_assignment)
 
+def is_population_divisible(num_divisions, population_size):
+  return num_divisions > 0 \
+      and population_size > num_divisions \
+      and population_size % num_divisions == 0 \
+      and population_size / num_divisions >= 2.0
+
 def check_population_divisibility(num_divisions, population_size):
-  assert num_divisions > 0
-  assert population_size > num_divisions
-  assert population_size % num_divisions == 0
-  assert population_size / num_divisions >= 2.0
+  assert is_population_divisible(num_divisions, population_size)
 
 def validate_params():
   check_population_divisibility(par.PopulationParams.NUM_GROUPS,
@@ -39,133 +46,382 @@ def validate_params():
   assert par.WorldParams.NUM_GENERATIONS >= 10
 
   assert len(par.FitnessParams.TIME_TO_FITNESS_VALUES) > 0
+  assert par.DebugParams.STREAM_RUN_FITNESS_BUFFER >= 0
+  assert par.WorldParams.SAVE_RUN_STATE_GENERATIONS >= 0
+  assert par.WorldParams.STOP_PLATEAU_GENERATIONS >= 0
+  assert par.WorldParams.STOP_PLATEAU_EPSILON >= 0
+  if par.WorldParams.ADAPTIVE_RUNS:
+    assert not par.WorldParams.BATCH_RUNS
+    assert 2 <= par.WorldParams.ADAPTIVE_MIN_RUNS <= par.WorldParams.NUM_RUNS
+    assert par.WorldParams.ADAPTIVE_RUNS_WAVE > 0
+    assert 0 < par.WorldParams.ADAPTIVE_CONFIDENCE < 1
+    assert par.WorldParams.ADAPTIVE_FITNESS_INTERVAL_WIDTH > 0
+    assert par.WorldParams.ADAPTIVE_TIME_TO_INTERVAL_WIDTH > 0
 
   if par.DebugParams.SHOW_ITERATIONS \
       or par.DebugParams.SAVE_GENOMES_AT_CHECKPOINTS \
       or par.DebugParams.SHOW_STATS_AT_CHECKPOINTS:
     assert par.WorldParams.NUM_RUNS == 1
+  if par.WorldParams.BATCH_RUNS:
+    assert not par.DebugParams.SAVE_GENOMES_AT_CHECKPOINTS
+    assert not par.DebugParams.SHOW_STATS_AT_CHECKPOINTS
+    assert not par.DebugParams.SHOW_RUN_GENOMES
+    assert not par.DebugParams.SHOW_RUN_FITNESS
 
-def initialize_world(population_size, num_iterations, num_groups,
-                      num_assignments, assignment_strategy,
-                      randomize_assignment_priorities, randomize_assignment_sizes,
-                      restrict_crossover, restrict_assignment, group_by_assignment, pio):
+def initialize_world(run_spec, pio = None, sio = None):
+  (restrict_crossover, restrict_assignment, group_by_assignment) = \
+      get_evolution_constraints(run_spec.evolution_strategy)
+  randomizers = rnd.RunRandomizers(run_spec.experiment_seed, run_no = run_spec.run_no)
 
-  a = ass.Assignment(assignment_strategy = assignment_strategy,
+  a = ass.Assignment(assignment_strategy = run_spec.assignment_strategy,
                       restrict_assignment = restrict_assignment,
                       group_by_assignment = group_by_assignment,
-                      randomize_assignment_priorities = randomize_assignment_priorities,
-                      randomize_assignment_sizes = randomize_assignment_sizes)
+                      randomize_assignment_priorities = run_spec.randomize_assignment_priorities,
+                      randomize_assignment_sizes = run_spec.randomize_assignment_sizes,
+                      matching_solver = run_spec.matching_solver,
+                      randomizers = randomizers)
   (assignment_priorities, assignment_sizes) = \
-      a.get_assignment_distribution(population_size, num_assignments)
+      a.get_assignment_distribution(run_spec.population_size, run_spec.num_assignments)
 
-  p = pop.Population(population_size = population_size,
-                      num_groups = num_groups,
-                      genome_size = num_assignments,
+  p = pop.Population(population_size = run_spec.population_size,
+                      num_groups = run_spec.num_groups,
+                      genome_size = run_spec.num_assignments,
                       assignment_priorities = assignment_priorities,
-                      assignment_sizes = assignment_sizes)
+                      assignment_sizes = assignment_sizes,
+                      array_backed = run_spec.array_backed,
+                      gene_randomizer = randomizers.gene)
 
-  c = crs.Crossover(crossover_beta_param = par.CrossoverParams.CROSSOVER_BETA_PARAM,
-                    mutation_rate = par.CrossoverParams.MUTATION_RATE,
-                    interpolate_genes = par.CrossoverParams.INTERPOLATE_GENES)
+  c = crs.Crossover(crossover_beta_param = run_spec.crossover_beta_param,
+                    mutation_rate = run_spec.mutation_rate,
+                    interpolate_genes = run_spec.interpolate_genes,
+                    randomizers = randomizers)
 
-  f = fit.FitnessHistory(time_to_fitness_values = par.FitnessParams.TIME_TO_FITNESS_VALUES,
-                         genome_size = num_assignments)
+  fitness_stream = None
+  if run_spec.fitness_stream_buffer > 0:
+    fitness_stream = dat.FitnessStreamIO(run_spec)
+
+  f = fit.FitnessHistory(time_to_fitness_values = list(run_spec.time_to_fitness_values),
+                         genome_size = run_spec.num_assignments,
+                         fitness_stream = fitness_stream)
 
   w = wrd.World(initial_population = p,
                 assignment = a,
                 crossover = c,
                 fitness_history = f,
-                num_generations = num_iterations,
+                num_generations = run_spec.num_iterations,
                 restrict_crossover = restrict_crossover,
-                pio = pio)
+                pio = pio,
+                randomizers = randomizers,
+                sio = sio,
+                stop_when_all_reached = run_spec.stop_when_all_reached,
+                stop_plateau_generations = run_spec.stop_plateau_generations,
+                stop_plateau_epsilon = run_spec.stop_plateau_epsilon)
   return w
 
-def run_evolution(fhio, datetime_string, population_size, num_groups, num_runs, num_iterations,
-                  num_assignments, evolution_strategy, assignment_strategy,
-                  randomize_assignment_priorities, randomize_assignment_sizes):
+def evolve_run(run_spec):
+  # Builds and evolves the World of one run in a pool worker.
+  #   Returns the fitness history packed into one array, see FitnessHistory.to_array.
+  pio = None
+  if par.DebugParams.SAVE_GENOMES_AT_CHECKPOINTS:
+    pio = dat.PopulationIO(
+                population_size = run_spec.population_size,
+                num_groups = run_spec.num_groups,
+                num_assignments = run_spec.num_assignments,
+                evolution_strategy_name = run_spec.evolution_strategy.name,
+                assignment_strategy_name = run_spec.assignment_strategy.name,
+                randomize_assignment_priorities = run_spec.randomize_assignment_priorities,
+                randomize_assignment_sizes = run_spec.randomize_assignment_sizes,
+                datetime_string = run_spec.datetime_string)
+
+  # A run that was stopped continues from its saved state, if any.
+  sio = None
+  w = None
+  if run_spec.save_state_generations > 0:
+    sio = dat.RunStateIO(run_spec)
+    w = sio.read_world()
+    if w is not None and w.fitness_history.fitness_stream:
+      w.fitness_history.fitness_stream.truncate()
+  if w is None:
+    w = initialize_world(run_spec, pio, sio)
+
+  try:
+    (fitness_history, run_time) = w.evolve(
+        show_iterations = par.DebugParams.SHOW_ITERATIONS,
+        show_every_n_iteration = int(run_spec.num_iterations / par.DebugParams.NUM_CHECKPOINTS),
+        show_run_genomes = par.DebugParams.SHOW_RUN_GENOMES,
+        show_run_fitness = par.DebugParams.SHOW_RUN_FITNESS,
+        show_stats_at_checkpoints = par.DebugParams.SHOW_STATS_AT_CHECKPOINTS,
+        save_genomes_at_checkpoints = par.DebugParams.SAVE_GENOMES_AT_CHECKPOINTS,
+        show_genome_assignments = par.DebugParams.SHOW_GENOME_ASSIGNMENTS,
+        save_state_every_n_iteration = run_spec.save_state_generations)
+  finally:
+    # Generations still buffered are written even if the run fails.
+    if w.fitness_history.fitness_stream:
+      w.fitness_history.fitness_stream.flush()
+  return (fitness_history.to_array(), run_time)
+
+def save_run(rcio, run_spec, fitness_arrays):
+  # The saved state of a run is only removed after its result is cached,
+  #   so a finished run is not lost if the parent is stopped before using it.
+  if rcio:
+    rcio.write_run(run_spec, fitness_arrays)
+  if run_spec.save_state_generations > 0:
+    dat.RunStateIO(run_spec).remove()
+
+def initialize_batch_world(population_size, num_runs, num_iterations, num_groups,
+                            num_assignments, assignment_strategy,
+                            randomize_assignment_priorities, randomize_assignment_sizes,
+                            restrict_crossover, restrict_assignment, group_by_assignment,
+                            randomizers = None):
+
+  a = ass.Assignment(assignment_strategy = assignment_strategy,
+                      restrict_assignment = restrict_assignment,
+                      group_by_assignment = group_by_assignment,
+                      randomize_assignment_priorities = randomize_assignment_priorities,
+                      randomize_assignment_sizes = randomize_assignment_sizes,
+                      matching_solver = par.WorldParams.MATCHING_SOLVER,
+                      randomizers = randomizers)
+  (assignment_priorities, assignment_sizes) = \
+      a.get_assignment_distribution_batch(num_runs, population_size, num_assignments)
+
+  b = pbat.PopulationBatch(num_runs = num_runs,
+                            population_size = population_size,
+                            num_groups = num_groups,
+                            genome_size = num_assignments,
+                            assignment_priorities = assignment_priorities,
+                            assignment_sizes = assignment_sizes,
+                            gene_randomizer = randomizers.gene if randomizers else None)
+
+  c = crs.Crossover(crossover_beta_param = par.CrossoverParams.CROSSOVER_BETA_PARAM,
+                    mutation_rate = par.CrossoverParams.MUTATION_RATE,
+                    interpolate_genes = par.CrossoverParams.INTERPOLATE_GENES,
+                    randomizers = randomizers)
+
+  bw = bwrd.BatchWorld(initial_batch = b,
+                        assignment = a,
+                        crossover = c,
+                        time_to_fitness_values = par.FitnessParams.TIME_TO_FITNESS_VALUES,
+                        num_generations = num_iterations,
+                        restrict_crossover = restrict_crossover,
+                        randomizers = randomizers)
+  return bw
+
+def get_run_cache(is_sweep = False):
+  # Cached runs are only found again with the same seed, so runs are only cached with a fixed
+  #   EXPERIMENT_SEED, or in a sweep, whose seed is kept so that it can be resumed.
+  if not par.WorldParams.CACHE_RUNS or par.DebugParams.SAVE_GENOMES_AT_CHECKPOINTS:
+    return None
+  if par.WorldParams.EXPERIMENT_SEED is None and not is_sweep:
+    return None
+  return dat.RunCacheIO()
+
+def get_fitness_aggregate(num_runs, num_iterations, num_assignments):
+  return fit.OnlineFitnessHistoryAggregate(
+            par.FitnessParams.TIME_TO_FITNESS_VALUES, num_runs, num_iterations, num_assignments,
+            fitness_aggregate_type = par.AggregationParams.FITNESS_AGGREGATION_TYPE,
+            time_to_aggregate_type = par.AggregationParams.TIME_AGGREGATION_TYPE,
+            num_fitness_bins = par.AggregationParams.FITNESS_HISTOGRAM_BINS)
+
+def is_converged(fitness_aggregate):
+  # Adaptive runs stop once the final population fitness and time to fitness are known
+  #   closely enough. Fitness values reached by no run are not considered, but ones reached
+  #   by fewer runs than an ordinal aggregate needs (and at least 2) keep the runs going.
+  counts = fitness_aggregate.get_final_counts()[1:]
+  minimum_count = max(2, fit.FitnessHistoryAggregate.MINIMUM_FRACTION_FOR_ORDINAL_METRIC \
+                           * fitness_aggregate.num_runs)
+  reached = counts > 0
+  if any(counts[reached] < minimum_count):
+    return False
+
+  widths = fitness_aggregate.get_final_interval_widths(par.WorldParams.ADAPTIVE_CONFIDENCE)
+  return widths[0] <= par.WorldParams.ADAPTIVE_FITNESS_INTERVAL_WIDTH \
+      and all(widths[1:][reached] <= par.WorldParams.ADAPTIVE_TIME_TO_INTERVAL_WIDTH)
+
+def get_num_runs_to_start(fitness_aggregate, num_started, num_runs):
+  # All runs of a configuration at once, or with adaptive runs, a first wave of the minimum
+  #   no. of runs, then a wave more each time all started runs are in and not yet converged.
+  if not par.WorldParams.ADAPTIVE_RUNS:
+    return num_runs - num_started
+  if num_started == 0:
+    return min(par.WorldParams.ADAPTIVE_MIN_RUNS, num_runs)
+  if fitness_aggregate.num_runs < num_started or is_converged(fitness_aggregate):
+    return 0
+  return min(par.WorldParams.ADAPTIVE_RUNS_WAVE, num_runs - num_started)
+
+def start_runs(executor, rcio, fitness_aggregate, run_nos, experiment_seed, datetime_string,
+               population_size, num_groups, num_assignments, num_iterations, evolution_strategy,
+               assignment_strategy, randomize_assignment_priorities, randomize_assignment_sizes,
+               **run_params):
+  # Cached runs are added to the aggregate, the rest are submitted to the pool.
+  #   Returns the RunSpec of each submitted run by its future.
+  evolve_futures = {}
+  for r in run_nos:
+    run_spec = rspec.RunSpec.from_params(population_size, num_groups, num_assignments,
+                                         num_iterations, evolution_strategy,
+                                         assignment_strategy, randomize_assignment_priorities,
+                                         randomize_assignment_sizes, experiment_seed,
+                                         run_no = r, datetime_string = datetime_string)
+    fitness_arrays = rcio.read_run(run_spec) if rcio else None
+    if fitness_arrays is not None:
+      fitness_aggregate.add_run(fitness_arrays)
+    else:
+      evolve_futures[executor.submit(evolve_run, run_spec)] = run_spec
+  return evolve_futures
+
+def start_next_runs(executor, rcio, fitness_aggregate, num_started, experiment_seed,
+                    datetime_string, run_params):
+  # Starts the next runs of a configuration, skipping over waves that were all cached.
+  #   No runs are started once the configuration needs no more.
+  evolve_futures = {}
+  while not evolve_futures:
+    num_to_start = get_num_runs_to_start(fitness_aggregate, num_started, run_params['num_runs'])
+    if num_to_start == 0:
+      break
+    evolve_futures = start_runs(executor, rcio, fitness_aggregate,
+                                range(num_started, num_started + num_to_start),
+                                experiment_seed, datetime_string, **run_params)
+    num_started += num_to_start
+  return (evolve_futures, num_started)
+
+def run_evolution_in_pool(datetime_string, population_size, num_groups, num_runs,
+                          num_iterations, num_assignments, evolution_strategy,
+                          assignment_strategy, randomize_assignment_priorities,
+                          randomize_assignment_sizes, experiment_seed):
+  rcio = get_run_cache()
+  run_params = get_run_params(population_size = population_size,
+                              num_groups = num_groups,
+                              num_runs = num_runs,
+                              num_iterations = num_iterations,
+                              num_assignments = num_assignments,
+                              evolution_strategy = evolution_strategy,
+                              assignment_strategy = assignment_strategy,
+                              randomize_assignment_priorities = randomize_assignment_priorities,
+                              randomize_assignment_sizes = randomize_assignment_sizes)
+  fitness_aggregate = get_fitness_aggregate(num_runs, num_iterations, num_assignments)
+  run_times = []
+  with ProcessPoolExecutor() as executor:
+    (evolve_futures, num_started) = start_next_runs(executor, rcio, fitness_aggregate, 0,
+                                                    experiment_seed, datetime_string, run_params)
+    num_submitted = len(evolve_futures)
+    print ("STARTED: {} RUNS".format(num_submitted))
+    if num_submitted < num_started:
+      print ("CACHED : {} RUNS".format(num_started - num_submitted))
+
+    # Each run is added to the aggregate as it completes, and then dropped.
+    num_completed = 0
+    status_time = datetime.now()
+    while evolve_futures:
+      (done, _) = wait(evolve_futures, return_when = FIRST_COMPLETED)
+      for ef in done:
+        run_spec = evolve_futures.pop(ef)
+        fitness_arrays, run_time = ef.result()
+        save_run(rcio, run_spec, fitness_arrays)
+        fitness_aggregate.add_run(fitness_arrays)
+        run_times.append(run_time)
+        num_completed += 1
+
+      if fitness_aggregate.num_runs == num_started:
+        (next_futures, num_started) = start_next_runs(executor, rcio, fitness_aggregate,
+                                                      num_started, experiment_seed,
+                                                      datetime_string, run_params)
+        if next_futures:
+          print ("STARTED: {} MORE RUNS".format(len(next_futures)))
+        evolve_futures.update(next_futures)
+        num_submitted += len(next_futures)
+
+      if par.DebugParams.SHOW_RUN_STATUS and (not evolve_futures or \
+          (datetime.now() - status_time).total_seconds() >= par.DebugParams.SHOW_RUN_STATUS_DELAY):
+        print ("COMPLETED: {}\tOF {} RUNS".format(num_completed, num_submitted))
+        status_time = datetime.now()
+    if not par.DebugParams.SHOW_RUN_STATUS:
+      print ("COMPLETED: {} RUNS".format(num_completed))
+
+  return (fitness_aggregate.get_fitness_history(), fitness_aggregate.num_runs, run_times)
+
+def run_evolution_in_batch(population_size, num_groups, num_runs, num_iterations,
+                           num_assignments, assignment_strategy,
+                           randomize_assignment_priorities, randomize_assignment_sizes,
+                           restrict_crossover, restrict_assignment, group_by_assignment,
+                           experiment_seed):
+  bw = initialize_batch_world(population_size, num_runs, num_iterations, num_groups,
+                              num_assignments, assignment_strategy,
+                              randomize_assignment_priorities, randomize_assignment_sizes,
+                              restrict_crossover, restrict_assignment, group_by_assignment,
+                              randomizers = rnd.RunRandomizers(experiment_seed))
+  print ("STARTED: {} RUNS IN ONE BATCH".format(num_runs))
+  (run_fitness_arrays, run_times) = bw.evolve(
+                                        show_iterations = par.DebugParams.SHOW_ITERATIONS,
+                                        show_every_n_iteration = int(
+                                            num_iterations / par.DebugParams.NUM_CHECKPOINTS))
+  print ("COMPLETED: {} RUNS".format(num_runs))
+
+  # All runs are already held together, so they are aggregated exactly.
+  aggregate_fitness_history = fit.FitnessHistoryAggregate.get_aggregated_fitness_arrays(
+      par.FitnessParams.TIME_TO_FITNESS_VALUES, run_fitness_arrays,
+      fitness_aggregate_type = par.AggregationParams.FITNESS_AGGREGATION_TYPE,
+      time_to_aggregate_type = par.AggregationParams.TIME_AGGREGATION_TYPE)
+
+  return (aggregate_fitness_history, num_runs, run_times)
+
+def get_experiment_seed():
+  experiment_seed = par.WorldParams.EXPERIMENT_SEED
+  if experiment_seed is None:
+    experiment_seed = rnd.RunRandomizers.new_experiment_seed()
+  return experiment_seed
+
+def get_run_params(**run_params):
+  # Args of run_evolution for one configuration, from params unless given.
+  all_run_params = {
+      'population_size': par.PopulationParams.POPULATION_SIZE,
+      'num_groups': par.PopulationParams.NUM_GROUPS,
+      'num_runs': par.WorldParams.NUM_RUNS,
+      'num_iterations': par.WorldParams.NUM_GENERATIONS,
+      'num_assignments': par.PopulationParams.NUM_ASSIGNMENTS,
+      'evolution_strategy': par.WorldParams.EVOLUTION_STRATEGY,
+      'assignment_strategy': par.WorldParams.ASSIGNMENT_STRATEGY,
+      'randomize_assignment_priorities': par.WorldParams.RANDOMIZE_ASSIGNMENT_PRIORITIES,
+      'randomize_assignment_sizes': par.WorldParams.RANDOMIZE_ASSIGNMENT_SIZES}
+  all_run_params.update(run_params)
+  return all_run_params
+
+def validate_run_params(population_size, num_groups, num_assignments, evolution_strategy,
+                        **run_params):
+  check_population_divisibility(num_groups, population_size)
+  check_population_divisibility(num_assignments, population_size)
 
+  (_, _, group_by_assignment) = get_evolution_constraints(evolution_strategy)
+  if group_by_assignment:
+    assert num_groups == num_assignments
+
+def print_run_params(evolution_strategy, assignment_strategy, randomize_assignment_priorities,
+                     randomize_assignment_sizes, experiment_seed):
   print("Evolution Strategy: {}".format(evolution_strategy))
   print("Assignment Strategy: {}".format(assignment_strategy))
   print("Randomize Assignment Priorities: {}".format(randomize_assignment_priorities))
   print("Randomize Assignment Sizes: {}".format(randomize_assignment_sizes))
   print("Fitness Aggregation: {}".format(par.AggregationParams.FITNESS_AGGREGATION_TYPE))
   print("Time Aggregation: {}".format(par.AggregationParams.TIME_AGGREGATION_TYPE))
+  print("Experiment Seed: {}".format(experiment_seed))
   print()
-  
-  (restrict_crossover, restrict_assignment, group_by_assignment) = \
-      get_evolution_constraints(evolution_strategy)
-  if group_by_assignment:
-    assert num_groups == num_assignments
-
-  start_time = datetime.now()
 
-  all_fitness_history = {}
-  run_times = []
-  with ProcessPoolExecutor() as executor:
-    evolve_futures = []
-    for r in range(num_runs):
-      pio = None
-      if par.DebugParams.SAVE_GENOMES_AT_CHECKPOINTS:
-        pio = dat.PopulationIO(
-                    population_size = population_size,
-                    num_groups = num_groups,
-                    num_assignments = num_assignments,
-                    evolution_strategy_name = evolution_strategy.name,
-                    assignment_strategy_name = assignment_strategy.name,
-                    randomize_assignment_priorities = randomize_assignment_priorities,
-                    randomize_assignment_sizes = randomize_assignment_sizes,
-                    datetime_string = datetime_string)
-      w = initialize_world(population_size, num_iterations, num_groups,
-                            num_assignments, assignment_strategy,
-                            randomize_assignment_priorities, randomize_assignment_sizes,
-                            restrict_crossover, restrict_assignment, group_by_assignment, pio)
-      
-      evolve_futures.append(
-          executor.submit(
-              w.evolve,
-              show_iterations = par.DebugParams.SHOW_ITERATIONS,
-              show_every_n_iteration = int(num_iterations / par.DebugParams.NUM_CHECKPOINTS),
-              show_run_genomes = par.DebugParams.SHOW_RUN_GENOMES,
-              show_run_fitness = par.DebugParams.SHOW_RUN_FITNESS,
-              show_stats_at_checkpoints = par.DebugParams.SHOW_STATS_AT_CHECKPOINTS,
-              save_genomes_at_checkpoints = par.DebugParams.SAVE_GENOMES_AT_CHECKPOINTS,
-              show_genome_assignments = par.DebugParams.SHOW_GENOME_ASSIGNMENTS))
-    
-    print ("STARTED: {} RUNS".format(len(evolve_futures)))
-    
-    if par.DebugParams.SHOW_RUN_STATUS:
-      ef_status = [ef.done() for ef in evolve_futures]
-      while not all(ef_status):
-        ef_status = [ef.done() for ef in evolve_futures]
-        num_completed = sum(ef_status)
-        print ("COMPLETED: {}\tOF {} RUNS".format(num_completed, num_runs))
-        if num_completed < num_runs:
-          sleep(par.DebugParams.SHOW_RUN_STATUS_DELAY)
-    else:
-      wait(evolve_futures)
-      print ("COMPLETED: {} RUNS".format(num_runs))
-      
-    for r, ef in enumerate(as_completed(evolve_futures)):
-      fitness_history, run_time = ef.result()
-      all_fitness_history[r + 1] = fitness_history
-      run_times.append(run_time)
-  
-  total_time = datetime.now() - start_time
-  
+def process_run_results(fhio, aggregate_fitness_history, num_aggregated_runs, run_times,
+                        total_time, population_size, num_groups, num_runs, num_iterations,
+                        num_assignments, evolution_strategy, randomize_assignment_priorities,
+                        randomize_assignment_sizes):
   if par.DebugParams.SHOW_RUN_TIME_SUMMARY:
     print()
-    print("RUN DURATION AVERAGE:\t{}".format(np.average(run_times)))
-    print("RUN DURATION MEDIAN :\t{}".format(np.median(run_times)))
-    print()
+    if run_times:
+      print("RUN DURATION AVERAGE:\t{}".format(np.average(run_times)))
+      print("RUN DURATION MEDIAN :\t{}".format(np.median(run_times)))
+      print()
     print("TOTAL DURATION      :\t{}".format(total_time))
-    print("DURATION PER RUN    :\t{}".format(total_time / num_runs))
+    print("DURATION PER RUN    :\t{}".format(total_time / num_aggregated_runs))
     print()
 
-  aggregate_fitness_history = \
-      fit.FitnessHistoryAggregate.get_aggregated_fitness(
-          all_fitness_history,
-          fitness_aggregate_type = par.AggregationParams.FITNESS_AGGREGATION_TYPE,
-          time_to_aggregate_type = par.AggregationParams.TIME_AGGREGATION_TYPE)
+  # Adaptive runs are written as an experiment of num_runs, the most runs it could have had,
+  #   with the no. of runs aggregated recorded in the fitness history.
+  if num_aggregated_runs < num_runs:
+    print("CONVERGED AFTER {} OF {} RUNS\n".format(num_aggregated_runs, num_runs))
   if par.DebugParams.SHOW_AGGREGATED_FITNESS:
     print("\nFINAL AGGREGATED METRICS\n")
     aggregate_fitness_history.history['iterations'][num_iterations].print_fitness_data()
@@ -173,13 +429,171 @@ def run_evolution(fhio, datetime_string, population_size, num_groups, num_runs,
     aggregate_fitness_history.print_time_to()
 
   if par.DebugParams.WRITE_AGGREGATED_FITNESS:
-    out_filename = fhio.get_data_filename(
-                      population_size, num_assignments, num_groups, num_runs, num_iterations, 
-                      evolution_strategy.name, randomize_assignment_priorities,
+    fhio.write_experiment(population_size, num_assignments, num_groups, num_runs, num_iterations,
+                          evolution_strategy.name, randomize_assignment_priorities,
+                          randomize_assignment_sizes,
+                          fitness_history = aggregate_fitness_history)
+    print()
+
+def run_evolution(fhio, datetime_string, population_size, num_groups, num_runs, num_iterations,
+                  num_assignments, evolution_strategy, assignment_strategy,
+                  randomize_assignment_priorities, randomize_assignment_sizes,
+                  experiment_seed = None):
+  if experiment_seed is None:
+    experiment_seed = get_experiment_seed()
+  print_run_params(evolution_strategy, assignment_strategy, randomize_assignment_priorities,
+                   randomize_assignment_sizes, experiment_seed)
+
+  (restrict_crossover, restrict_assignment, group_by_assignment) = \
+      get_evolution_constraints(evolution_strategy)
+  if group_by_assignment:
+    assert num_groups == num_assignments
+
+  start_time = datetime.now()
+
+  if par.WorldParams.BATCH_RUNS:
+    (aggregate_fitness_history, num_aggregated_runs, run_times) = \
+        run_evolution_in_batch(population_size, num_groups, num_runs, num_iterations,
+                               num_assignments, assignment_strategy,
+                               randomize_assignment_priorities, randomize_assignment_sizes,
+                               restrict_crossover, restrict_assignment, group_by_assignment,
+                               experiment_seed)
+  else:
+    (aggregate_fitness_history, num_aggregated_runs, run_times) = \
+        run_evolution_in_pool(datetime_string, population_size, num_groups, num_runs,
+                              num_iterations, num_assignments, evolution_strategy,
+                              assignment_strategy, randomize_assignment_priorities,
+                              randomize_assignment_sizes, experiment_seed)
+  
+  total_time = datetime.now() - start_time
+
+  process_run_results(fhio, aggregate_fitness_history, num_aggregated_runs, run_times,
+                      total_time, population_size, num_groups, num_runs, num_iterations,
+                      num_assignments, evolution_strategy, randomize_assignment_priorities,
                       randomize_assignment_sizes)
-    fhio.write_fitness_history(filename = out_filename, fitness_history = aggregate_fitness_history)
+
+def run_evolution_sweep(fhio, datetime_string, sweep_run_params):
+  # Runs of all configurations share one pool and are all submitted up front (the first
+  #   wave of each, with adaptive runs),
+  #   so no cores wait for the slowest run of a configuration before the next one starts.
+  #   Each run is added to the aggregate of its configuration as it completes, and the
+  #   aggregate is written as soon as the last run of the configuration finishes.
+  #   With adaptive runs, the next wave of a configuration starts once its last wave is in.
+  #   A sweep started again with the same datetime string keeps its seed and skips
+  #   the configurations that were completed.
+  ssio = dat.SweepStateIO(datetime_string)
+  experiment_seed = ssio.read_experiment_seed()
+  if experiment_seed is None:
+    experiment_seed = get_experiment_seed()
+    ssio.write_experiment_seed(experiment_seed)
+  else:
+    assert par.WorldParams.EXPERIMENT_SEED in [None, experiment_seed]
+
+  num_configurations = len(sweep_run_params)
+  sweep_run_params = [run_params for run_params in sweep_run_params \
+                        if not ssio.is_completed(run_params)]
+  if len(sweep_run_params) < num_configurations:
+    print ("RESUMING: {} OF {} CONFIGURATIONS ALREADY COMPLETED\n".format(
+              num_configurations - len(sweep_run_params), num_configurations))
+
+  if par.WorldParams.BATCH_RUNS:
+    for run_params in sweep_run_params:
+      run_evolution(fhio, datetime_string, experiment_seed = experiment_seed, **run_params)
+      ssio.add_completed(run_params)
+    return
+
+  rtio = dat.RunTimeIO()
+  rcio = get_run_cache(is_sweep = True)
+  sweep_order = range(len(sweep_run_params))
+  if par.WorldParams.SCHEDULE_LONGEST_FIRST:
+    cost_model = cst.RunCostModel(rtio.read_run_times())
+    sweep_order = sorted(sweep_order,
+                         key = lambda c: cost_model.estimate(**sweep_run_params[c]),
+                         reverse = True)
+
+  start_time = datetime.now()
+  with ProcessPoolExecutor() as executor:
+    fitness_aggregates = [get_fitness_aggregate(run_params['num_runs'],
+                                                run_params['num_iterations'],
+                                                run_params['num_assignments']) \
+                            for run_params in sweep_run_params]
+    num_started = [0 for _ in sweep_run_params]
+    run_times = [[] for _ in sweep_run_params]
+    run_time_records = [[] for _ in sweep_run_params]
+    evolve_futures = {}
+    # Configurations with every run cached are processed first, the rest as runs complete.
+    completed_configurations = []
+    for c in sweep_order:
+      (started_futures, num_started[c]) = start_next_runs(executor, rcio, fitness_aggregates[c],
+                                                          0, experiment_seed, datetime_string,
+                                                          sweep_run_params[c])
+      for ef, run_spec in started_futures.items():
+        evolve_futures[ef] = (c, run_spec)
+      if not started_futures:
+        completed_configurations.append(c)
+
+    print ("STARTED: {} RUNS OF {} CONFIGURATIONS".format(len(evolve_futures),
+                                                          len(sweep_run_params)))
+    if len(evolve_futures) < sum(num_started):
+      print ("CACHED : {} RUNS".format(sum(num_started) - len(evolve_futures)))
     print()
 
+    num_completed = 0
+    while True:
+      for c in completed_configurations:
+        run_params = sweep_run_params[c]
+        num_completed += 1
+        print ("COMPLETED: {}\tOF {} CONFIGURATIONS".format(num_completed,
+                                                            len(sweep_run_params)))
+        print ("POPULATION:\t{}\tGROUPS:\t{}\tASSIGNMENTS:\t{}".format(
+                  run_params['population_size'], run_params['num_groups'],
+                  run_params['num_assignments']))
+        print_run_params(run_params['evolution_strategy'], run_params['assignment_strategy'],
+                         run_params['randomize_assignment_priorities'],
+                         run_params['randomize_assignment_sizes'], experiment_seed)
+        process_run_results(fhio, fitness_aggregates[c].get_fitness_history(),
+                            fitness_aggregates[c].num_runs, run_times[c],
+                            datetime.now() - start_time, run_params['population_size'],
+                            run_params['num_groups'], run_params['num_runs'],
+                            run_params['num_iterations'], run_params['num_assignments'],
+                            run_params['evolution_strategy'],
+                            run_params['randomize_assignment_priorities'],
+                            run_params['randomize_assignment_sizes'])
+        # Written as each configuration completes, so stopped sweeps still calibrate the costs.
+        rtio.write_run_times(run_time_records[c])
+        ssio.add_completed(run_params)
+        fitness_aggregates[c] = None
+      completed_configurations = []
+
+      if not evolve_futures:
+        break
+      (done, _) = wait(evolve_futures, return_when = FIRST_COMPLETED)
+      for ef in done:
+        (c, run_spec) = evolve_futures.pop(ef)
+        run_params = sweep_run_params[c]
+        fitness_arrays, run_time = ef.result()
+        save_run(rcio, run_spec, fitness_arrays)
+        fitness_aggregates[c].add_run(fitness_arrays)
+        run_times[c].append(run_time)
+        run_time_records[c].append({
+            'population_size': run_params['population_size'],
+            'num_groups': run_params['num_groups'],
+            'num_assignments': run_params['num_assignments'],
+            'num_iterations': run_params['num_iterations'],
+            'evolution_strategy': run_params['evolution_strategy'].name,
+            'assignment_strategy': run_params['assignment_strategy'].name,
+            'run_time': run_time.total_seconds()})
+        if fitness_aggregates[c].num_runs < num_started[c]:
+          continue
+
+        (started_futures, num_started[c]) = start_next_runs(executor, rcio,
+                                                            fitness_aggregates[c],
+                                                            num_started[c], experiment_seed,
+                                                            datetime_string, run_params)
+        for next_ef, next_run_spec in started_futures.items():
+          evolve_futures[next_ef] = (c, next_run_spec)
+        if not started_futures:
+          completed_configurations.append(c)
 
 def evolution_runner(datetime_string = ''):
   validate_params()
@@ -192,7 +606,8 @@ def evolution_runner(datetime_string = ''):
   if show_timestamp:
     print ("TIMESTAMP:\t{}\n".format(datetime_string))
 
-  fhio = dat.FitnessHistoryIO(datetime_string = datetime_string)
+  fhio = dat.FitnessHistoryIO(datetime_string = datetime_string,
+                              use_experiment_store = par.DebugParams.USE_EXPERIMENT_STORE)
   
   run_evolution(fhio, datetime_string, par.PopulationParams.POPULATION_SIZE,
                 par.PopulationParams.NUM_GROUPS, par.WorldParams.NUM_RUNS,
@@ -205,5 +620,15 @@ def evolution_runner(datetime_string = ''):
   if show_timestamp:
     print ("TIMESTAMP:\t{}\n".format(datetime_string))
 
+def evolution_sweep_runner(sweep_run_params, datetime_string):
+  # Like evolution_runner, for a list of configurations from get_run_params.
+  validate_params()
+  for run_params in sweep_run_params:
+    validate_run_params(**run_params)
+
+  fhio = dat.FitnessHistoryIO(datetime_string = datetime_string,
+                              use_experiment_store = par.DebugParams.USE_EXPERIMENT_STORE)
+  run_evolution_sweep(fhio, datetime_string, sweep_run_params)
+
 if __name__=="__main__":
   evolution_runner()
@@ -2,6 +2,7 @@ from datetime import datetime
 
 import evolution_runner as evo
 import params as par
+from evolution import successive_halving as shv
 from metrics import dataio as dat
 from metrics import graph as gra
 
@@ -16,10 +17,15 @@ def validate_params():
                         par.GATuningParams.GA_STEP)
   
   has_custom_datetime_string = len(par.GATuningParams.CUSTOM_DATETIME_STRING) > 0
-  assert not has_custom_datetime_string ^ par.GATuningParams.GRAPHS_ONLY
+  assert not has_custom_datetime_string ^ \
+      (par.GATuningParams.GRAPHS_ONLY or par.GATuningParams.RESUME)
+  assert not (par.GATuningParams.GRAPHS_ONLY and par.GATuningParams.RESUME)
   
   assert len(par.GATuningParams.TIME_TO_FITNESS_VALUES) > 0
   assert par.GATuningParams.PLOT_TIME_TO_FITNESS in par.GATuningParams.TIME_TO_FITNESS_VALUES
+  if par.GATuningParams.SUCCESSIVE_HALVING:
+    assert par.GATuningParams.SUCCESSIVE_HALVING_ROUNDS >= 1
+    assert par.GATuningParams.SUCCESSIVE_HALVING_ETA >= 2
 
   par.WorldParams.NUM_RUNS = par.GATuningParams.NUM_RUNS
   par.WorldParams.NUM_GENERATIONS = par.GATuningParams.NUM_ITERATIONS
@@ -68,48 +74,89 @@ def get_group_assignment_pairs(population_size):
 
   return ga_vals
 
-def generate_data_for_group_assignment_pairs(ga_vals, datetime_string):
-
-  for i, (g, a) in enumerate(ga_vals):
-    print ("{} OF {} TUNING RUNS".format(i, len(ga_vals)))
-    print ("GROUPS:\t{}\tASSIGNMENTS:\t{}".format(g, a))
-    print()
-
-    par.PopulationParams.NUM_GROUPS = g
-    par.PopulationParams.NUM_ASSIGNMENTS = a
-
-    for rap in par.GATuningParams.RANDOM_ASSIGNMENT_PRIORITIES_VALS:
-      for ras in par.GATuningParams.RANDOM_ASSIGNMENT_SIZES_VALS:
-        par.WorldParams.RANDOMIZE_ASSIGNMENT_SIZES = ras
-        par.WorldParams.RANDOMIZE_ASSIGNMENT_PRIORITIES = rap
-
-        evo.evolution_runner(datetime_string)
-
-def make_tuning_graph(fhio, tio, ga_vals, num_runs, num_iterations,
-                      population_size, evolution_strategy_name, assignment_strategy_name,
+def get_successive_halving():
+  if not par.GATuningParams.SUCCESSIVE_HALVING:
+    return shv.SuccessiveHalving(par.GATuningParams.NUM_RUNS, par.GATuningParams.NUM_ITERATIONS)
+  return shv.SuccessiveHalving(par.GATuningParams.NUM_RUNS, par.GATuningParams.NUM_ITERATIONS,
+                               num_rounds = par.GATuningParams.SUCCESSIVE_HALVING_ROUNDS,
+                               eta = par.GATuningParams.SUCCESSIVE_HALVING_ETA,
+                               by_time_to = par.GATuningParams.SUCCESSIVE_HALVING_BY_TIME_TO)
+
+def generate_data_for_group_assignment_pairs(graph_ga_vals, datetime_string,
+                                             num_runs, num_iterations):
+  # graph_ga_vals has the group and assignment count pairs to evolve for each graph, by
+  #   (random assignment priorities, random assignment sizes).
+  sweep_run_params = []
+  for (rap, ras), ga_vals in graph_ga_vals.items():
+    for (g, a) in ga_vals:
+      sweep_run_params.append(
+          evo.get_run_params(num_groups = g,
+                             num_assignments = a,
+                             num_runs = num_runs,
+                             num_iterations = num_iterations,
+                             randomize_assignment_priorities = rap,
+                             randomize_assignment_sizes = ras))
+
+  evo.evolution_sweep_runner(sweep_run_params, datetime_string)
+
+def read_final_fitness(fhio, ga_vals, num_runs, num_iterations,
+                       randomize_assignment_priorities, randomize_assignment_sizes):
+  population_size = par.GATuningParams.POPULATION_SIZE
+  final_fitness = fhio.read_final_population_fitness(
+                      [tuple([population_size, a, g]) for (g, a) in ga_vals],
+                      num_runs = num_runs, num_iterations = num_iterations,
+                      evolution_strategy_name = par.EvolutionStrategy.CROSSOVER_BY_GROUP_ONLY.name,
+                      randomize_assignment_priorities = randomize_assignment_priorities,
+                      randomize_assignment_sizes = randomize_assignment_sizes,
+                      time_to_fitness_value = par.GATuningParams.PLOT_TIME_TO_FITNESS)
+  return {tuple([g, a]): final_fitness[(population_size, a, g)] for (g, a) in ga_vals}
+
+def run_tuning_rounds(ga_vals, datetime_string, generate_data):
+  # Evolves (if generate_data) and reads the pairs of every graph in each round of successive
+  #   halving, one round with the full budget if not used. Returns the graph values by graph.
+  fhio = dat.FitnessHistoryIO(datetime_string,
+                              use_experiment_store = par.DebugParams.USE_EXPERIMENT_STORE)
+  sh = get_successive_halving()
+
+  graph_ga_vals = {}
+  all_graph_vals = {}
+  for rap in par.GATuningParams.RANDOM_ASSIGNMENT_PRIORITIES_VALS:
+    for ras in par.GATuningParams.RANDOM_ASSIGNMENT_SIZES_VALS:
+      graph_ga_vals[(rap, ras)] = list(ga_vals)
+      all_graph_vals[(rap, ras)] = {'final_fitness': {}, 'time_to_fitness': {},
+                                    'num_runs': {}, 'unpromoted': {}}
+
+  for round_no in range(sh.num_rounds):
+    (num_runs, num_iterations) = sh.get_budget(round_no)
+    if sh.num_rounds > 1:
+      print ("SUCCESSIVE HALVING ROUND {} OF {}:\tRUNS:\t{}\tITERATIONS:\t{}\n".format(
+                round_no + 1, sh.num_rounds, num_runs, num_iterations))
+    if generate_data:
+      generate_data_for_group_assignment_pairs(graph_ga_vals, datetime_string,
+                                               num_runs, num_iterations)
+
+    for (rap, ras), graph_vals in all_graph_vals.items():
+      cells = graph_ga_vals[(rap, ras)]
+      final_fitness = read_final_fitness(fhio, cells, num_runs, num_iterations, rap, ras)
+      for ga_tuple, (final_population_fitness, time_to_fitness, num_aggregated_runs) \
+            in final_fitness.items():
+        graph_vals['final_fitness'][ga_tuple] = final_population_fitness
+        graph_vals['time_to_fitness'][ga_tuple] = time_to_fitness
+        graph_vals['num_runs'][ga_tuple] = num_aggregated_runs
+
+      if not sh.is_last_round(round_no):
+        promoted = sh.get_promoted(cells, final_fitness)
+        for ga_tuple in cells:
+          if ga_tuple not in promoted:
+            graph_vals['unpromoted'][ga_tuple] = tuple([num_runs, num_iterations])
+        graph_ga_vals[(rap, ras)] = promoted
+
+  return all_graph_vals
+
+def make_tuning_graph(tio, ga_vals, graph_vals, num_runs, num_iterations,
+                      population_size, assignment_strategy_name,
                       randomize_assignment_priorities, randomize_assignment_sizes):
 
-  graph_vals = {}
-  graph_vals['final_fitness'] = {}
-  graph_vals['time_to_fitness'] = {}
-  for (g, a) in ga_vals:
-    data_filename = fhio.get_data_filename(
-                        population_size = population_size, num_assignments = a, num_groups = g,
-                        num_runs = num_runs, num_iterations = num_iterations,
-                        evolution_strategy_name = evolution_strategy_name,
-                        randomize_assignment_priorities = randomize_assignment_priorities,
-                        randomize_assignment_sizes = randomize_assignment_sizes)
-    
-    fitness_history = fhio.read_fitness_history(data_filename)
-    final_population_fitness = \
-        fitness_history.history['iterations'][num_iterations].data['population']['fitness']
-    f = par.GATuningParams.PLOT_TIME_TO_FITNESS
-    time_to_fitness = fitness_history.history['time_to']['population'][f]
-
-    ga_tuple = tuple([g, a])
-    graph_vals['final_fitness'][ga_tuple] = final_population_fitness
-    graph_vals['time_to_fitness'][ga_tuple] = time_to_fitness
-  
   save_filename = tio.get_ga_tuning_filename(num_runs, num_iterations, population_size,
                                               randomize_assignment_priorities,
                                               randomize_assignment_sizes)
@@ -120,24 +167,29 @@ def make_tuning_graph(fhio, tio, ga_vals, num_runs, num_iterations,
                         + "Random Assignment Priorities: {}, Random Assignment Sizes: {}\n") \
       .format(num_iterations, assignment_strategy_name, population_size,
               randomize_assignment_priorities, randomize_assignment_sizes)
+  if graph_vals['unpromoted']:
+    graph_title_text += "Hollow: Not Promoted by Successive Halving\n"
+  # Adaptive runs may have converged with fewer runs than asked for.
+  num_aggregated_runs = [n for xy, n in graph_vals['num_runs'].items() \
+                           if n is not None and xy not in graph_vals['unpromoted']]
+  if num_aggregated_runs and min(num_aggregated_runs) < num_runs:
+    graph_title_text += "Runs Aggregated: {} to {} of {}\n".format(
+                            min(num_aggregated_runs), max(num_aggregated_runs), num_runs)
   tuning_graph.plot(graph_vals, title_text = graph_title_text, savefile = save_filename)
 
-def make_tuning_graphs(ga_vals, datetime_string):
+def make_tuning_graphs(ga_vals, all_graph_vals, datetime_string):
 
-  fhio = dat.FitnessHistoryIO(datetime_string)
   tio = dat.TuningIO(datetime_string)
 
-  for rap in par.GATuningParams.RANDOM_ASSIGNMENT_PRIORITIES_VALS:
-    for ras in par.GATuningParams.RANDOM_ASSIGNMENT_SIZES_VALS:
-      make_tuning_graph(
-          fhio, tio, ga_vals,
-          num_runs = par.GATuningParams.NUM_RUNS,
-          num_iterations = par.GATuningParams.NUM_ITERATIONS,
-          population_size = par.GATuningParams.POPULATION_SIZE,
-          evolution_strategy_name = par.EvolutionStrategy.CROSSOVER_BY_GROUP_ONLY.name,
-          assignment_strategy_name = par.GATuningParams.ASSIGNMENT_STRATEGY.name,
-          randomize_assignment_priorities = rap,
-          randomize_assignment_sizes = ras)
+  for (rap, ras), graph_vals in all_graph_vals.items():
+    make_tuning_graph(
+        tio, ga_vals, graph_vals,
+        num_runs = par.GATuningParams.NUM_RUNS,
+        num_iterations = par.GATuningParams.NUM_ITERATIONS,
+        population_size = par.GATuningParams.POPULATION_SIZE,
+        assignment_strategy_name = par.GATuningParams.ASSIGNMENT_STRATEGY.name,
+        randomize_assignment_priorities = rap,
+        randomize_assignment_sizes = ras)
 
 
 def ga_tuning_run():
@@ -151,9 +203,9 @@ def ga_tuning_run():
 
   ga_vals = get_group_assignment_pairs(par.GATuningParams.POPULATION_SIZE)
 
-  if not par.GATuningParams.GRAPHS_ONLY:
-    generate_data_for_group_assignment_pairs(ga_vals, datetime_string)
-  make_tuning_graphs(ga_vals, datetime_string)
+  all_graph_vals = run_tuning_rounds(ga_vals, datetime_string,
+                                     generate_data = not par.GATuningParams.GRAPHS_ONLY)
+  make_tuning_graphs(ga_vals, all_graph_vals, datetime_string)
 
   print ("TIMESTAMP:\t{}\n".format(datetime_string))
 
@@ -1,7 +1,15 @@
+import contextlib
+import hashlib
 import json
+import numpy as np
+import os
 import pickle
+import sqlite3
+from enum import Enum
 from pathlib import Path
 
+from metrics import fitness as fit
+
 class FitnessHistoryJSONSerializer(json.JSONEncoder):
 
   def default(self, o):
@@ -24,19 +32,29 @@ class DirectoryValidation:
 
 class FitnessHistoryIO:
 
-  def __init__(self, datetime_string):
+  def __init__(self, datetime_string, use_experiment_store = False):
     assert datetime_string.isdigit() and  len(datetime_string) == 14
 
+    self.datetime_string = datetime_string
+    self.experiment_store = ExperimentStoreIO() if use_experiment_store else None
+
     current_dir = DirectoryValidation.get_directory()
     self.DATA_DIR = current_dir / 'data' / datetime_string
     self.GRAPH_DIR = current_dir / 'out' / datetime_string
 
+  # Fitness histories are written as a header followed by raw float64 arrays, see
+  #   write_fitness_history. Pickled histories from before are still read.
+  DATA_SUFFIX = '.fh'
+  PICKLE_DATA_SUFFIX = '.data'
+  DATA_MAGIC = b'FHIST\x00\x01\x00'
+  DATA_ALIGNMENT = 64
+
   def get_data_filename(self, population_size, num_assignments, num_groups, num_runs,
                         num_iterations, evolution_strategy_name, randomize_assignment_priorities,
                         randomize_assignment_sizes):
-    return self.DATA_DIR / "{}_{}_{}_p{}_a{}_g{}_i{}_r{}.data".format(
+    return self.DATA_DIR / "{}_{}_{}_p{}_a{}_g{}_i{}_r{}{}".format(
         evolution_strategy_name, randomize_assignment_priorities, randomize_assignment_sizes,
-        population_size, num_assignments, num_groups, num_iterations, num_runs)
+        population_size, num_assignments, num_groups, num_iterations, num_runs, self.DATA_SUFFIX)
 
   def get_graph_filename(self, population_size, num_assignments, num_groups, num_runs,
                           num_iterations, evolution_strategy_name, randomize_assignment_priorities,
@@ -47,21 +65,491 @@ class FitnessHistoryIO:
         num_runs)
 
   def write_fitness_history(self, filename, fitness_history):
+    fha = fitness_history.to_arrays()
+    fitness = np.ascontiguousarray(fha.fitness, dtype = '<f8')
+    time_to = np.ascontiguousarray(fha.time_to, dtype = '<f8')
+    header = {'time_to_fitness_values': fha.time_to_fitness_values,
+              'iterations': [int(i) for i in fha.iterations],
+              'fitness_shape': fitness.shape,
+              'time_to_shape': time_to.shape,
+              'num_runs': fha.num_runs}
+    header_bytes = json.dumps(header).encode()
+    # Padded so that the arrays start aligned, which memory mapping them does not need
+    #   but makes reading them faster.
+    data_offset = len(self.DATA_MAGIC) + 8 + len(header_bytes)
+    header_bytes += b' ' * (-data_offset % self.DATA_ALIGNMENT)
+
     filename.parent.mkdir(exist_ok = True, parents = True)
     with open(filename, 'wb+') as f:
-      pickle.dump(fitness_history, f)
+      f.write(self.DATA_MAGIC)
+      f.write(len(header_bytes).to_bytes(8, 'little'))
+      f.write(header_bytes)
+      f.write(fitness.tobytes())
+      f.write(time_to.tobytes())
       print("Fitness History written to {}".format(filename))
 
-  def read_fitness_history(self, filename, show = False):
+  def get_pickle_data_filename(self, filename):
+    # Pickled history with the same name, read when filename itself was never written.
+    if filename.suffix != self.PICKLE_DATA_SUFFIX and not filename.exists():
+      return filename.with_suffix(self.PICKLE_DATA_SUFFIX)
+    return filename
+
+  def read_pickled_fitness_history(self, filename):
     with open(filename, 'rb') as f:
-      fitness_history = pickle.load(f)
-      print("Fitness History read from {}".format(filename))
+      return pickle.load(f)
+
+  def read_fitness_arrays(self, filename):
+    # FitnessHistoryArrays with the arrays memory mapped, so only the parts used are read.
+    pickle_filename = self.get_pickle_data_filename(filename)
+    if pickle_filename.suffix == self.PICKLE_DATA_SUFFIX:
+      return self.read_pickled_fitness_history(pickle_filename).to_arrays()
+
+    with open(filename, 'rb') as f:
+      assert f.read(len(self.DATA_MAGIC)) == self.DATA_MAGIC, \
+          "Not a fitness history file: {}".format(filename)
+      header_length = int.from_bytes(f.read(8), 'little')
+      header = json.loads(f.read(header_length))
+    fitness_offset = len(self.DATA_MAGIC) + 8 + header_length
+    fitness_shape = tuple(header['fitness_shape'])
+    time_to_offset = fitness_offset + 8 * int(np.prod(fitness_shape))
+
+    fitness = np.memmap(filename, dtype = '<f8', mode = 'r', offset = fitness_offset,
+                        shape = fitness_shape)
+    time_to = np.memmap(filename, dtype = '<f8', mode = 'r', offset = time_to_offset,
+                        shape = tuple(header['time_to_shape']))
+    return fit.FitnessHistoryArrays(time_to_fitness_values = header['time_to_fitness_values'],
+                                    iterations = header['iterations'],
+                                    fitness = fitness,
+                                    time_to = time_to,
+                                    num_runs = header.get('num_runs'))
+
+  def read_fitness_history(self, filename, show = False, max_iterations = None):
+    pickle_filename = self.get_pickle_data_filename(filename)
+    if pickle_filename.suffix == self.PICKLE_DATA_SUFFIX:
+      fitness_history = self.read_pickled_fitness_history(pickle_filename)
+    else:
+      fitness_history = fit.FitnessHistory.from_arrays(self.read_fitness_arrays(filename),
+                                                       max_iterations = max_iterations)
+    print("Fitness History read from {}".format(pickle_filename))
 
     if show:
       print(json.dumps(fitness_history, cls = FitnessHistoryJSONSerializer, indent = 2,
                        sort_keys = True))
     return fitness_history
 
+  def write_experiment(self, population_size, num_assignments, num_groups, num_runs,
+                       num_iterations, evolution_strategy_name, randomize_assignment_priorities,
+                       randomize_assignment_sizes, fitness_history):
+    # To the experiment store if used, else to the data file of the configuration.
+    if self.experiment_store:
+      self.experiment_store.write_fitness_history(
+          self.datetime_string, population_size, num_assignments, num_groups, num_runs,
+          num_iterations, evolution_strategy_name, randomize_assignment_priorities,
+          randomize_assignment_sizes, fitness_history)
+      return
+
+    filename = self.get_data_filename(population_size, num_assignments, num_groups, num_runs,
+                                      num_iterations, evolution_strategy_name,
+                                      randomize_assignment_priorities, randomize_assignment_sizes)
+    self.write_fitness_history(filename, fitness_history)
+
+  def read_experiment(self, population_size, num_assignments, num_groups, num_runs,
+                      num_iterations, evolution_strategy_name, randomize_assignment_priorities,
+                      randomize_assignment_sizes, max_iterations = None):
+    if self.experiment_store:
+      fitness_arrays = self.experiment_store.read_fitness_arrays(
+                          self.datetime_string, population_size, num_assignments, num_groups,
+                          num_runs, num_iterations, evolution_strategy_name,
+                          randomize_assignment_priorities, randomize_assignment_sizes)
+      if fitness_arrays is not None:
+        return fit.FitnessHistory.from_arrays(fitness_arrays, max_iterations = max_iterations)
+
+    filename = self.get_data_filename(population_size, num_assignments, num_groups, num_runs,
+                                      num_iterations, evolution_strategy_name,
+                                      randomize_assignment_priorities, randomize_assignment_sizes)
+    return self.read_fitness_history(filename, max_iterations = max_iterations)
+
+  def read_final_population_fitness(self, pag_vals, num_runs, num_iterations,
+                                    evolution_strategy_name, randomize_assignment_priorities,
+                                    randomize_assignment_sizes, time_to_fitness_value):
+    # {(population_size, num_assignments, num_groups): (final fitness, time to fitness,
+    #   no. of runs aggregated)} for each triple in pag_vals. The no. of runs is below num_runs
+    #   for adaptive runs that converged early, and None if not recorded.
+    #   With the experiment store this is one indexed query, data files are only read for
+    #   configurations that are not in the store.
+    final_fitness = {}
+    if self.experiment_store:
+      for row in self.experiment_store.read_final_population_fitness(
+                     self.datetime_string, num_runs, num_iterations, evolution_strategy_name,
+                     randomize_assignment_priorities, randomize_assignment_sizes):
+        pag = (row['population_size'], row['num_assignments'], row['num_groups'])
+        if pag in pag_vals and time_to_fitness_value in row['time_to_fitness_values']:
+          j = row['time_to_fitness_values'].index(time_to_fitness_value)
+          final_fitness[pag] = \
+              (row['final_fitness'],
+               fit.FitnessHistoryArrays.get_time_to_value(row['population_time_to'][j]),
+               row['num_aggregated_runs'])
+
+    for (p, a, g) in pag_vals:
+      if (p, a, g) in final_fitness:
+        continue
+      fitness_arrays = self.read_fitness_arrays(
+                          self.get_data_filename(p, a, g, num_runs, num_iterations,
+                                                 evolution_strategy_name,
+                                                 randomize_assignment_priorities,
+                                                 randomize_assignment_sizes))
+      final_fitness[(p, a, g)] = \
+          (fitness_arrays.get_population_fitness(num_iterations),
+           fitness_arrays.get_population_time_to(time_to_fitness_value),
+           fitness_arrays.num_runs)
+    return final_fitness
+
+
+class ExperimentStoreIO:
+
+  # Aggregated fitness histories of all experiments in one SQLite database, one row each,
+  #   with the arrays of FitnessHistoryArrays as float64 blobs.
+  #   Rows are keyed and indexed by their parameters, and the final population fitness and
+  #   time to fitness values have their own columns so that tuning queries read no blobs.
+  #   num_runs is the no. of runs asked for, num_aggregated_runs the no. of runs aggregated.
+  SCHEMA = """
+      CREATE TABLE IF NOT EXISTS fitness_histories (
+          datetime_string TEXT NOT NULL,
+          evolution_strategy TEXT NOT NULL,
+          randomize_assignment_priorities INTEGER NOT NULL,
+          randomize_assignment_sizes INTEGER NOT NULL,
+          population_size INTEGER NOT NULL,
+          num_assignments INTEGER NOT NULL,
+          num_groups INTEGER NOT NULL,
+          num_iterations INTEGER NOT NULL,
+          num_runs INTEGER NOT NULL,
+          final_fitness REAL,
+          time_to_fitness_values TEXT NOT NULL,
+          population_time_to TEXT NOT NULL,
+          iterations TEXT NOT NULL,
+          fitness BLOB NOT NULL,
+          time_to BLOB NOT NULL,
+          num_aggregated_runs INTEGER,
+          PRIMARY KEY (datetime_string, evolution_strategy, randomize_assignment_priorities,
+                       randomize_assignment_sizes, num_runs, num_iterations,
+                       population_size, num_assignments, num_groups));
+      CREATE INDEX IF NOT EXISTS fitness_histories_by_params ON fitness_histories (
+          evolution_strategy, population_size, num_assignments, num_groups, num_iterations);
+      """
+
+  def __init__(self):
+    current_dir = DirectoryValidation.get_directory()
+    self.STORE_FILENAME = current_dir / 'data' / 'experiments.sqlite'
+
+    self.STORE_FILENAME.parent.mkdir(exist_ok = True, parents = True)
+    with self.connect() as conn:
+      conn.executescript(self.SCHEMA)
+      # Stores made before the no. of runs aggregated was recorded have NULL for it.
+      columns = [row['name'] for row in conn.execute("PRAGMA table_info(fitness_histories)")]
+      if 'num_aggregated_runs' not in columns:
+        conn.execute("ALTER TABLE fitness_histories ADD COLUMN num_aggregated_runs INTEGER")
+
+  @contextlib.contextmanager
+  def connect(self):
+    # Commits on success, rolls back on an exception and always closes the connection.
+    conn = sqlite3.connect(self.STORE_FILENAME)
+    conn.row_factory = sqlite3.Row
+    try:
+      with conn:
+        yield conn
+    finally:
+      conn.close()
+
+  def write_fitness_history(self, datetime_string, population_size, num_assignments, num_groups,
+                            num_runs, num_iterations, evolution_strategy_name,
+                            randomize_assignment_priorities, randomize_assignment_sizes,
+                            fitness_history):
+    fha = fitness_history.to_arrays()
+    with self.connect() as conn:
+      conn.execute(
+          "INSERT OR REPLACE INTO fitness_histories (datetime_string, evolution_strategy, "
+          "randomize_assignment_priorities, randomize_assignment_sizes, population_size, "
+          "num_assignments, num_groups, num_iterations, num_runs, final_fitness, "
+          "time_to_fitness_values, population_time_to, iterations, fitness, time_to, "
+          "num_aggregated_runs) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+          (datetime_string, evolution_strategy_name, randomize_assignment_priorities,
+           randomize_assignment_sizes, population_size, num_assignments, num_groups,
+           num_iterations, num_runs,
+           float(fha.fitness[-1, 0, 0]),
+           json.dumps(fha.time_to_fitness_values),
+           json.dumps(fha.time_to[0].tolist()),
+           json.dumps([int(i) for i in fha.iterations]),
+           np.ascontiguousarray(fha.fitness, dtype = '<f8').tobytes(),
+           np.ascontiguousarray(fha.time_to, dtype = '<f8').tobytes(),
+           fha.num_runs))
+    print("Fitness History written to {} ({})".format(self.STORE_FILENAME, datetime_string))
+
+  def read_fitness_arrays(self, datetime_string, population_size, num_assignments, num_groups,
+                          num_runs, num_iterations, evolution_strategy_name,
+                          randomize_assignment_priorities, randomize_assignment_sizes):
+    # FitnessHistoryArrays of the configuration, None if it was not written to the store.
+    with self.connect() as conn:
+      row = conn.execute(
+          "SELECT time_to_fitness_values, iterations, fitness, time_to, num_aggregated_runs "
+          "FROM fitness_histories WHERE datetime_string = ? AND evolution_strategy = ? "
+          "AND randomize_assignment_priorities = ? AND randomize_assignment_sizes = ? "
+          "AND num_runs = ? AND num_iterations = ? "
+          "AND population_size = ? AND num_assignments = ? AND num_groups = ?",
+          (datetime_string, evolution_strategy_name, randomize_assignment_priorities,
+           randomize_assignment_sizes, num_runs, num_iterations,
+           population_size, num_assignments, num_groups)).fetchone()
+    if row is None:
+      return None
+
+    time_to_fitness_values = json.loads(row['time_to_fitness_values'])
+    iterations = json.loads(row['iterations'])
+    time_to = np.frombuffer(row['time_to'], dtype = '<f8') \
+                .reshape(-1, len(time_to_fitness_values))
+    fitness = np.frombuffer(row['fitness'], dtype = '<f8') \
+                .reshape(len(iterations), time_to.shape[0], 12)
+    print("Fitness History read from {} ({})".format(self.STORE_FILENAME, datetime_string))
+    return fit.FitnessHistoryArrays(time_to_fitness_values = time_to_fitness_values,
+                                    iterations = iterations,
+                                    fitness = fitness,
+                                    time_to = time_to,
+                                    num_runs = row['num_aggregated_runs'])
+
+  def read_final_population_fitness(self, datetime_string, num_runs, num_iterations,
+                                    evolution_strategy_name, randomize_assignment_priorities,
+                                    randomize_assignment_sizes):
+    # Sizes, final population fitness, population time to fitness values and no. of runs
+    #   aggregated of every configuration of an experiment with the other parameters given,
+    #   as dicts.
+    with self.connect() as conn:
+      rows = conn.execute(
+          "SELECT population_size, num_assignments, num_groups, final_fitness, "
+          "time_to_fitness_values, population_time_to, num_aggregated_runs "
+          "FROM fitness_histories WHERE datetime_string = ? AND evolution_strategy = ? "
+          "AND randomize_assignment_priorities = ? AND randomize_assignment_sizes = ? "
+          "AND num_runs = ? AND num_iterations = ?",
+          (datetime_string, evolution_strategy_name, randomize_assignment_priorities,
+           randomize_assignment_sizes, num_runs, num_iterations)).fetchall()
+
+    return [{'population_size': row['population_size'],
+             'num_assignments': row['num_assignments'],
+             'num_groups': row['num_groups'],
+             'final_fitness': row['final_fitness'],
+             'time_to_fitness_values': json.loads(row['time_to_fitness_values']),
+             'population_time_to': json.loads(row['population_time_to']),
+             'num_aggregated_runs': row['num_aggregated_runs']} \
+              for row in rows]
+
+
+class FitnessStreamIO:
+
+  # Fitness of every generation of one run, appended to a file while the run evolves.
+  #   Records are (1 + genome_size, 12) float64 arrays (see FitnessData.to_array) in generation
+  #   order after a short header, and at most buffer_size of them are held in memory.
+  #   A file cut short by a crashed run is read up to its last complete record.
+  MAGIC = b'FSTRM\x00\x01\x00'
+  HEADER_SIZE = 16
+
+  def __init__(self, run_spec):
+    current_dir = DirectoryValidation.get_directory()
+    self.STREAM_DIR = current_dir / 'data' / run_spec.datetime_string / 'runs'
+    self.filename = self.STREAM_DIR / "{}_{}_{}_p{}_a{}_g{}_i{}_r{}.fhs".format(
+        run_spec.evolution_strategy.name, run_spec.randomize_assignment_priorities,
+        run_spec.randomize_assignment_sizes, run_spec.population_size, run_spec.num_assignments,
+        run_spec.num_groups, run_spec.num_iterations, run_spec.run_no)
+
+    self.genome_size = run_spec.num_assignments
+    self.buffer_size = max(1, run_spec.fitness_stream_buffer)
+    self.buffer = []
+    self.num_written = 0
+
+    self.STREAM_DIR.mkdir(exist_ok = True, parents = True)
+    with open(self.filename, 'wb') as f:
+      f.write(self.MAGIC)
+      f.write(self.genome_size.to_bytes(8, 'little'))
+
+  def write(self, iteration_no, fitness_array):
+    assert iteration_no == self.num_written + len(self.buffer)
+    self.buffer.append(fitness_array)
+    if len(self.buffer) >= self.buffer_size:
+      self.flush()
+
+  def flush(self):
+    if not self.buffer:
+      return
+    with open(self.filename, 'ab') as f:
+      f.write(np.ascontiguousarray(self.buffer, dtype = '<f8').tobytes())
+    self.num_written += len(self.buffer)
+    self.buffer = []
+
+  def read(self):
+    self.flush()
+    return self.read_fitness_arrays(self.filename)
+
+  def truncate(self):
+    # Drops records written after this writer was saved, when resuming a run from its state.
+    self.buffer = []
+    os.truncate(self.filename,
+                self.HEADER_SIZE + self.num_written * 8 * (1 + self.genome_size) * 12)
+
+  @classmethod
+  def read_fitness_arrays(cls, filename):
+    # (num_generations_written, 1 + genome_size, 12), memory mapped.
+    #   Pass to FitnessHistory.from_array to salvage the run.
+    with open(filename, 'rb') as f:
+      assert f.read(len(cls.MAGIC)) == cls.MAGIC, \
+          "Not a fitness stream file: {}".format(filename)
+      genome_size = int.from_bytes(f.read(8), 'little')
+    record_size = 8 * (1 + genome_size) * 12
+    num_records = (filename.stat().st_size - cls.HEADER_SIZE) // record_size
+    if num_records == 0:
+      return np.zeros((0, 1 + genome_size, 12))
+    return np.memmap(filename, dtype = '<f8', mode = 'r', offset = cls.HEADER_SIZE,
+                     shape = (num_records, 1 + genome_size, 12))
+
+
+class RunStateIO:
+
+  # State of a run being evolved (its World, with the population, random streams and
+  #   fitness history), saved every few generations so that a stopped run can continue.
+  #   States are kept with the experiment's data, as the fitness history streams to its runs,
+  #   so a run only continues when started again with the same datetime string.
+  #   Within it runs are identified like cached runs, by configuration, seed and run no.
+
+  def __init__(self, run_spec):
+    current_dir = DirectoryValidation.get_directory()
+    self.STATE_DIR = current_dir / 'data' / run_spec.datetime_string / 'checkpoints'
+    self.filename = self.STATE_DIR / "{}.pkl".format(RunCacheIO.get_key(run_spec))
+
+  def read_world(self):
+    # None if no state was saved for the run.
+    if not self.filename.exists():
+      return None
+    with open(self.filename, 'rb') as f:
+      return pickle.load(f)
+
+  def write_world(self, world):
+    self.STATE_DIR.mkdir(exist_ok = True, parents = True)
+    # Written under a temporary name first so that an interrupted write is never read back.
+    temp_filename = self.filename.with_suffix('.tmp')
+    with open(temp_filename, 'wb') as f:
+      pickle.dump(world, f)
+    temp_filename.replace(self.filename)
+
+  def remove(self):
+    self.filename.unlink(missing_ok = True)
+
+
+class SweepStateIO:
+
+  # Experiment seed and completed configurations of a sweep, so that a sweep that is stopped
+  #   can be started again with the same datetime string and continue where it was.
+
+  def __init__(self, datetime_string):
+    current_dir = DirectoryValidation.get_directory()
+    self.STATE_FILENAME = current_dir / 'data' / datetime_string / 'sweep_state.json'
+
+  @staticmethod
+  def get_key(run_params):
+    return json.dumps({k: v.name if isinstance(v, Enum) else v \
+                         for k, v in run_params.items()}, sort_keys = True)
+
+  def read_state(self):
+    if not self.STATE_FILENAME.exists():
+      return {'experiment_seed': None, 'completed': []}
+    with open(self.STATE_FILENAME, 'r') as f:
+      return json.load(f)
+
+  def write_state(self, state):
+    self.STATE_FILENAME.parent.mkdir(exist_ok = True, parents = True)
+    temp_filename = self.STATE_FILENAME.with_suffix('.tmp')
+    with open(temp_filename, 'w') as f:
+      json.dump(state, f)
+    temp_filename.replace(self.STATE_FILENAME)
+
+  def read_experiment_seed(self):
+    # None for a sweep that has not been started.
+    return self.read_state()['experiment_seed']
+
+  def write_experiment_seed(self, experiment_seed):
+    state = self.read_state()
+    state['experiment_seed'] = experiment_seed
+    self.write_state(state)
+
+  def is_completed(self, run_params):
+    return self.get_key(run_params) in self.read_state()['completed']
+
+  def add_completed(self, run_params):
+    state = self.read_state()
+    state['completed'].append(self.get_key(run_params))
+    self.write_state(state)
+
+
+class RunTimeIO:
+
+  def __init__(self):
+    current_dir = DirectoryValidation.get_directory()
+    self.RUN_TIME_FILENAME = current_dir / 'data' / 'run_times.jsonl'
+
+  def read_run_times(self):
+    # One record per line, see write_run_times.
+    if not self.RUN_TIME_FILENAME.exists():
+      return []
+    with open(self.RUN_TIME_FILENAME, 'r') as f:
+      return [json.loads(line) for line in f if line.strip()]
+
+  def write_run_times(self, run_time_records):
+    # Appends dicts of sizes, strategy names and run_time in seconds.
+    self.RUN_TIME_FILENAME.parent.mkdir(exist_ok = True, parents = True)
+    with open(self.RUN_TIME_FILENAME, 'a') as f:
+      for record in run_time_records:
+        f.write(json.dumps(record) + '\n')
+
+
+class RunCacheIO:
+
+  # Change to invalidate all cached runs when evolution itself changes.
+  CACHE_VERSION = 1
+
+  def __init__(self):
+    current_dir = DirectoryValidation.get_directory()
+    self.CACHE_DIR = current_dir / 'cache'
+
+  @classmethod
+  def get_key(cls, run_spec):
+    # Hash of everything that changes the fitness of a run, including its seed and run no.
+    #   Time to fitness values are left out as they are recomputed from the fitness,
+    #   and so is how fitness and state are written while evolving.
+    #   Stopping rules are left out when not used, so runs cached before them are still found.
+    excluded_fields = ['datetime_string', 'fitness_stream_buffer', 'save_state_generations']
+    if not run_spec.stop_when_all_reached:
+      excluded_fields += ['stop_when_all_reached', 'time_to_fitness_values']
+    if run_spec.stop_plateau_generations == 0:
+      excluded_fields += ['stop_plateau_generations', 'stop_plateau_epsilon']
+    key_fields = {k: v.name if isinstance(v, Enum) else v \
+                    for k, v in run_spec._asdict().items() if k not in excluded_fields}
+    key_fields['cache_version'] = cls.CACHE_VERSION
+    return hashlib.sha256(json.dumps(key_fields, sort_keys = True).encode()).hexdigest()
+
+  def get_run_filename(self, run_spec):
+    key = self.get_key(run_spec)
+    return self.CACHE_DIR / key[:2] / "{}.npy".format(key)
+
+  def read_run(self, run_spec):
+    # Packed fitness history of the run (see FitnessHistory.to_array), None if not cached.
+    filename = self.get_run_filename(run_spec)
+    if not filename.exists():
+      return None
+    return np.load(filename)
+
+  def write_run(self, run_spec, fitness_arrays):
+    filename = self.get_run_filename(run_spec)
+    filename.parent.mkdir(exist_ok = True, parents = True)
+    # Written under a temporary name first so that an interrupted write is never read back.
+    temp_filename = filename.with_suffix('.tmp')
+    with open(temp_filename, 'wb') as f:
+      np.save(f, fitness_arrays)
+    temp_filename.replace(filename)
+
 
 class PopulationIO:
 
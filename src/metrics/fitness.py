@@ -1,23 +1,82 @@
 import numpy as np
+from collections import namedtuple
 from enum import Enum
+from scipy import stats
 
 class FitnessUtil:
 
   @staticmethod
-  def get_subgroup_fitness(individuals, expected_size):
-    fitness = 0.0
-    for i in individuals:
-      fitness += i.get_fitness() / expected_size
-    return fitness
+  def get_fitness_array(fitness, assignments, genome_size, population_size, assignment_sizes):
+    # Fitness data of a population as a (1 + genome_size, 12) array in the layout of
+    #   FitnessData.to_array, from the fitness and assignment (-1 if none) of each individual.
+    #   All percentiles come from one sort by fitness, regrouped by assignment with a stable
+    #   sort of small ints (a radix sort). Percentiles of an empty assignment are NaN.
+    assigned = assignments > -1
+    fitness = fitness[assigned]
+    assignments = assignments[assigned]
+    num_assigned = len(fitness)
+    percentiles = np.arange(0, 101, 10)
+
+    fitness_array = np.full((1 + genome_size, 12), np.nan)
+    fitness_array[0, 0] = fitness.sum() / population_size
+    fitness_array[1:, 0] = \
+        np.bincount(assignments, weights = fitness, minlength = genome_size) / assignment_sizes
+    if num_assigned == 0:
+      return fitness_array
+
+    order = np.argsort(fitness)
+    sorted_fitness = fitness[order]
+    indices = np.minimum(percentiles * num_assigned // 100, num_assigned - 1)
+    fitness_array[0, 1:] = sorted_fitness[indices]
+
+    sorted_assignments = assignments[order].astype(np.min_scalar_type(genome_size))
+    sorted_fitness = sorted_fitness[np.argsort(sorted_assignments, kind = 'stable')]
+    counts = np.bincount(assignments, minlength = genome_size)[:, np.newaxis]
+    starts = np.cumsum(counts) - counts[:, 0]
+    indices = starts[:, np.newaxis] + np.minimum(percentiles * counts // 100, counts - 1)
+    fitness_array[1:, 1:] = np.where(counts > 0,
+                                     sorted_fitness[np.clip(indices, 0, num_assigned - 1)],
+                                     np.nan)
+    return fitness_array
 
   @staticmethod
-  def get_fitness_percentiles(individuals):
-    percentile_data = {}
-    percentile_data[0] = individuals[0].get_fitness()
-    for i in range(10, 100, 10):
-      percentile_data[i] = individuals[int(i * len(individuals) / 100)].get_fitness()
-    percentile_data[100] = individuals[-1].get_fitness()
-    return percentile_data
+  def get_fitness_array_batch(batch):
+    # Fitness data of every run in a PopulationBatch, as (num_runs, 1 + genome_size, 12) arrays
+    #   in the layout of FitnessData.to_array.
+    runs = np.arange(batch.num_runs)[:, np.newaxis]
+    fitness = batch.get_individual_fitness()
+    assigned = batch.assignments > -1
+    percentiles = np.arange(0, 101, 10)
+
+    fitness_array = np.full((batch.num_runs, 1 + batch.genome_size, 12), np.nan)
+    fitness_array[:, 0, 0] = fitness.sum(axis = 1) / batch.population_size
+    fitness_array[:, 1:, 0] = \
+        batch.get_counts(batch.assignments, batch.genome_size, weights = fitness) \
+            / batch.assignment_sizes
+
+    # Sort by fitness, then by assignment with unassigned individuals last.
+    order = np.argsort(fitness, axis = 1, kind = 'stable')
+    keys = np.where(assigned, batch.assignments, batch.genome_size)[runs, order]
+    order = np.take_along_axis(order, np.argsort(keys, axis = 1, kind = 'stable'), axis = 1)
+    sorted_fitness = fitness[runs, order]
+
+    num_assigned = assigned.sum(axis = 1)
+    indices = np.minimum(percentiles[np.newaxis, :] * num_assigned[:, np.newaxis] // 100,
+                         num_assigned[:, np.newaxis] - 1)
+    population_sorted = np.sort(np.where(assigned, fitness, np.inf), axis = 1)
+    fitness_array[:, 0, 1:] = np.take_along_axis(population_sorted, np.maximum(indices, 0),
+                                                 axis = 1)
+
+    counts = batch.get_counts(batch.assignments, batch.genome_size)
+    starts = np.cumsum(counts, axis = 1) - counts
+    indices = starts[..., np.newaxis] + np.minimum(
+                  percentiles * counts[..., np.newaxis] // 100, counts[..., np.newaxis] - 1)
+    assignment_percentiles = sorted_fitness[runs[..., np.newaxis],
+                                            np.clip(indices, 0, sorted_fitness.shape[1] - 1)]
+    fitness_array[:, 1:, 1:] = np.where(counts[..., np.newaxis] > 0, assignment_percentiles,
+                                        np.nan)
+
+    return fitness_array
 
   @staticmethod
   def pretty_print_percentiles(a):
@@ -50,21 +109,40 @@ class FitnessData:
 
   @staticmethod
   def from_population(population):
-    fitness_data = FitnessData(genome_size = population.genome_size)
-
-    all_individuals = population.get_all_individuals(sort = True, assigned = True)
-    fitness_data.data['population']['fitness'] = \
-        FitnessUtil.get_subgroup_fitness(all_individuals, population.population_size)
-    fitness_data.data['population']['percentiles'] = \
-        FitnessUtil.get_fitness_percentiles(all_individuals)
-
-    for a in range(population.genome_size):
-      assignment_individuals = [i for i in all_individuals if i.assignment == a]
-      fitness_data.data['assignment'][a]['fitness'] = \
-          FitnessUtil.get_subgroup_fitness(assignment_individuals, population.assignment_sizes[a])
-      fitness_data.data['assignment'][a]['percentiles'] = \
-          FitnessUtil.get_fitness_percentiles(assignment_individuals)
+    if population.array_backed:
+      fitness = population.get_individual_fitness()
+      assignments = population.assignments
+    else:
+      all_individuals = population.get_all_individuals()
+      fitness = np.array([i.get_fitness() for i in all_individuals])
+      assignments = np.array([i.assignment for i in all_individuals])
+
+    assignment_sizes = np.array([population.assignment_sizes[a] \
+                                   for a in range(population.genome_size)])
+    return FitnessData.from_array(
+        FitnessUtil.get_fitness_array(fitness, assignments, population.genome_size,
+                                      population.population_size, assignment_sizes))
+
+  def to_array(self):
+    # Row 0 is the population and row 1 + a is assignment a.
+    #   Column 0 is fitness and columns 1 to 11 are percentiles 0, 10, ..., 100.
+    fitness_array = np.zeros((1 + self.genome_size, 12))
+    rows = [self.data['population']] \
+              + [self.data['assignment'][a] for a in range(self.genome_size)]
+    for i, row in enumerate(rows):
+      fitness_array[i, 0] = row['fitness']
+      fitness_array[i, 1:] = [row['percentiles'][p] for p in range(0, 101, 10)]
+    return fitness_array
 
+  @staticmethod
+  def from_array(fitness_array):
+    fitness_data = FitnessData(genome_size = fitness_array.shape[0] - 1)
+
+    rows = [fitness_data.data['population']] \
+              + [fitness_data.data['assignment'][a] for a in range(fitness_data.genome_size)]
+    for row, values in zip(rows, np.asarray(fitness_array).tolist()):
+      row['fitness'] = values[0]
+      row['percentiles'] = dict(zip(range(0, 101, 10), values[1:]))
     return fitness_data
 
   def print_fitness_data(self):
@@ -78,12 +156,23 @@ class FitnessData:
 
 class FitnessHistory:
 
-  def __init__(self, time_to_fitness_values, genome_size):
+  def __init__(self, time_to_fitness_values, genome_size, fitness_stream = None):
     self.time_to_fitness_values = time_to_fitness_values
     self.genome_size = genome_size
+    # Writer that iterations are appended to instead of being kept in history,
+    #   see dataio.FitnessStreamIO.
+    self.fitness_stream = fitness_stream
+    # No. of runs of an aggregated history, None for one run or if it was not recorded.
+    self.num_runs = None
 
     self.initialize_history(self.genome_size)
 
+  def __setstate__(self, state):
+    # Histories pickled before fitness streams and run counts were added lack them.
+    self.__dict__.update(state)
+    self.__dict__.setdefault('fitness_stream', None)
+    self.__dict__.setdefault('num_runs', None)
+
   def initialize_history(self, genome_size):
     self.history = {}
     self.history['iterations'] = {}
@@ -95,6 +184,9 @@ class FitnessHistory:
         self.history['time_to']['assignment'][a] = {}
 
   def update_iteration(self, iteration_no, fitness_data):
+    if self.fitness_stream:
+      self.fitness_stream.write(iteration_no, fitness_data.to_array())
+      return
     self.history['iterations'][iteration_no] = fitness_data
 
 
@@ -112,6 +204,70 @@ class FitnessHistory:
     self.update_iteration(iteration_no, fitness_data)
     self.update_time_to(iteration_no, fitness_data)
 
+  def carry_forward(self, iteration_no, fitness_data, num_iterations):
+    # A run stopped early at iteration_no keeps its last fitness for the iterations it did not
+    #   evolve, so it covers as many iterations as the runs it is aggregated with.
+    for i in range(iteration_no + 1, num_iterations + 1):
+      self.update_iteration(i, fitness_data)
+
+  def to_array(self):
+    # (num_iterations + 1, 1 + genome_size, 12), see FitnessData.to_array.
+    if self.fitness_stream:
+      return np.array(self.fitness_stream.read())
+    return np.array([self.history['iterations'][i].to_array() \
+                       for i in sorted(self.history['iterations'])])
+
+  @staticmethod
+  def from_array(time_to_fitness_values, fitness_arrays):
+    # fitness_arrays is (num_iterations + 1, 1 + genome_size, 12), see FitnessData.to_array.
+    fitness_history = FitnessHistory(time_to_fitness_values, fitness_arrays.shape[1] - 1)
+    for i, fitness_array in enumerate(fitness_arrays):
+      fitness_history.update_fitness_history(i, FitnessData.from_array(fitness_array))
+    return fitness_history
+
+  def to_arrays(self):
+    time_to = np.full((1 + self.genome_size, len(self.time_to_fitness_values)), np.nan)
+    for j, f in enumerate(self.time_to_fitness_values):
+      time_to[0, j] = self.history['time_to']['population'].get(f, np.nan)
+      for a in range(self.genome_size):
+        time_to[1 + a, j] = self.history['time_to']['assignment'][a].get(f, np.nan)
+
+    return FitnessHistoryArrays(time_to_fitness_values = list(self.time_to_fitness_values),
+                                iterations = sorted(self.history['iterations']),
+                                fitness = self.to_array(),
+                                time_to = time_to,
+                                num_runs = self.num_runs)
+
+  @staticmethod
+  def from_arrays(fitness_history_arrays, max_iterations = None):
+    # Time to values are restored as stored, as aggregated ones can not be recomputed from the
+    #   aggregated fitness. Iterations after max_iterations are not read.
+    fha = fitness_history_arrays
+    fitness_history = FitnessHistory(fha.time_to_fitness_values, fha.fitness.shape[1] - 1)
+    fitness_history.num_runs = fha.num_runs
+    for i, iteration_no in enumerate(fha.iterations):
+      if max_iterations is not None and iteration_no > max_iterations:
+        break
+      fitness_history.update_iteration(iteration_no, FitnessData.from_array(fha.fitness[i]))
+
+    for j, f in enumerate(fha.time_to_fitness_values):
+      fitness_history.history['time_to']['population'][f] = \
+          FitnessHistoryArrays.get_time_to_value(fha.time_to[0, j])
+      for a in range(fitness_history.genome_size):
+        fitness_history.history['time_to']['assignment'][a][f] = \
+            FitnessHistoryArrays.get_time_to_value(fha.time_to[1 + a, j])
+    return fitness_history
+
+  @staticmethod
+  def get_time_to_array(time_to_fitness_values, fitness_arrays):
+    # First iteration at which the fitness of the population and of each assignment went
+    #   above each fitness value, as update_time_to does, NaN if never.
+    #   fitness_arrays is (..., num_iterations + 1, 1 + genome_size, 12) with iterations from 0,
+    #   the result is (..., 1 + genome_size, len(time_to_fitness_values)).
+    fitness = np.asarray(fitness_arrays)[..., 0]
+    reached = fitness[..., np.newaxis] > np.asarray(time_to_fitness_values)
+    return np.where(reached.any(axis = -3), reached.argmax(axis = -3), np.nan)
+
   def print_time_to(self):
     print("TIME TO FITNESS")
     population_string = ""
@@ -134,6 +290,32 @@ class FitnessHistory:
       print("Assignment {}:\t".format(a) + assignment_string)
 
 
+class FitnessHistoryArrays(namedtuple('FitnessHistoryArrays', ['time_to_fitness_values',
+                                                                 'iterations', 'fitness',
+                                                                 'time_to', 'num_runs'],
+                                       defaults = [None])):
+  # Columnar form of a FitnessHistory, which may be memory mapped from a file.
+  #   fitness is (len(iterations), 1 + genome_size, 12), see FitnessData.to_array.
+  #   time_to is (1 + genome_size, len(time_to_fitness_values)), NaN if never reached.
+  #   num_runs is the no. of runs aggregated, see FitnessHistory.num_runs.
+  __slots__ = ()
+
+  @staticmethod
+  def get_time_to_value(value):
+    # Whole numbers of iterations are read back as ints, as they were before being stored.
+    value = float(value)
+    if value.is_integer():
+      return int(value)
+    return value
+
+  def get_population_fitness(self, iteration_no):
+    return float(self.fitness[self.iterations.index(iteration_no), 0, 0])
+
+  def get_population_time_to(self, time_to_fitness_value):
+    j = self.time_to_fitness_values.index(time_to_fitness_value)
+    return self.get_time_to_value(self.time_to[0, j])
+
+
 class AggregateType(Enum):
   AVERAGE = 0
   STDEV = 1
@@ -150,84 +332,204 @@ class FitnessHistoryAggregate:
 
   MINIMUM_FRACTION_FOR_ORDINAL_METRIC = 0.5
 
+  # Ordinal metrics are the value at int(fraction * n) of the n sorted values of a metric.
+  ORDINAL_FRACTIONS = {
+      AggregateType.MIN: 0.0,
+      AggregateType.MEDIAN: 0.5,
+      AggregateType.P10: 0.1,
+      AggregateType.P20: 0.2,
+      AggregateType.P80: 0.8,
+      AggregateType.P90: 0.9}
+
   @classmethod
   def get_aggregate(cls, vals, num_runs, aggregate_type):
-    if len(vals) == 0:
-      return np.NaN
-
-    if aggregate_type == AggregateType.AVERAGE:
-      return np.mean(vals)
-    elif aggregate_type == AggregateType.STDEV:
-      return np.std(vals)
-
-    if len(vals) < cls.MINIMUM_FRACTION_FOR_ORDINAL_METRIC * num_runs:
-      return np.NaN
-
-    if aggregate_type == AggregateType.MIN:
-      return sorted(vals)[0]
-    elif aggregate_type == AggregateType.MAX:
-      return sorted(vals)[-1]
-    elif aggregate_type == AggregateType.MEDIAN:
-      return sorted(vals)[int(0.5 * len(vals))]
-    elif aggregate_type == AggregateType.P10:
-      return sorted(vals)[int(0.1 * len(vals))]
-    elif aggregate_type == AggregateType.P20:
-      return sorted(vals)[int(0.2 * len(vals))]
-    elif aggregate_type == AggregateType.P80:
-      return sorted(vals)[int(0.8 * len(vals))]
-    elif aggregate_type == AggregateType.P90:
-      return sorted(vals)[int(0.9 * len(vals))]
+    # Aggregate of every metric over the runs along axis 0 of vals, with NaN for runs that
+    #   have no value (like a fitness level never reached). NaN if no run has a value, and for
+    #   ordinal metrics, if fewer than MINIMUM_FRACTION_FOR_ORDINAL_METRIC of runs have one.
+    vals = np.asarray(vals, dtype = float)
+    counts = np.sum(~np.isnan(vals), axis = 0)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+      if aggregate_type == AggregateType.AVERAGE:
+        return np.where(counts > 0, np.nansum(vals, axis = 0) / counts, np.nan)
+      elif aggregate_type == AggregateType.STDEV:
+        mean = np.nansum(vals, axis = 0) / counts
+        variance = np.nansum((vals - mean) ** 2, axis = 0) / counts
+        return np.where(counts > 0, np.sqrt(variance), np.nan)
+
+    # NaN sorts last, so the values of each metric come first.
+    sorted_vals = np.sort(vals, axis = 0)
+    if aggregate_type == AggregateType.MAX:
+      indices = counts - 1
+    else:
+      indices = (cls.ORDINAL_FRACTIONS[aggregate_type] * counts).astype(int)
+    aggregate = np.take_along_axis(sorted_vals, np.maximum(indices, 0)[np.newaxis], axis = 0)[0]
+    return np.where((counts > 0) & (counts >= cls.MINIMUM_FRACTION_FOR_ORDINAL_METRIC * num_runs),
+                    aggregate, np.nan)
 
   @classmethod
-  def get_aggregated_fitness(cls, fitness_history_runs,
-                             fitness_aggregate_type = AggregateType.AVERAGE,
-                             time_to_aggregate_type = AggregateType.MEDIAN):
-    num_runs = len(fitness_history_runs)
-    reference = fitness_history_runs[1]
-    aggregate = FitnessHistory(reference.time_to_fitness_values, reference.genome_size)
-
-    for i in reference.history['iterations']:
-      aggregated_data = FitnessData(reference.genome_size)
-
-      fitness_vals = [r.history['iterations'][i].data['population']['fitness'] \
-                        for r in fitness_history_runs.values()]
-      aggregated_data.data['population']['fitness'] = \
-          FitnessHistoryAggregate.get_aggregate(fitness_vals, num_runs, fitness_aggregate_type)
-
-      aggregated_data.data['population']['percentiles'] = {}
-      for p in range(0, 101, 10):
-        fitness_vals = [r.history['iterations'][i].data['population']['percentiles'][p] \
-                          for r in fitness_history_runs.values()]
-        aggregated_data.data['population']['percentiles'][p] = \
-            FitnessHistoryAggregate.get_aggregate(fitness_vals, num_runs, fitness_aggregate_type)
-
-      for a in range(reference.genome_size):
-        fitness_vals = [r.history['iterations'][i].data['assignment'][a]['fitness'] \
-                          for r in fitness_history_runs.values()]
-        aggregated_data.data['assignment'][a]['fitness'] = \
-            FitnessHistoryAggregate.get_aggregate(fitness_vals, num_runs, fitness_aggregate_type)
-        
-        aggregated_data.data['assignment'][a]['percentiles'] = {}
-        for p in range(0, 101, 10):
-          fitness_vals = [r.history['iterations'][i].data['assignment'][a]['percentiles'][p] \
-                            for r in fitness_history_runs.values()]
-          aggregated_data.data['assignment'][a]['percentiles'][p] = \
-              FitnessHistoryAggregate.get_aggregate(fitness_vals, num_runs, fitness_aggregate_type)
-
-      aggregate.update_iteration(i, aggregated_data)
-
-    for f in reference.time_to_fitness_values:
-      fitness_vals = [r.history['time_to']['population'][f] \
-                        for r in fitness_history_runs.values() \
-                            if f in r.history['time_to']['population']]
-      aggregate.history['time_to']['population'][f] = \
-          FitnessHistoryAggregate.get_aggregate(fitness_vals, num_runs, time_to_aggregate_type)
-
-      for a in range(reference.genome_size):
-        fitness_vals = [r.history['time_to']['assignment'][a][f] \
-                          for r in fitness_history_runs.values() \
-                              if f in r.history['time_to']['assignment'][a]]
-        aggregate.history['time_to']['assignment'][a][f] = \
-            FitnessHistoryAggregate.get_aggregate(fitness_vals, num_runs, time_to_aggregate_type)
-
-    return aggregate
+  def get_aggregated_fitness_arrays(cls, time_to_fitness_values, run_fitness_arrays,
+                                    fitness_aggregate_type = AggregateType.AVERAGE,
+                                    time_to_aggregate_type = AggregateType.MEDIAN):
+    # Aggregated FitnessHistory of runs stacked as (num_runs, num_iterations + 1,
+    #   1 + genome_size, 12), see FitnessHistory.to_array.
+    run_fitness_arrays = np.asarray(run_fitness_arrays)
+    num_runs = len(run_fitness_arrays)
+
+    run_time_to = FitnessHistory.get_time_to_array(time_to_fitness_values, run_fitness_arrays)
+    fha = FitnessHistoryArrays(
+              time_to_fitness_values = list(time_to_fitness_values),
+              iterations = list(range(run_fitness_arrays.shape[1])),
+              fitness = cls.get_aggregate(run_fitness_arrays, num_runs, fitness_aggregate_type),
+              time_to = cls.get_aggregate(run_time_to, num_runs, time_to_aggregate_type),
+              num_runs = num_runs)
+    return FitnessHistory.from_arrays(fha)
+
+
+class OnlineAggregate:
+
+  def __init__(self, shape, aggregate_type, max_runs, low = 0.0, high = 1.0, num_bins = 1):
+    # Aggregate of an array of metrics over up to max_runs runs added one at a time, as
+    #   FitnessHistoryAggregate.get_aggregate gives over all of them, in any order.
+    #   AVERAGE and STDEV use Welford's method and MIN and MAX running extremes, all exact.
+    #   Other ordinal metrics keep the runs while they take less memory than a histogram per
+    #   metric of num_bins over [low, high] would, and are then exact. Otherwise they are the
+    #   center of the bin holding them, exact for whole numbers with bins of width 1 centered
+    #   on them, within half a bin otherwise.
+    self.aggregate_type = aggregate_type
+    self.num_runs = 0
+    self.counts = np.zeros(shape, dtype = np.int64)
+    self.runs = None
+    self.histogram = None
+    if aggregate_type in [AggregateType.AVERAGE, AggregateType.STDEV]:
+      self.mean = np.zeros(shape)
+      self.m2 = np.zeros(shape)
+    elif aggregate_type in [AggregateType.MIN, AggregateType.MAX]:
+      self.extreme = np.full(shape, np.nan)
+    else:
+      # Counts never exceed max_runs, so they take the smallest type that holds it.
+      count_type = np.min_scalar_type(max_runs)
+      if max_runs * np.dtype(float).itemsize <= num_bins * count_type.itemsize:
+        self.runs = []
+      else:
+        self.low = low
+        self.high = high
+        self.num_bins = num_bins
+        self.histogram = np.zeros(tuple(shape) + (num_bins,), dtype = count_type)
+
+  def add(self, vals):
+    # vals of one run, NaN for metrics the run has no value for.
+    vals = np.asarray(vals, dtype = float)
+    present = ~np.isnan(vals)
+    self.num_runs += 1
+    self.counts += present
+
+    if self.aggregate_type in [AggregateType.AVERAGE, AggregateType.STDEV]:
+      with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        delta = np.where(present, vals - self.mean, 0.0)
+        self.mean += np.where(present, delta / self.counts, 0.0)
+        self.m2 += delta * np.where(present, vals - self.mean, 0.0)
+    elif self.aggregate_type == AggregateType.MIN:
+      self.extreme = np.fmin(self.extreme, vals)
+    elif self.aggregate_type == AggregateType.MAX:
+      self.extreme = np.fmax(self.extreme, vals)
+    elif self.runs is not None:
+      self.runs.append(vals)
+    else:
+      # A run adds at most one count per metric, so no index repeats.
+      bins = ((vals[present] - self.low) / (self.high - self.low) * self.num_bins).astype(int)
+      histogram = self.histogram.reshape(-1, self.num_bins)
+      histogram[np.flatnonzero(present), np.clip(bins, 0, self.num_bins - 1)] += 1
+
+  def get_aggregate(self):
+    counts = self.counts
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+      if self.aggregate_type == AggregateType.AVERAGE:
+        return np.where(counts > 0, self.mean, np.nan)
+      elif self.aggregate_type == AggregateType.STDEV:
+        return np.where(counts > 0, np.sqrt(self.m2 / counts), np.nan)
+
+    if self.runs is not None:
+      return FitnessHistoryAggregate.get_aggregate(self.runs, self.num_runs, self.aggregate_type)
+    if self.aggregate_type in [AggregateType.MIN, AggregateType.MAX]:
+      aggregate = self.extreme
+    else:
+      fraction = FitnessHistoryAggregate.ORDINAL_FRACTIONS[self.aggregate_type]
+      indices = (fraction * counts).astype(int)
+      # The value at index i is in the first bin with more than i values up to it.
+      cumulative = np.cumsum(self.histogram, axis = -1, dtype = self.histogram.dtype)
+      bins = np.sum(cumulative <= indices[..., np.newaxis], axis = -1)
+      aggregate = self.low + (bins + 0.5) * (self.high - self.low) / self.num_bins
+    minimum_count = FitnessHistoryAggregate.MINIMUM_FRACTION_FOR_ORDINAL_METRIC * self.num_runs
+    return np.where((counts > 0) & (counts >= minimum_count), aggregate, np.nan)
+
+
+class OnlineFitnessHistoryAggregate:
+
+  def __init__(self, time_to_fitness_values, max_runs, num_iterations, genome_size,
+               fitness_aggregate_type = AggregateType.AVERAGE,
+               time_to_aggregate_type = AggregateType.MEDIAN,
+               num_fitness_bins = 200):
+    # Aggregated FitnessHistory of up to max_runs runs added as they complete, so the parent
+    #   never holds the histories of many runs. Fitness is within [0, 1], with ordinal metrics
+    #   other than MIN and MAX within half of one of num_fitness_bins if there are too many
+    #   runs to keep. Time to fitness is in whole iterations, with one bin per iteration,
+    #   so it is exact. Aggregates are only allocated with the first run, so they can be made
+    #   up front.
+    self.time_to_fitness_values = list(time_to_fitness_values)
+    self.max_runs = max_runs
+    self.num_iterations = num_iterations
+    self.genome_size = genome_size
+    self.fitness_aggregate_type = fitness_aggregate_type
+    self.time_to_aggregate_type = time_to_aggregate_type
+    self.num_fitness_bins = num_fitness_bins
+    self.num_runs = 0
+    self.fitness = None
+    self.time_to = None
+    self.final = None
+
+  def initialize_aggregates(self):
+    self.fitness = OnlineAggregate((self.num_iterations + 1, 1 + self.genome_size, 12),
+                                   self.fitness_aggregate_type, self.max_runs,
+                                   num_bins = self.num_fitness_bins)
+    self.time_to = OnlineAggregate((1 + self.genome_size, len(self.time_to_fitness_values)),
+                                   self.time_to_aggregate_type, self.max_runs,
+                                   low = -0.5, high = self.num_iterations + 0.5,
+                                   num_bins = self.num_iterations + 1)
+    # Final population fitness and population time to each fitness value, of each run.
+    self.final = OnlineAggregate((1 + len(self.time_to_fitness_values),), AggregateType.AVERAGE,
+                                 self.max_runs)
+
+  def add_run(self, fitness_arrays):
+    # Runs are added as they complete, in any order, which only changes the rounding of
+    #   AVERAGE and STDEV.
+    #   fitness_arrays is (num_iterations + 1, 1 + genome_size, 12), see FitnessHistory.to_array.
+    assert self.num_runs < self.max_runs
+    if self.fitness is None:
+      self.initialize_aggregates()
+    time_to = FitnessHistory.get_time_to_array(self.time_to_fitness_values, fitness_arrays)
+    self.fitness.add(fitness_arrays)
+    self.time_to.add(time_to)
+    self.final.add(np.concatenate([[fitness_arrays[-1, 0, 0]], time_to[0]]))
+    self.num_runs += 1
+
+  def get_final_counts(self):
+    # No. of runs with a final population fitness, and that reached each fitness value.
+    return self.final.counts
+
+  def get_final_interval_widths(self, confidence):
+    # Widths of the Student's t confidence intervals of the average final population fitness,
+    #   and of the average population time to each fitness value over the runs that reached
+    #   it. NaN for values reached by fewer than 2 runs.
+    counts = self.final.counts
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+      t = stats.t.ppf(0.5 + confidence / 2, np.maximum(counts - 1, 1))
+      variance = self.final.m2 / (counts - 1)
+      return np.where(counts >= 2, 2 * t * np.sqrt(variance / counts), np.nan)
+
+  def get_fitness_history(self):
+    fha = FitnessHistoryArrays(time_to_fitness_values = self.time_to_fitness_values,
+                               iterations = list(range(self.num_iterations + 1)),
+                               fitness = self.fitness.get_aggregate(),
+                               time_to = self.time_to.get_aggregate(),
+                               num_runs = self.num_runs)
+    return FitnessHistory.from_arrays(fha)
@@ -277,13 +277,24 @@ class TuningGraph:
     ax.set_xlim([0, xlim])
     ax.set_ylim([0, ylim])
 
+    # Cells not promoted by successive halving are hollow, with the no. of iterations of the
+    #   last round they were evolved in, as their fitness is after fewer iterations.
+    unpromoted = graph_vals.get('unpromoted', {})
     text_shift = xlim / 50
     for [x, y], f in graph_vals['final_fitness'].items():
       scaled_fitness = (f - self.FITNESS_SCALE_FACTOR) / (1.0 - self.FITNESS_SCALE_FACTOR)
-      plt.plot(x, y, marker = 'o', markersize = 10, alpha = 0.6,
-                color = cm.gnuplot2_r(scaled_fitness))
-      plt.text(x = x + text_shift, y = y, s = "{fit:.2f}".format(fit = f), fontsize = 'small',
-                verticalalignment = 'top')
+      if (x, y) in unpromoted:
+        (_, num_iterations) = unpromoted[(x, y)]
+        plt.plot(x, y, marker = 'o', markersize = 10, alpha = 0.6, markerfacecolor = 'none',
+                  color = cm.gnuplot2_r(scaled_fitness))
+        plt.text(x = x + text_shift, y = y,
+                  s = "{fit:.2f} (i{i})".format(fit = f, i = num_iterations),
+                  fontsize = 'x-small', style = 'italic', verticalalignment = 'top')
+      else:
+        plt.plot(x, y, marker = 'o', markersize = 10, alpha = 0.6,
+                  color = cm.gnuplot2_r(scaled_fitness))
+        plt.text(x = x + text_shift, y = y, s = "{fit:.2f}".format(fit = f), fontsize = 'small',
+                  verticalalignment = 'top')
 
     if show:
       fig.tight_layout()
@@ -7,7 +7,8 @@ from metrics import fitness as fit
 
 def validate_params():
   has_custom_datetime_string = len(par.MultiParams.CUSTOM_DATETIME_STRING) > 0
-  assert not has_custom_datetime_string ^ par.MultiParams.GRAPHS_ONLY
+  assert not has_custom_datetime_string ^ (par.MultiParams.GRAPHS_ONLY or par.MultiParams.RESUME)
+  assert not (par.MultiParams.GRAPHS_ONLY and par.MultiParams.RESUME)
   
   assert par.MultiParams.GRAPH_MAX_ITERATIONS <= par.MultiParams.NUM_ITERATIONS
 
@@ -54,16 +55,18 @@ def validate_params():
   par.GraphParams.ALL_GRAPHS = True
 
 def generate_multi_param_data(datetime_string):
+  sweep_run_params = []
   for evolution_strategy in par.EvolutionStrategy:
     if evolution_strategy == par.EvolutionStrategy.NO_RESTRICTIONS_GROUP_BY_ASSIGNMENT:
       continue
     for randomize_assignment_priorities in [False, True]:
       for randomize_assignment_sizes in [False, True]:
-        par.WorldParams.EVOLUTION_STRATEGY = evolution_strategy
-        par.WorldParams.RANDOMIZE_ASSIGNMENT_PRIORITIES = randomize_assignment_priorities
-        par.WorldParams.RANDOMIZE_ASSIGNMENT_SIZES = randomize_assignment_sizes
+        sweep_run_params.append(
+            evo.get_run_params(evolution_strategy = evolution_strategy,
+                               randomize_assignment_priorities = randomize_assignment_priorities,
+                               randomize_assignment_sizes = randomize_assignment_sizes))
 
-        evo.evolution_runner(datetime_string = datetime_string)
+  evo.evolution_sweep_runner(sweep_run_params, datetime_string = datetime_string)
 
 
 def multi_param_run():
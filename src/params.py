@@ -43,6 +43,24 @@ class AssignmentStrategy(Enum):
   #   The cost of assigning individual i to assignment a is 1 - (i's fitness for a)
   ASSIGNMENT_MATCHING = 2
 
+# Solver used for AssignmentStrategy ASSIGNMENT_MATCHING. All solvers find a maximum fitness match.
+class MatchingSolver(Enum):
+  # Expand each assignment into one column per available slot and solve the square
+  #   population x population matrix with the Hungarian algorithm. Slow for large populations.
+  EXPANDED = 0
+
+  # Solve the compact population x assignments transportation problem as a linear program.
+  #   Uses much less memory, but is only faster than EXPANDED from about 3000 individuals with
+  #   20 assignments: 0.17s vs 0.08s for 1000 x 20, 0.8s vs 0.9s for 3000 x 20 and 6s vs 17s
+  #   for 10000 x 20. With 100 assignments it takes 0.8s for 1000 individuals (EXPANDED 0.08s).
+  TRANSPORTATION = 1
+
+  # Min cost flow by successive shortest paths, with assignments as capacitated sinks, moving only
+  #   the individuals that do not fit their best assignment. With uniform random genes it takes
+  #   0.02s for 1000 x 20 and 0.05s for 1000 x 100 (EXPANDED 0.08s), and 0.04s for 10000 x 20.
+  #   Slower when most individuals prefer the same assignment: 0.21s for 1000 x 20 (EXPANDED 0.12s).
+  MIN_COST_FLOW = 2
+
 # Params for evolution_runner.py
 
 class WorldParams:
@@ -56,6 +74,8 @@ class WorldParams:
 
   # Strategy for assignment of individuals to tasks as defined above.
   ASSIGNMENT_STRATEGY = AssignmentStrategy.ASSIGNMENT_PRIORITY
+  # Solver for assignment strategy ASSIGNMENT_MATCHING as defined above.
+  MATCHING_SOLVER = MatchingSolver.EXPANDED
 
   # Change the priority of assignments every iteration.
   #   Only applicable if AssignmentStrategy is ASSIGNMENT_PRIORITY.
@@ -65,6 +85,54 @@ class WorldParams:
   #   (by default, all assignments have the same no. of available spots).
   RANDOMIZE_ASSIGNMENT_SIZES = False
 
+  # Evolve all runs together in this process as one (runs, population, genes) array,
+  #   instead of one World per run in a process pool.
+  #   Faster for small populations, per-run debugging and genome graphs are not available.
+  BATCH_RUNS = False
+
+  # Seed of the random streams of every run, run r always gets the same streams for a seed.
+  #   Set to the seed printed by an earlier experiment to reproduce it (or any of its runs).
+  #   None for a new seed every time.
+  EXPERIMENT_SEED = None
+
+  # In parameter sweeps, start the runs estimated to take longest first, so that no long run
+  #   is left for the end. Estimates are calibrated from the run times of earlier sweeps.
+  SCHEDULE_LONGEST_FIRST = True
+
+  # Reuse runs computed before with the same configuration and seed instead of evolving again.
+  #   Runs are only cached with a fixed EXPERIMENT_SEED, or in sweeps, which keep their seed
+  #   so that they can be resumed, as a new seed never matches earlier runs.
+  #   Not used when evolving runs in a batch or saving genomes at checkpoints.
+  CACHE_RUNS = True
+
+  # Save the state of every run in checkpoints/ each time these many generations are evolved,
+  #   so that a stopped run continues from its last saved generation when started again.
+  #   Stopped sweeps also skip configurations that completed (see SweepStateIO).
+  #   0 to never save run state. Not used when evolving runs in a batch.
+  SAVE_RUN_STATE_GENERATIONS = 0
+
+  # Stop a run early once its population fitness has gone above every value in
+  #   FitnessParams.TIME_TO_FITNESS_VALUES, or has not improved by more than
+  #   STOP_PLATEAU_EPSILON in STOP_PLATEAU_GENERATIONS generations (0 to never stop on a plateau).
+  #   The last fitness is carried forward for the remaining generations, so aggregates and
+  #   graphs still cover NUM_GENERATIONS. Not used when evolving runs in a batch.
+  STOP_WHEN_ALL_REACHED = False
+  STOP_PLATEAU_GENERATIONS = 0
+  STOP_PLATEAU_EPSILON = 0.001
+
+  # Start the runs of each configuration in waves instead of all NUM_RUNS at once, and stop
+  #   once the confidence intervals of the average final population fitness and of the
+  #   average population time to each fitness value are within the widths below, with every
+  #   fitness value reached by no run or by enough runs for an ordinal aggregate.
+  #   At least ADAPTIVE_MIN_RUNS and at most NUM_RUNS runs. Not used when evolving runs in a batch.
+  ADAPTIVE_RUNS = False
+  ADAPTIVE_MIN_RUNS = 10
+  ADAPTIVE_RUNS_WAVE = 10
+  ADAPTIVE_CONFIDENCE = 0.95
+  ADAPTIVE_FITNESS_INTERVAL_WIDTH = 0.01
+  # In iterations.
+  ADAPTIVE_TIME_TO_INTERVAL_WIDTH = 5
+
 class PopulationParams:
   # Total no. of individuals in the population.
   POPULATION_SIZE = 100
@@ -74,6 +142,11 @@ class PopulationParams:
   NUM_GROUPS = 5
   NUM_ASSIGNMENTS = 5
 
+  # Store the population as one matrix of genes with vectors of assignments and group nos.
+  #   instead of Group and Individual objects. Same results, only faster.
+  #   Groups and Individuals are still available as a read-only view for debugging and graphs.
+  ARRAY_BACKED = True
+
 class FitnessParams:
   # Record the time to reach these fitness levels.
   TIME_TO_FITNESS_VALUES = [0.7, 0.8, 0.9, 0.95, 0.98, 0.99]
@@ -84,6 +157,10 @@ class AggregationParams:
   # When aggragating over multiple runs, use this metric for time to reach fitness levels
   #   defined above.
   TIME_AGGREGATION_TYPE = fit.AggregateType.MEDIAN
+  # Runs are aggregated as they complete. Fitness aggregated by an ordinal metric other than
+  #   MIN and MAX is read from this many bins over fitness 0 to 1, so it is within half a bin
+  #   of the value over all runs, unless there are few enough runs to keep them instead.
+  FITNESS_HISTOGRAM_BINS = 200
 
 class CrossoverParams:
   # Specifics of crossover (do not touch)
@@ -126,6 +203,12 @@ class DebugParams:
   # If saving graphs, also show the assignments in each generation.
   SHOW_GENOME_ASSIGNMENTS = True
 
+  # Stream the fitness of every generation of each run to a file in data/<datetime>/runs/
+  #   as it evolves, keeping at most these many generations in memory.
+  #   Bounds memory for long runs, and shows progress or keeps partial results of a crash.
+  #   0 keeps every generation in memory until the run ends. Not used when evolving in a batch.
+  STREAM_RUN_FITNESS_BUFFER = 0
+
   # Overall script run metrics
 
   # After all runs, show a summary of aggregated population metrics.
@@ -134,6 +217,10 @@ class DebugParams:
   #   (filename is generated based on datetime and above parameters).
   # Writing this data is required for creating graphs in DataViewer.
   WRITE_AGGREGATED_FITNESS = True
+  # Write the aggregated metrics of all experiments to one database indexed by their params,
+  #   data/experiments.sqlite, instead of one file per configuration.
+  #   Files written before are still read when a configuration is not in the database.
+  USE_EXPERIMENT_STORE = True
 
 # Params for data_viewer.py
 
@@ -190,6 +277,8 @@ class MultiParams:
   # Use these to generate graphs from saved fitness history data
   CUSTOM_DATETIME_STRING = ''
   GRAPHS_ONLY = False
+  # Or use these to continue a stopped run with CUSTOM_DATETIME_STRING above
+  RESUME = False
   
   ASSIGNMENT_STRATEGY = AssignmentStrategy.ASSIGNMENT_PRIORITY
 
@@ -209,6 +298,8 @@ class TuningParams:
   # Use these to generate graphs from saved fitness history data
   CUSTOM_DATETIME_STRING = ''
   GRAPHS_ONLY = False
+  # Or use these to continue a stopped run with CUSTOM_DATETIME_STRING above
+  RESUME = False
 
   NUM_RUNS = 10
   NUM_ITERATIONS = 100
@@ -234,6 +325,16 @@ class TuningParams:
   TIME_TO_FITNESS_VALUES = [0.8, 0.9, 0.95]
   PLOT_TIME_TO_FITNESS = 0.9
 
+  # Successive halving: evolve every cell with NUM_RUNS and NUM_ITERATIONS divided by
+  #   SUCCESSIVE_HALVING_ETA once for each round left, promote the best 1 / ETA of the cells of
+  #   each graph and repeat with ETA times the budget, up to the full budget in the last round.
+  #   Cells are ranked by final population fitness, or by time to PLOT_TIME_TO_FITNESS.
+  #   Cells that were not promoted are marked in the graphs.
+  SUCCESSIVE_HALVING = False
+  SUCCESSIVE_HALVING_ROUNDS = 3
+  SUCCESSIVE_HALVING_ETA = 3
+  SUCCESSIVE_HALVING_BY_TIME_TO = False
+
   # If this is False, NUM_ASSIGNMENTS below is ignored.
   # If this is True, EVOLUTION_STRATEGY_VALS must only have one value:
   #   EvolutionStrategy.CROSSOVER_BY_GROUP_ONLY
@@ -247,6 +348,8 @@ class GATuningParams:
   # Use these to generate graphs from saved fitness history data
   CUSTOM_DATETIME_STRING = ''
   GRAPHS_ONLY = False
+  # Or use these to continue a stopped run with CUSTOM_DATETIME_STRING above
+  RESUME = False
 
   NUM_RUNS = 10
   NUM_ITERATIONS = 100
@@ -266,3 +369,54 @@ class GATuningParams:
 
   TIME_TO_FITNESS_VALUES = [0.8, 0.9, 0.95]
   PLOT_TIME_TO_FITNESS = 0.9
+
+  # Successive halving of the group and assignment count pairs, see TuningParams.
+  SUCCESSIVE_HALVING = False
+  SUCCESSIVE_HALVING_ROUNDS = 3
+  SUCCESSIVE_HALVING_ETA = 3
+  SUCCESSIVE_HALVING_BY_TIME_TO = False
+
+# Params for surrogate_tuning_run.py
+# All other params above are ignored or modified
+
+class SurrogateTuningParams:
+  # Use these to show results from saved fitness history data
+  CUSTOM_DATETIME_STRING = ''
+  GRAPHS_ONLY = False
+  # Or use these to continue a stopped run with CUSTOM_DATETIME_STRING above
+  RESUME = False
+
+  NUM_RUNS = 10
+  NUM_ITERATIONS = 100
+
+  EVOLUTION_STRATEGY = EvolutionStrategy.ALL_RESTRICTIONS
+  ASSIGNMENT_STRATEGY = AssignmentStrategy.ASSIGNMENT_PRIORITY
+  RANDOMIZE_ASSIGNMENT_PRIORITIES = False
+  RANDOMIZE_ASSIGNMENT_SIZES = False
+
+  # Population sizes, and nos. of groups and assignments that divide them, to search.
+  #   Assignments are only searched apart from groups with evolution strategies that do not
+  #   group by assignment, otherwise there are as many assignments as groups.
+  MIN_POPULATION = 100
+  MAX_POPULATION = 10000
+  POPULATION_STEP = 100
+  MIN_GROUPS = 5
+  MAX_GROUPS = 500
+
+  FITNESS_AGGREGATION_TYPE = fit.AggregateType.AVERAGE
+  TIME_AGGREGATION_TYPE = fit.AggregateType.MEDIAN
+
+  TIME_TO_FITNESS_VALUES = [0.8, 0.9, 0.95]
+  PLOT_TIME_TO_FITNESS = 0.9
+
+  # Evolve NUM_INITIAL_CONFIGURATIONS chosen at random, then batches of BATCH_SIZE chosen by
+  #   expected improvement of a Gaussian process fitted to the results so far,
+  #   until NUM_CONFIGURATIONS have been evolved.
+  NUM_INITIAL_CONFIGURATIONS = 8
+  NUM_CONFIGURATIONS = 40
+  BATCH_SIZE = 4
+  # Search for the lowest time to PLOT_TIME_TO_FITNESS instead of the highest final fitness.
+  BY_TIME_TO = False
+  # Divide expected improvement by the estimated run time of each configuration,
+  #   so that large populations are only tried when they are expected to be worth it.
+  COST_AWARE = True
@@ -0,0 +1,220 @@
+from datetime import datetime
+import numpy as np
+
+import evolution_runner as evo
+import params as par
+from evolution import cost_model as cst
+from evolution import surrogate as sur
+from metrics import dataio as dat
+
+def validate_params():
+  assert par.SurrogateTuningParams.POPULATION_STEP > 0
+  assert par.SurrogateTuningParams.MAX_POPULATION >= par.SurrogateTuningParams.MIN_POPULATION > 0
+  assert (par.SurrogateTuningParams.MAX_POPULATION - par.SurrogateTuningParams.MIN_POPULATION) \
+            % par.SurrogateTuningParams.POPULATION_STEP == 0
+  assert par.SurrogateTuningParams.MAX_GROUPS >= par.SurrogateTuningParams.MIN_GROUPS > 0
+
+  has_custom_datetime_string = len(par.SurrogateTuningParams.CUSTOM_DATETIME_STRING) > 0
+  assert not has_custom_datetime_string ^ \
+      (par.SurrogateTuningParams.GRAPHS_ONLY or par.SurrogateTuningParams.RESUME)
+  assert not (par.SurrogateTuningParams.GRAPHS_ONLY and par.SurrogateTuningParams.RESUME)
+
+  assert len(par.SurrogateTuningParams.TIME_TO_FITNESS_VALUES) > 0
+  assert par.SurrogateTuningParams.PLOT_TIME_TO_FITNESS \
+            in par.SurrogateTuningParams.TIME_TO_FITNESS_VALUES
+
+  assert 0 < par.SurrogateTuningParams.NUM_INITIAL_CONFIGURATIONS \
+            <= par.SurrogateTuningParams.NUM_CONFIGURATIONS
+  assert par.SurrogateTuningParams.BATCH_SIZE > 0
+
+  par.WorldParams.NUM_RUNS = par.SurrogateTuningParams.NUM_RUNS
+  par.WorldParams.NUM_GENERATIONS = par.SurrogateTuningParams.NUM_ITERATIONS
+  par.WorldParams.EVOLUTION_STRATEGY = par.SurrogateTuningParams.EVOLUTION_STRATEGY
+  par.WorldParams.ASSIGNMENT_STRATEGY = par.SurrogateTuningParams.ASSIGNMENT_STRATEGY
+  par.WorldParams.RANDOMIZE_ASSIGNMENT_PRIORITIES = \
+      par.SurrogateTuningParams.RANDOMIZE_ASSIGNMENT_PRIORITIES
+  par.WorldParams.RANDOMIZE_ASSIGNMENT_SIZES = par.SurrogateTuningParams.RANDOMIZE_ASSIGNMENT_SIZES
+
+  par.FitnessParams.TIME_TO_FITNESS_VALUES = par.SurrogateTuningParams.TIME_TO_FITNESS_VALUES
+  par.AggregationParams.FITNESS_AGGREGATION_TYPE = \
+      par.SurrogateTuningParams.FITNESS_AGGREGATION_TYPE
+  par.AggregationParams.TIME_AGGREGATION_TYPE = par.SurrogateTuningParams.TIME_AGGREGATION_TYPE
+
+  par.DebugParams.SHOW_RUN_STATUS = False
+  par.DebugParams.SHOW_RUN_STATUS_DELAY = 1
+  par.DebugParams.SHOW_RUN_TIME_SUMMARY = False
+  par.DebugParams.SHOW_ITERATIONS = False
+  par.DebugParams.NUM_CHECKPOINTS = 2
+  par.DebugParams.SAVE_GENOMES_AT_CHECKPOINTS = False
+  par.DebugParams.SHOW_RUN_GENOMES = False
+  par.DebugParams.SHOW_RUN_FITNESS = False
+  par.DebugParams.SHOW_STATS_AT_CHECKPOINTS = False
+  par.DebugParams.SHOW_AGGREGATED_FITNESS = False
+  par.DebugParams.WRITE_AGGREGATED_FITNESS = True
+
+def get_configurations():
+  # Every (population size, no. of assignments, no. of groups) in the search space that
+  #   passes evolution_runner.check_population_divisibility.
+  (_, _, group_by_assignment) = \
+      evo.get_evolution_constraints(par.SurrogateTuningParams.EVOLUTION_STRATEGY)
+
+  pag_vals = []
+  for p in range(par.SurrogateTuningParams.MIN_POPULATION,
+                 par.SurrogateTuningParams.MAX_POPULATION + 1,
+                 par.SurrogateTuningParams.POPULATION_STEP):
+    divisions = [d for d in range(par.SurrogateTuningParams.MIN_GROUPS,
+                                  par.SurrogateTuningParams.MAX_GROUPS + 1) \
+                   if evo.is_population_divisible(d, p)]
+    for g in divisions:
+      for a in ([g] if group_by_assignment else divisions):
+        pag_vals.append(tuple([p, a, g]))
+
+  print("Total Population, Assignment and Group Count Triples: {}\n".format(len(pag_vals)))
+  return pag_vals
+
+def get_features(pag_vals):
+  # Log sizes scaled to [0, 1] over the search space.
+  low = np.log([par.SurrogateTuningParams.MIN_POPULATION, par.SurrogateTuningParams.MIN_GROUPS,
+                par.SurrogateTuningParams.MIN_GROUPS])
+  high = np.log([par.SurrogateTuningParams.MAX_POPULATION, par.SurrogateTuningParams.MAX_GROUPS,
+                 par.SurrogateTuningParams.MAX_GROUPS])
+  span = np.where(high > low, high - low, 1.0)
+  return (np.log(np.array(pag_vals, dtype = float)) - low) / span
+
+def get_target(final_fitness):
+  # Higher is better. Never reaching the time to fitness value counts as one iteration more
+  #   than were evolved.
+  (final_population_fitness, time_to_fitness) = final_fitness[:2]
+  if not par.SurrogateTuningParams.BY_TIME_TO:
+    return final_population_fitness
+  if np.isnan(time_to_fitness):
+    return -(par.SurrogateTuningParams.NUM_ITERATIONS + 1)
+  return -time_to_fitness
+
+def get_costs(pag_vals):
+  # Not calibrated from past run times, which change as runs are timed, as a resumed or
+  #   read back search must propose the same configurations.
+  if not par.SurrogateTuningParams.COST_AWARE:
+    return None
+  cost_model = cst.RunCostModel()
+  return np.array([cost_model.estimate(population_size = p, num_groups = g,
+                                       num_assignments = a,
+                                       num_iterations = par.SurrogateTuningParams.NUM_ITERATIONS,
+                                       assignment_strategy = \
+                                           par.SurrogateTuningParams.ASSIGNMENT_STRATEGY) \
+                     for (p, a, g) in pag_vals])
+
+def get_experiment_seed(datetime_string, generate_data):
+  # The seed of the sweeps also picks the initial configurations, so a resumed search or
+  #   one only read back proposes the same configurations.
+  ssio = dat.SweepStateIO(datetime_string)
+  experiment_seed = ssio.read_experiment_seed()
+  if experiment_seed is None:
+    assert generate_data
+    experiment_seed = evo.get_experiment_seed()
+    ssio.write_experiment_seed(experiment_seed)
+  return experiment_seed
+
+def generate_data_for_configurations(pag_vals, datetime_string):
+  sweep_run_params = []
+  for (p, a, g) in pag_vals:
+    sweep_run_params.append(
+        evo.get_run_params(population_size = p,
+                           num_groups = g,
+                           num_assignments = a))
+
+  evo.evolution_sweep_runner(sweep_run_params, datetime_string)
+
+def read_final_fitness(fhio, pag_vals):
+  return fhio.read_final_population_fitness(
+              pag_vals,
+              num_runs = par.SurrogateTuningParams.NUM_RUNS,
+              num_iterations = par.SurrogateTuningParams.NUM_ITERATIONS,
+              evolution_strategy_name = par.SurrogateTuningParams.EVOLUTION_STRATEGY.name,
+              randomize_assignment_priorities = \
+                  par.SurrogateTuningParams.RANDOMIZE_ASSIGNMENT_PRIORITIES,
+              randomize_assignment_sizes = par.SurrogateTuningParams.RANDOMIZE_ASSIGNMENT_SIZES,
+              time_to_fitness_value = par.SurrogateTuningParams.PLOT_TIME_TO_FITNESS)
+
+def run_surrogate_search(pag_vals, datetime_string, generate_data):
+  # Evolves (if generate_data) and reads back each batch of proposed configurations.
+  #   Returns the final fitness of every configuration evolved.
+  fhio = dat.FitnessHistoryIO(datetime_string,
+                              use_experiment_store = par.DebugParams.USE_EXPERIMENT_STORE)
+  experiment_seed = get_experiment_seed(datetime_string, generate_data)
+  features = get_features(pag_vals)
+  costs = get_costs(pag_vals)
+
+  initial = np.random.default_rng(experiment_seed).choice(
+                len(pag_vals), size = min(par.SurrogateTuningParams.NUM_INITIAL_CONFIGURATIONS,
+                                          len(pag_vals)),
+                replace = False)
+  proposed = [pag_vals[i] for i in sorted(initial)]
+
+  final_fitness = {}
+  while proposed:
+    print ("EVOLVING {} CONFIGURATIONS, {} EVOLVED\n".format(len(proposed), len(final_fitness)))
+    if generate_data:
+      generate_data_for_configurations(proposed, datetime_string)
+    final_fitness.update(read_final_fitness(fhio, proposed))
+
+    remaining = [i for i, pag in enumerate(pag_vals) if pag not in final_fitness]
+    num_left = min(par.SurrogateTuningParams.NUM_CONFIGURATIONS - len(final_fitness),
+                   par.SurrogateTuningParams.BATCH_SIZE, len(remaining))
+    if num_left <= 0:
+      break
+
+    surrogate = sur.GaussianProcessSurrogate(get_features(list(final_fitness)),
+                                             [get_target(final_fitness[pag]) \
+                                                for pag in final_fitness])
+    batch = surrogate.get_batch(features[remaining], num_left,
+                                costs[remaining] if costs is not None else None)
+    proposed = [pag_vals[remaining[i]] for i in batch]
+
+  return final_fitness
+
+def show_results(pag_vals, final_fitness):
+  ranked = sorted(final_fitness, key = lambda pag: get_target(final_fitness[pag]),
+                  reverse = True)
+  print("CONFIGURATIONS BY {}\n".format(
+            "TIME TO FITNESS" if par.SurrogateTuningParams.BY_TIME_TO else "FINAL FITNESS"))
+  for (p, a, g) in ranked:
+    (final_population_fitness, time_to_fitness, num_aggregated_runs) = final_fitness[(p, a, g)]
+    print("POPULATION:\t{}\tGROUPS:\t{}\tASSIGNMENTS:\t{}\tFITNESS:\t{:.3f}\tTIME TO {}:\t{}" \
+            "\tRUNS:\t{}".format(p, g, a, final_population_fitness,
+                                 par.SurrogateTuningParams.PLOT_TIME_TO_FITNESS, time_to_fitness,
+                                 num_aggregated_runs))
+  print()
+
+  # Best of the configurations not evolved, as predicted from the ones that were.
+  remaining = [pag for pag in pag_vals if pag not in final_fitness]
+  if len(final_fitness) > 1 and remaining:
+    surrogate = sur.GaussianProcessSurrogate(get_features(list(final_fitness)),
+                                             [get_target(final_fitness[pag]) \
+                                                for pag in final_fitness])
+    (mean, std) = surrogate.predict(get_features(remaining))
+    best = int(np.argmax(mean))
+    (p, a, g) = remaining[best]
+    print("PREDICTED BEST NOT EVOLVED:\nPOPULATION:\t{}\tGROUPS:\t{}\tASSIGNMENTS:\t{}\t" \
+            "TARGET:\t{:.3f} +/- {:.3f}\n".format(p, g, a, mean[best], std[best]))
+
+
+def surrogate_tuning_run():
+  validate_params()
+
+  if par.SurrogateTuningParams.CUSTOM_DATETIME_STRING:
+    datetime_string = par.SurrogateTuningParams.CUSTOM_DATETIME_STRING
+  else:
+    datetime_string = datetime.now().strftime("%Y%m%d%H%M%S")
+  print ("TIMESTAMP:\t{}\n".format(datetime_string))
+
+  pag_vals = get_configurations()
+
+  final_fitness = run_surrogate_search(pag_vals, datetime_string,
+                                       generate_data = not par.SurrogateTuningParams.GRAPHS_ONLY)
+  show_results(pag_vals, final_fitness)
+
+  print ("TIMESTAMP:\t{}\n".format(datetime_string))
+
+if __name__ == "__main__":
+  surrogate_tuning_run()
@@ -2,6 +2,7 @@ from datetime import datetime
 
 import evolution_runner as evo
 import params as par
+from evolution import successive_halving as shv
 from metrics import dataio as dat
 from metrics import graph as gra
 
@@ -19,10 +20,14 @@ def validate_params():
                         par.TuningParams.GROUP_SIZE_STEP)
   
   has_custom_datetime_string = len(par.TuningParams.CUSTOM_DATETIME_STRING) > 0
-  assert not has_custom_datetime_string ^ par.TuningParams.GRAPHS_ONLY
+  assert not has_custom_datetime_string ^ (par.TuningParams.GRAPHS_ONLY or par.TuningParams.RESUME)
+  assert not (par.TuningParams.GRAPHS_ONLY and par.TuningParams.RESUME)
   
   assert len(par.TuningParams.TIME_TO_FITNESS_VALUES) > 0
   assert par.TuningParams.PLOT_TIME_TO_FITNESS in par.TuningParams.TIME_TO_FITNESS_VALUES
+  if par.TuningParams.SUCCESSIVE_HALVING:
+    assert par.TuningParams.SUCCESSIVE_HALVING_ROUNDS >= 1
+    assert par.TuningParams.SUCCESSIVE_HALVING_ETA >= 2
 
   if par.TuningParams.DIFFERENT_GROUP_AND_ASSIGNMENT_COUNT:
     assert par.TuningParams.NUM_ASSIGNMENTS > 0
@@ -74,58 +79,97 @@ def get_population_group_pairs():
 
   return pg_vals
 
-def generate_data_for_population_group_pairs(pg_vals, datetime_string):
-
-  for i, (p, g) in enumerate(pg_vals):
-    print ("{} OF {} TUNING RUNS".format(i, len(pg_vals)))
-    print ("POPULATION:\t{}\tGROUPS:\t{}".format(p, g))
-    print()
-
-    par.PopulationParams.POPULATION_SIZE = p
-    par.PopulationParams.NUM_GROUPS = g
-    if par.TuningParams.DIFFERENT_GROUP_AND_ASSIGNMENT_COUNT:
-      par.PopulationParams.NUM_ASSIGNMENTS = par.TuningParams.NUM_ASSIGNMENTS
-    else:
-      par.PopulationParams.NUM_ASSIGNMENTS = g
-
-    for es in par.TuningParams.EVOLUTION_STRATEGY_VALS:
-      for rap in par.TuningParams.RANDOM_ASSIGNMENT_PRIORITIES_VALS:
-        for ras in par.TuningParams.RANDOM_ASSIGNMENT_SIZES_VALS:
-          par.WorldParams.EVOLUTION_STRATEGY = es
-          par.WorldParams.RANDOMIZE_ASSIGNMENT_SIZES = ras
-          par.WorldParams.RANDOMIZE_ASSIGNMENT_PRIORITIES = rap
-
-          evo.evolution_runner(datetime_string)
-
-def make_tuning_graph(fhio, tio, pg_vals, num_runs, num_iterations,
+def get_num_assignments(num_groups):
+  if par.TuningParams.DIFFERENT_GROUP_AND_ASSIGNMENT_COUNT:
+    return par.TuningParams.NUM_ASSIGNMENTS
+  return num_groups
+
+def get_successive_halving():
+  if not par.TuningParams.SUCCESSIVE_HALVING:
+    return shv.SuccessiveHalving(par.TuningParams.NUM_RUNS, par.TuningParams.NUM_ITERATIONS)
+  return shv.SuccessiveHalving(par.TuningParams.NUM_RUNS, par.TuningParams.NUM_ITERATIONS,
+                               num_rounds = par.TuningParams.SUCCESSIVE_HALVING_ROUNDS,
+                               eta = par.TuningParams.SUCCESSIVE_HALVING_ETA,
+                               by_time_to = par.TuningParams.SUCCESSIVE_HALVING_BY_TIME_TO)
+
+def generate_data_for_population_group_pairs(graph_pg_vals, datetime_string,
+                                             num_runs, num_iterations):
+  # graph_pg_vals has the population and group count pairs to evolve for each graph, by
+  #   (evolution strategy, random assignment priorities, random assignment sizes).
+  sweep_run_params = []
+  for (es, rap, ras), pg_vals in graph_pg_vals.items():
+    for (p, g) in pg_vals:
+      sweep_run_params.append(
+          evo.get_run_params(population_size = p,
+                             num_groups = g,
+                             num_assignments = get_num_assignments(g),
+                             num_runs = num_runs,
+                             num_iterations = num_iterations,
+                             evolution_strategy = es,
+                             randomize_assignment_priorities = rap,
+                             randomize_assignment_sizes = ras))
+
+  evo.evolution_sweep_runner(sweep_run_params, datetime_string)
+
+def read_final_fitness(fhio, pg_vals, num_runs, num_iterations, evolution_strategy_name,
+                       randomize_assignment_priorities, randomize_assignment_sizes):
+  pag_vals = [tuple([p, get_num_assignments(g), g]) for (p, g) in pg_vals]
+  final_fitness = fhio.read_final_population_fitness(
+                      pag_vals, num_runs = num_runs, num_iterations = num_iterations,
+                      evolution_strategy_name = evolution_strategy_name,
+                      randomize_assignment_priorities = randomize_assignment_priorities,
+                      randomize_assignment_sizes = randomize_assignment_sizes,
+                      time_to_fitness_value = par.TuningParams.PLOT_TIME_TO_FITNESS)
+  return {tuple([p, g]): final_fitness[(p, a, g)] for (p, a, g) in pag_vals}
+
+def run_tuning_rounds(pg_vals, datetime_string, generate_data):
+  # Evolves (if generate_data) and reads the pairs of every graph in each round of successive
+  #   halving, one round with the full budget if not used. Returns the graph values by graph.
+  fhio = dat.FitnessHistoryIO(datetime_string,
+                              use_experiment_store = par.DebugParams.USE_EXPERIMENT_STORE)
+  sh = get_successive_halving()
+
+  graph_pg_vals = {}
+  all_graph_vals = {}
+  for es in par.TuningParams.EVOLUTION_STRATEGY_VALS:
+    for rap in par.TuningParams.RANDOM_ASSIGNMENT_PRIORITIES_VALS:
+      for ras in par.TuningParams.RANDOM_ASSIGNMENT_SIZES_VALS:
+        graph_pg_vals[(es, rap, ras)] = list(pg_vals)
+        all_graph_vals[(es, rap, ras)] = {'final_fitness': {}, 'time_to_fitness': {},
+                                          'num_runs': {}, 'unpromoted': {}}
+
+  for round_no in range(sh.num_rounds):
+    (num_runs, num_iterations) = sh.get_budget(round_no)
+    if sh.num_rounds > 1:
+      print ("SUCCESSIVE HALVING ROUND {} OF {}:\tRUNS:\t{}\tITERATIONS:\t{}\n".format(
+                round_no + 1, sh.num_rounds, num_runs, num_iterations))
+    if generate_data:
+      generate_data_for_population_group_pairs(graph_pg_vals, datetime_string,
+                                               num_runs, num_iterations)
+
+    for (es, rap, ras), graph_vals in all_graph_vals.items():
+      cells = graph_pg_vals[(es, rap, ras)]
+      final_fitness = read_final_fitness(fhio, cells, num_runs, num_iterations, es.name,
+                                         rap, ras)
+      for pg_tuple, (final_population_fitness, time_to_fitness, num_aggregated_runs) \
+            in final_fitness.items():
+        graph_vals['final_fitness'][pg_tuple] = final_population_fitness
+        graph_vals['time_to_fitness'][pg_tuple] = time_to_fitness
+        graph_vals['num_runs'][pg_tuple] = num_aggregated_runs
+
+      if not sh.is_last_round(round_no):
+        promoted = sh.get_promoted(cells, final_fitness)
+        for pg_tuple in cells:
+          if pg_tuple not in promoted:
+            graph_vals['unpromoted'][pg_tuple] = tuple([num_runs, num_iterations])
+        graph_pg_vals[(es, rap, ras)] = promoted
+
+  return all_graph_vals
+
+def make_tuning_graph(tio, pg_vals, graph_vals, num_runs, num_iterations,
                       evolution_strategy_name, assignment_strategy_name,
                       randomize_assignment_priorities, randomize_assignment_sizes):
 
-  graph_vals = {}
-  graph_vals['final_fitness'] = {}
-  graph_vals['time_to_fitness'] = {}
-  for (p, g) in pg_vals:
-    if par.TuningParams.DIFFERENT_GROUP_AND_ASSIGNMENT_COUNT:
-      num_assignments = par.TuningParams.NUM_ASSIGNMENTS
-    else:
-      num_assignments = g
-    data_filename = fhio.get_data_filename(
-                        population_size = p, num_assignments = num_assignments, num_groups = g,
-                        num_runs = num_runs, num_iterations = num_iterations,
-                        evolution_strategy_name = evolution_strategy_name,
-                        randomize_assignment_priorities = randomize_assignment_priorities,
-                        randomize_assignment_sizes = randomize_assignment_sizes)
-    
-    fitness_history = fhio.read_fitness_history(data_filename)
-    final_population_fitness = \
-        fitness_history.history['iterations'][num_iterations].data['population']['fitness']
-    f = par.TuningParams.PLOT_TIME_TO_FITNESS
-    time_to_fitness = fitness_history.history['time_to']['population'][f]
-
-    pg_tuple = tuple([p, g])
-    graph_vals['final_fitness'][pg_tuple] = final_population_fitness
-    graph_vals['time_to_fitness'][pg_tuple] = time_to_fitness
-  
   save_filename = tio.get_tuning_filename(num_runs, num_iterations,
                                           evolution_strategy_name,
                                           randomize_assignment_priorities,
@@ -137,24 +181,29 @@ def make_tuning_graph(fhio, tio, pg_vals, num_runs, num_iterations,
                         + "Random Assignment Priorities: {}, Random Assignment Sizes: {}") \
       .format(num_iterations, evolution_strategy_name, assignment_strategy_name,
               randomize_assignment_priorities, randomize_assignment_sizes)
+  if graph_vals['unpromoted']:
+    graph_title_text += "\nHollow: Not Promoted by Successive Halving"
+  # Adaptive runs may have converged with fewer runs than asked for.
+  num_aggregated_runs = [n for xy, n in graph_vals['num_runs'].items() \
+                           if n is not None and xy not in graph_vals['unpromoted']]
+  if num_aggregated_runs and min(num_aggregated_runs) < num_runs:
+    graph_title_text += "\nRuns Aggregated: {} to {} of {}".format(
+                            min(num_aggregated_runs), max(num_aggregated_runs), num_runs)
   tuning_graph.plot(graph_vals, title_text = graph_title_text, savefile = save_filename)
 
-def make_tuning_graphs(pg_vals, datetime_string):
+def make_tuning_graphs(pg_vals, all_graph_vals, datetime_string):
 
-  fhio = dat.FitnessHistoryIO(datetime_string)
   tio = dat.TuningIO(datetime_string)
 
-  for es in par.TuningParams.EVOLUTION_STRATEGY_VALS:
-    for rap in par.TuningParams.RANDOM_ASSIGNMENT_PRIORITIES_VALS:
-      for ras in par.TuningParams.RANDOM_ASSIGNMENT_SIZES_VALS:
-        make_tuning_graph(
-            fhio, tio, pg_vals,
-            num_runs = par.TuningParams.NUM_RUNS,
-            num_iterations = par.TuningParams.NUM_ITERATIONS,
-            evolution_strategy_name = es.name,
-            assignment_strategy_name = par.TuningParams.ASSIGNMENT_STRATEGY.name,
-            randomize_assignment_priorities = rap,
-            randomize_assignment_sizes = ras)
+  for (es, rap, ras), graph_vals in all_graph_vals.items():
+    make_tuning_graph(
+        tio, pg_vals, graph_vals,
+        num_runs = par.TuningParams.NUM_RUNS,
+        num_iterations = par.TuningParams.NUM_ITERATIONS,
+        evolution_strategy_name = es.name,
+        assignment_strategy_name = par.TuningParams.ASSIGNMENT_STRATEGY.name,
+        randomize_assignment_priorities = rap,
+        randomize_assignment_sizes = ras)
 
 
 def tuning_run():
@@ -168,9 +217,9 @@ def tuning_run():
 
   pg_vals = get_population_group_pairs()
 
-  if not par.TuningParams.GRAPHS_ONLY:
-    generate_data_for_population_group_pairs(pg_vals, datetime_string)
-  make_tuning_graphs(pg_vals, datetime_string)
+  all_graph_vals = run_tuning_rounds(pg_vals, datetime_string,
+                                     generate_data = not par.TuningParams.GRAPHS_ONLY)
+  make_tuning_graphs(pg_vals, all_graph_vals, datetime_string)
 
   print ("TIMESTAMP:\t{}\n".format(datetime_string))
 